@@ -13,6 +13,8 @@ from settings.config import DB_HOST, DB_PORT, DB_USER, DB_NAME, DB_PASS
 from auth.models import metadata as metadata_auth
 from magazines.models import metadata as metadata_magazines
 from articles.models import metadata as metadata_articles
+from rule_sets.models import metadata as metadata_rule_sets
+from services.search.models import metadata as metadata_search
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
@@ -37,7 +39,9 @@ if config.config_file_name is not None:
 target_metadata = [
     metadata_auth,
     metadata_magazines,
-    metadata_articles
+    metadata_articles,
+    metadata_rule_sets,
+    metadata_search,
 ]
 
 # other values from the config, defined by the needs of env.py,
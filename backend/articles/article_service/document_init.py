@@ -2,14 +2,14 @@
 Document interface for FILE CREATION ONLY
 Now system can work with .docx files only
 """
-from datetime import datetime
 import os
-import uuid
+import asyncio
 from abc import ABC, abstractmethod
-import aiofiles
 
+from articles.article_service.memory_estimate import check_package
 from articles.models import Articles
-from magazines.models import Magazine
+from magazines.cache import magazine_cache
+from services.storage.storage import is_blob_key, storage
 
 from sqlalchemy import select, func
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -25,7 +25,12 @@ class BaseDocument(ABC):
 
     @staticmethod
     async def delete_document(path: str) -> bool:
-        """Static method to delete a document from the file system"""
+        """
+        Static method to delete a document from the file system.
+        Stored blobs may be shared, they are removed by the storage GC.
+        """
+        if is_blob_key(path):
+            return False
         if path and os.path.exists(path):
             os.remove(path)
             return True
@@ -59,20 +64,15 @@ class DocumentInit(BaseDocument):
 
     async def _magazine_exists(self, magazine_id: int, session: AsyncSession) -> bool:
         """Check if magazine exists"""
-        magazine = await session.execute(select(Magazine).where(
-            Magazine.c.id == magazine_id
-        ))
-        if not magazine.fetchone():
+        magazine = await magazine_cache.get(session, magazine_id)
+        if not magazine:
             raise ValueError("Magazine not found.")
         return True
 
     async def _check_max_articles(self, session: AsyncSession) -> bool:
         """Check if the user has reached the maximum number of articles"""
-        magazine_limit_query = select(Magazine.c.maximum_articles).where(
-            Magazine.c.id == self.magazine_id
-        )
-        magazine_limit_result = await session.execute(magazine_limit_query)
-        magazine_limit = magazine_limit_result.scalar()
+        magazine = await magazine_cache.get(session, self.magazine_id)
+        magazine_limit = magazine["maximum_articles"]
 
         article_count_query = select(func.count(Articles.c.id)).where(
             Articles.c.magazine_id == self.magazine_id
@@ -87,17 +87,11 @@ class DocumentInit(BaseDocument):
         return True
 
     async def _create_document(self, user_name) -> str:
-        """Save document to disk"""
-        if self.update:
-            file_name = f"updated_document_{datetime.now().date()}_{uuid.uuid4()}.docx"
-        else:
-            file_name = f"original_document_{datetime.now().date()}_{uuid.uuid4()}.docx"
-        file_path = f"articles/documents/{user_name}/{file_name}"
-
-        os.makedirs(f"articles/documents/{user_name}", exist_ok=True)
+        """Save document to the storage, return its key"""
+        # rejected uploads never reach the storage
+        return await storage.save_upload(self.file, validate=self._check_package)
 
-        async with aiofiles.open(file_path, "wb") as f:
-            content = await self.file.read()
-            await f.write(content)
-
-        return file_path
+    async def _check_package(self, path: str) -> bool:
+        """Check that document can be processed within memory limits"""
+        await asyncio.to_thread(check_package, path)
+        return True
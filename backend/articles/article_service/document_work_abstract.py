@@ -1,7 +1,15 @@
 from abc import ABC, abstractmethod
+from typing import Callable, Optional
+
+# bump when rules change the results, articles checked by older versions
+# are found and checked again by the bulk re-check
+RULE_ENGINE_VERSION = 4
 
 
 class DocumentWorkAbstract(ABC):
+    # called with the name of every rule before it runs
+    progress_callback: Optional[Callable[[str], None]] = None
+
     @abstractmethod
     async def start_flow(self):
         pass
@@ -13,3 +21,16 @@ class DocumentWorkAbstract(ABC):
     @abstractmethod
     async def get_updated_document(self, user_name: str):
         pass
+
+    async def get_paragraph_hashes(self):
+        """Paragraph hashes to reuse when the document is updated"""
+        return None
+
+    async def _run_rule(self, rule: str, check):
+        """Run rule reporting progress"""
+        self._report_progress(rule)
+        return await check()
+
+    def _report_progress(self, rule: str) -> None:
+        if self.progress_callback is not None:
+            self.progress_callback(rule)
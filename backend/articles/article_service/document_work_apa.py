@@ -1,17 +1,29 @@
 """
 Document processing module for APA style
 """
-from datetime import datetime
-import re
-import uuid
 from articles.article_service.document_work_abstract import DocumentWorkAbstract
+from articles.article_service.headers import (
+    distinct_definitions, format_header, header_types, remove_footer_page_numbers,
+    text_width,
+)
+from articles.article_service.images import (
+    ImageDownsampler, collect_extents, downsampling_enabled, merge_extents,
+)
+from articles.article_service.package_writer import save_package
+from articles.article_service.paragraph_hashes import ParagraphHashes
+from articles.article_service.references import CITATION_PATTERN, CitationCrossCheck
+from articles.article_service.tables import (
+    CAPTION_PATTERN, W_TBL, caption_paragraph, format_table_borders, is_table_title,
+    previous_paragraph,
+)
+from services.storage.storage import storage
 
 import docx
 from docx.enum.text import WD_ALIGN_PARAGRAPH
 from docx.shared import Inches
-from docx.oxml.ns import qn
 from docx.enum.section import WD_SECTION
 from docx.shared import Pt
+from docx.text.paragraph import Paragraph
 
 import logging
 from services.logger.logger import Logger
@@ -25,8 +37,13 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__fil
 
 class DocumentWorkFlowAPA(DocumentWorkAbstract):
     """Class to process document according to APA style"""
-    def __init__(self, path: str):
+    style = "APA"
+
+    def __init__(self, path: str, paragraph_hashes: dict = None,
+                 analyze_only: bool = False):
         self.path = path
+        # the report is needed, not the updated document
+        self.analyze_only = analyze_only
         self.document = self._get_document()
 
         self.format_issues = []
@@ -35,6 +52,19 @@ class DocumentWorkFlowAPA(DocumentWorkAbstract):
         self.citation_issues = []
         self.required_citation_actions = []
 
+        self.paragraph_hashes = ParagraphHashes(
+            self.style, self.document, previous=paragraph_hashes
+        )
+
+        # parts changed by the rules besides the main document part
+        self.dirty_parts = set()
+        # images only change the updated document
+        self.downsampler = None
+        if downsampling_enabled() and not analyze_only:
+            self.downsampler = ImageDownsampler()
+        # tables are numbered across batches of the streaming engine
+        self._table_number = 0
+
     def _get_document(self):
         """Get document"""
         try:
@@ -47,28 +77,34 @@ class DocumentWorkFlowAPA(DocumentWorkAbstract):
         """Start document processing"""
         # 1. General Document Formatting Rules
         logger.info("Start document processing START")
-        await self._front()
-        await self._margins()
-        await self._line_spacing()
-        # await self._running_head()
-        # await self._page_numbers()
+        await self._run_rule("front", self._front)
+        await self._run_rule("margins", self._margins)
+        await self._run_rule("line_spacing", self._line_spacing)
+        await self._run_rule("headers", self._headers)
 
         # 2. Document Structure Overview
-        await self._title_page()
-        await self._abstract()
+        await self._run_rule("title_page", self._title_page)
+        await self._run_rule("abstract", self._abstract)
 
         # 3. Keywords
-        await self._keywords()
+        await self._run_rule("keywords", self._keywords)
 
         # 4. Main Text
-        await self._main_text()
-        await self._in_text_citations()
-        await self._heading_levels()
-        # await self._tables()
+        await self._run_rule("main_text", self._main_text)
+        await self._run_rule("in_text_citations", self._in_text_citations)
+        await self._run_rule("heading_levels", self._heading_levels)
+        await self._run_rule("tables", self._tables)
+        await self._run_rule("reference_list", self._reference_list)
+        if self.downsampler is not None:
+            await self._run_rule("images", self._images)
         # await self._figures()
 
         return self.document
 
+    async def get_paragraph_hashes(self):
+        """Paragraph hashes to reuse when the document is updated"""
+        return self.paragraph_hashes.to_dict()
+
     async def create_report(self):
         """Create report on the issues found"""
         report = {
@@ -81,25 +117,34 @@ class DocumentWorkFlowAPA(DocumentWorkAbstract):
                 "required_actions": self.required_citation_actions
             }
         }
+        if self.downsampler is not None:
+            report["images"] = self.downsampler.report()
         return report
 
     async def _front(self):
         """Check front page"""
-        for paragraph in self.document.paragraphs:
-            for run in paragraph.runs:
-                if run.font.name != 'Times New Roman':
-                    self.format_issues.append(
-                        f"Times New Roman was used for: '{run.text}'"
-                    )
+        await self._for_each_paragraph("front", self._front_paragraph)
 
-                    run.font.name = 'Times New Roman'
+    def _front_paragraph(self, paragraph) -> bool:
+        """Check fonts of one paragraph, return True if it was changed"""
+        changed = False
+        for run in paragraph.runs:
+            if run.font.name != 'Times New Roman':
+                self.format_issues.append(
+                    f"Times New Roman was used for: '{run.text}'"
+                )
 
-                if run.font.size and run.font.size.pt != 12:
-                    self.format_issues.append(
-                        f"Font size 12 px was user for text: '{run.text}'"
-                    )
+                run.font.name = 'Times New Roman'
+                changed = True
 
-                    run.font.size = docx.shared.Pt(12)
+            if run.font.size and run.font.size.pt != 12:
+                self.format_issues.append(
+                    f"Font size 12 px was user for text: '{run.text}'"
+                )
+
+                run.font.size = docx.shared.Pt(12)
+                changed = True
+        return changed
 
     async def _margins(self):
         """Check margins"""
@@ -119,71 +164,65 @@ class DocumentWorkFlowAPA(DocumentWorkAbstract):
 
     async def _line_spacing(self):
         """Check line spacing"""
-        for paragraph in self.document.paragraphs:
-            if paragraph.text.strip():
-                if paragraph.paragraph_format.line_spacing != 2:
-                    paragraph.paragraph_format.line_spacing = 2
-                    self.format_issues.append(
-                        f"Line spacing corrected to 2 for paragraph: '{paragraph.text}'"
-                    )
+        await self._for_each_paragraph("line_spacing", self._line_spacing_paragraph)
 
-                space_after = paragraph.paragraph_format.space_after
-                space_before = paragraph.paragraph_format.space_before
+    def _line_spacing_paragraph(self, paragraph) -> bool:
+        """Check spacing of one paragraph, return True if it was changed"""
+        if not paragraph.text.strip():
+            return False
 
-                if space_after is not None and space_after > 0:
-                    paragraph.paragraph_format.space_after = 0
-                    self.format_issues.append(
-                        f"Extra space after paragraph removed: '{paragraph.text}'"
-                    )
+        changed = False
+        if paragraph.paragraph_format.line_spacing != 2:
+            paragraph.paragraph_format.line_spacing = 2
+            self.format_issues.append(
+                f"Line spacing corrected to 2 for paragraph: '{paragraph.text}'"
+            )
+            changed = True
 
-                if space_before is not None and space_before > 0:
-                    paragraph.paragraph_format.space_before = 0
-                    self.format_issues.append(
-                        f"Extra space before paragraph removed: '{paragraph.text}'"
-                    )
+        space_after = paragraph.paragraph_format.space_after
+        space_before = paragraph.paragraph_format.space_before
 
-    async def _running_head(self):
-        """Check running head"""
-        header = self.document.sections[0].header
+        if space_after is not None and space_after > 0:
+            paragraph.paragraph_format.space_after = 0
+            self.format_issues.append(
+                f"Extra space after paragraph removed: '{paragraph.text}'"
+            )
+            changed = True
 
-        if not header.paragraphs:
-            paragraph = header.paragraphs.add_paragraph()
-            paragraph.text = "RUNNING HEAD: TITLE OF THE PAPER"
-            paragraph.paragraph_format.alignment = 0
-            self.format_issues.append({"issue": "Running head added to header"})
-        else:
-            running_head = header.paragraphs[0].text
-            if not running_head.isupper():
-                header.paragraphs[0].text = running_head.upper()
-                self.format_issues.append({"issue": "Running head corrected to uppercase", "location": running_head}) # noqa
-
-            if not header.paragraphs[0].alignment == 0:
-                header.paragraphs[0].paragraph_format.alignment = 0
-                self.format_issues.append({"issue": "Running head aligned to left", "location": running_head}) # noqa
-
-    async def _page_numbers(self):
-        """Check and fix page numbers in header"""
-        header = self.document.sections[0].header
-
-        page_number = None
-        for paragraph in header.paragraphs:
-            for run in paragraph.runs:
-                if run.text.isdigit():
-                    page_number = run.text
-
-        if not page_number:
-            paragraph = header.paragraphs.add()
-            paragraph.alignment = 2
-            paragraph.text = "1"
+        if space_before is not None and space_before > 0:
+            paragraph.paragraph_format.space_before = 0
             self.format_issues.append(
-                "Page number added to header, right-aligned"
+                f"Extra space before paragraph removed: '{paragraph.text}'"
             )
-        else:
-            if not header.paragraphs[-1].alignment == 2:
-                header.paragraphs[-1].paragraph_format.alignment = 2
-                self.format_issues.append(
-                    "Page number aligned to right"
-                )
+            changed = True
+        return changed
+
+    async def _headers(self):
+        """Running head and page number in every distinct header part"""
+        sections = list(self.document.sections)
+        types = header_types(
+            any(section.different_first_page_header_footer for section in sections),
+            self.document.settings.odd_and_even_pages_header_footer,
+        )
+        for header_attribute, footer_attribute, _ in types:
+            for section, header in distinct_definitions(
+                    sections, header_attribute, add_missing=True):
+                if format_header(header._element, text_width(section),
+                                 self._document_title()):
+                    self._mark_dirty(header.part)
+                    self.format_issues.append(
+                        f"Running head and page number set in header "
+                        f"{header.part.partname}"
+                    )
+            # page numbers are in the header already
+            for _, footer in distinct_definitions(
+                    sections, footer_attribute, add_missing=False):
+                if remove_footer_page_numbers(footer._element):
+                    self._mark_dirty(footer.part)
+                    self.format_issues.append(
+                        f"Page number moved from footer {footer.part.partname} "
+                        f"to header"
+                    )
 
     async def _title_page(self):
         """Check title page"""
@@ -261,6 +300,19 @@ class DocumentWorkFlowAPA(DocumentWorkAbstract):
 
     async def _abstract(self):
         """Check and correct Abstract section formatting"""
+        found_abstract, abstract_page = await self._format_abstract()
+
+        if not found_abstract:
+            self.required_format_actions.append(
+                "Abstract heading should be added to the document"
+            )
+        elif not abstract_page:
+            self.required_format_actions.append(
+                "Abstract heading should be on a separate page"
+            )
+
+    async def _format_abstract(self):
+        """Format Abstract heading and text, return found and separate page flags"""
         found_abstract = False
         abstract_page = False
         for i, paragraph in enumerate(self.document.paragraphs):
@@ -280,11 +332,11 @@ class DocumentWorkFlowAPA(DocumentWorkAbstract):
                     for run in paragraph.runs:
                         run.bold = True
 
-                if paragraph.page_break_before is None:
+                if paragraph.paragraph_format.page_break_before is None:
                     self.format_issues.append(
                         "Abstract was replaced on a separate page"
                     )
-                    paragraph.insert_paragraph_before('\n', style='Normal').page_break_before = True # noqa
+                    paragraph.insert_paragraph_before('\n', style='Normal').paragraph_format.page_break_before = True # noqa
                 abstract_page = True
 
                 if len(self.document.paragraphs) > i + 1:
@@ -303,17 +355,15 @@ class DocumentWorkFlowAPA(DocumentWorkAbstract):
 
                 break
 
-        if not found_abstract:
-            self.required_format_actions.append(
-                "Abstract heading should be added to the document"
-            )
-        elif not abstract_page:
-            self.required_format_actions.append(
-                "Abstract heading should be on a separate page"
-            )
+        return found_abstract, abstract_page
 
     async def _keywords(self):
         """Check and correct Keywords section formatting"""
+        if not await self._format_keywords():
+            self.required_format_actions.append("Add Keywords section below Abstract")
+
+    async def _format_keywords(self) -> bool:
+        """Format Keywords paragraph below Abstract, return True if it was found"""
         found_keywords = False
         for i, paragraph in enumerate(self.document.paragraphs):
             # Найти строку ниже Abstract
@@ -340,14 +390,13 @@ class DocumentWorkFlowAPA(DocumentWorkAbstract):
                     found_keywords = True
                     break
 
-        if not found_keywords:
-            self.required_format_actions.append("Add Keywords section below Abstract")
+        return found_keywords
 
     async def _main_text(self):
         """Check and format main text according to APA requirements"""
         self.document.add_section(WD_SECTION.NEW_PAGE)
 
-        original_title = self.document.paragraphs[0].text
+        original_title = self._document_title()
         title_paragraph = self.document.add_paragraph(original_title)
         title_paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
         title_paragraph.runs[0].bold = True
@@ -358,111 +407,160 @@ class DocumentWorkFlowAPA(DocumentWorkAbstract):
 
     async def _in_text_citations(self):
         """Check in-text citations for author-date format"""
-        citation_pattern = r"\(([^()]+), (\d{4})(, p\. \d+)?\)"
+        await self._for_each_paragraph(
+            "in_text_citations", self._in_text_citations_paragraph
+        )
 
-        for paragraph in self.document.paragraphs:
-            text = paragraph.text
-
-            citations = re.findall(citation_pattern, text)
-
-            if citations:
-                for citation in citations:
-                    author_part, year, page = citation
-                    corrected_citation = f"({author_part.strip()}, {year}{page if page else ''})" # noqa
-
-                    if corrected_citation not in text:
-                        try:
-                            paragraph.text = text.replace(
-                                f"({citation[0]}, {citation[1]}{citation[2]})",
-                                corrected_citation
-                            )
-                            self.format_issues.append(
-                                "Corrected in-text citation format to author-date."
-                            )
-                        except Exception as e:
-                            logger.error(
-                                f"Error correcting in-text citation '{citation}': {e}"
-                            )
+    def _in_text_citations_paragraph(self, paragraph) -> bool:
+        """Check citations of one paragraph, return True if it was changed"""
+        text = paragraph.text
+
+        citations = CITATION_PATTERN.findall(text)
+
+        changed = False
+        for citation in citations:
+            author_part, year, page = citation
+            corrected_citation = f"({author_part.strip()}, {year}{page if page else ''})" # noqa
+
+            if corrected_citation not in text:
+                try:
+                    paragraph.text = text.replace(
+                        f"({citation[0]}, {citation[1]}{citation[2]})",
+                        corrected_citation
+                    )
+                    self.format_issues.append(
+                        "Corrected in-text citation format to author-date."
+                    )
+                    changed = True
+                except Exception as e:
+                    logger.error(
+                        f"Error correcting in-text citation '{citation}': {e}"
+                    )
+        return changed
+
+    async def _reference_list(self):
+        """Check that cited works are in the reference list and the other way"""
+        check = CitationCrossCheck()
+        for index, paragraph in enumerate(self.document.paragraphs):
+            check.add_paragraph(index, paragraph.text, self._is_heading(paragraph))
+        self.citation_issues.extend(check.issues())
 
     async def _heading_levels(self):
         """Format APA-style headings based on their levels"""
-        for paragraph in self.document.paragraphs:
-            if paragraph.style.name == 'Heading 1':
-                paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
-                paragraph.runs[0].bold = True
-                paragraph.runs[0].text = await self._to_title_case(paragraph.text)
-
-            elif paragraph.style.name == 'Heading 2':
-                paragraph.alignment = WD_ALIGN_PARAGRAPH.LEFT
-                paragraph.runs[0].bold = True
-                paragraph.runs[0].text = await self._to_title_case(paragraph.text)
-
-            elif paragraph.style.name == 'Heading 3':
-                paragraph.alignment = WD_ALIGN_PARAGRAPH.LEFT
-                paragraph.runs[0].bold = True
-                paragraph.runs[0].italic = True
-                paragraph.runs[0].text = await self._to_title_case(paragraph.text)
-
-            elif paragraph.style.name == 'Heading 4':
-                paragraph.paragraph_format.left_indent = Inches(0.5)
-                paragraph.runs[0].bold = True
-                paragraph.runs[0].text = await self._to_title_case(paragraph.text) + "."
-                paragraph.runs[0].space_after = 0
-
-            elif paragraph.style.name == 'Heading 5':
-                paragraph.paragraph_format.left_indent = Inches(0.5)
-                paragraph.runs[0].bold = True
-                paragraph.runs[0].italic = True
-                paragraph.runs[0].text = await self._to_title_case(paragraph.text) + "."
-                paragraph.runs[0].space_after = 0
+        await self._for_each_paragraph("heading_levels", self._heading_paragraph)
+
+    def _heading_paragraph(self, paragraph) -> bool:
+        """Format one heading, return True if the paragraph was changed"""
+        changed = True
+        if paragraph.style.name == 'Heading 1':
+            paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
+            paragraph.runs[0].bold = True
+            paragraph.runs[0].text = self._title_case(paragraph.text)
+
+        elif paragraph.style.name == 'Heading 2':
+            paragraph.alignment = WD_ALIGN_PARAGRAPH.LEFT
+            paragraph.runs[0].bold = True
+            paragraph.runs[0].text = self._title_case(paragraph.text)
+
+        elif paragraph.style.name == 'Heading 3':
+            paragraph.alignment = WD_ALIGN_PARAGRAPH.LEFT
+            paragraph.runs[0].bold = True
+            paragraph.runs[0].italic = True
+            paragraph.runs[0].text = self._title_case(paragraph.text)
+
+        elif paragraph.style.name == 'Heading 4':
+            paragraph.paragraph_format.left_indent = Inches(0.5)
+            paragraph.runs[0].bold = True
+            paragraph.runs[0].text = self._title_case(paragraph.text) + "."
+            paragraph.runs[0].space_after = 0
+
+        elif paragraph.style.name == 'Heading 5':
+            paragraph.paragraph_format.left_indent = Inches(0.5)
+            paragraph.runs[0].bold = True
+            paragraph.runs[0].italic = True
+            paragraph.runs[0].text = self._title_case(paragraph.text) + "."
+            paragraph.runs[0].space_after = 0
 
-            self.format_issues.append(
-                f"Formatted heading: '{paragraph.text}' to APA style."
-            )
+        else:
+            changed = False
 
-    async def _to_title_case(self, text):
-        """Helper function to convert text to title case."""
-        return ' '.join([word.capitalize() for word in text.split()])
+        self.format_issues.append(
+            f"Formatted heading: '{paragraph.text}' to APA style."
+        )
+        return changed
 
     async def _tables(self):
-        """Format tables according to APA style"""
-        table_count = 1
-        for table in self.document.tables:
-            table_number = f"Table {table_count}"
-            table_title_paragraph = self.document.add_paragraph()
-            table_title_paragraph.alignment = WD_ALIGN_PARAGRAPH.LEFT
-            run_table_number = table_title_paragraph.add_run(table_number)
-            run_table_number.bold = True
-
-            run_title = table_title_paragraph.add_run(": Title")
-            run_title.italic = True
-
-            for row in table.rows:
-                for cell in row.cells:
-                    cell_borders = cell._element.findall(".//w:tcBorders", namespaces={"w": qn("w")}) # noqa
-                    if cell_borders:
-                        for border in cell_borders:
-                            top_border = border.find(qn("w:top"))
-                            bottom_border = border.find(qn("w:bottom"))
-
-                            if row == table.rows[0] and top_border is not None:
-                                top_border.set("w:val", "single")
-                            elif row == table.rows[-1] and bottom_border is not None:
-                                bottom_border.set("w:val", "single")
-                            else:
-                                for side in ["left", "right"]:
-                                    side_border = border.find(qn(f"w:{side}"))
-                                    if side_border is not None:
-                                        side_border.set("w:val", "nil")
-
-            for cell in table.columns[0].cells:
-                cell.text = cell.text.strip().title()
-
-            # Обновляем текст вывода format_issues
-            self.format_issues.append(
-                f"Table {table_count} formatted according to APA style."
-            )
-            table_count += 1
+        """Number, title and borders of tables according to APA style"""
+        for tbl in self.document.element.body.iterchildren(W_TBL):
+            self._table_number += 1
+            label = f"Table {self._table_number}"
+            changed = format_table_borders(tbl)
+            changed |= self._table_caption(tbl, label)
+            if changed:
+                self.format_issues.append(f"{label} formatted according to APA style.")
+
+    def _table_caption(self, tbl, label: str) -> bool:
+        """Bold number and italic title above the table"""
+        above = self._paragraph(previous_paragraph(tbl))
+        match = CAPTION_PATTERN.match(above.text) if above is not None else None
+        if match is not None and match.group(2):
+            # number and title in one paragraph go to separate lines
+            title = self._paragraph(caption_paragraph())
+            title.add_run(match.group(2))
+            above._p.addnext(title._p)
+            above.text = label
+            self._format_table_number(above, label)
+            self._format_table_title(title)
+            return True
+        if match is not None:
+            self.required_format_actions.append(f"Add a title below {label}")
+            return self._format_table_number(above, label)
+        if above is None or self._is_heading(above) or not is_table_title(above.text):
+            self._insert_table_number(tbl, label)
+            self.required_format_actions.append(f"Add a title below {label}")
+            return True
+
+        changed = self._format_table_title(above)
+        number = self._paragraph(previous_paragraph(above._p))
+        match = CAPTION_PATTERN.match(number.text) if number is not None else None
+        if match is not None and not match.group(2):
+            return self._format_table_number(number, label) or changed
+        self._insert_table_number(above._p, label)
+        return True
+
+    def _insert_table_number(self, element, label: str) -> None:
+        number = self._paragraph(caption_paragraph())
+        number.add_run(label).bold = True
+        element.addprevious(number._p)
+
+    def _format_table_number(self, paragraph, label: str) -> bool:
+        changed = False
+        if paragraph.text != label:
+            paragraph.text = label
+            changed = True
+        for run in paragraph.runs:
+            if not run.bold or run.italic:
+                run.bold, run.italic = True, False
+                changed = True
+        return changed
+
+    def _format_table_title(self, paragraph) -> bool:
+        changed = False
+        if not self._is_title_case(paragraph.text) and paragraph.runs:
+            title = self._title_case(paragraph.text)
+            for run in paragraph.runs[1:]:
+                run.text = ""
+            paragraph.runs[0].text = title
+            changed = True
+        for run in paragraph.runs:
+            if run.bold or not run.italic:
+                run.bold, run.italic = False, True
+                changed = True
+        return changed
+
+    def _paragraph(self, p):
+        """python-docx paragraph of the body for w:p element"""
+        return Paragraph(p, self.document._body) if p is not None else None
 
     async def _figures(self):
         """Format figures according to APA style"""
@@ -490,7 +588,62 @@ class DocumentWorkFlowAPA(DocumentWorkAbstract):
             )
             figure_count += 1
 
+    async def _images(self):
+        """Downsample images displayed much smaller than their resolution"""
+        extents = {}
+        collect_extents(self.document.element.body, extents)
+        related_parts = self.document.part.related_parts
+        uses = {}
+        for rid, extent in extents.items():
+            if rid in related_parts:
+                uses.setdefault(related_parts[rid], []).append(extent)
+        for image_part, part_extents in uses.items():
+            blob = self.downsampler.downsample(
+                image_part.partname, image_part.blob, merge_extents(part_extents)
+            )
+            if blob is not None:
+                image_part._blob = blob
+                # pixel sizes of the old image are cached by python-docx
+                image_part._image = None
+                self._mark_dirty(image_part)
+        self.format_issues.extend(self.downsampler.issues)
+
     # """ENCAPSULATED FUNCTIONS"""
+    async def _for_each_paragraph(self, rule: str, check) -> None:
+        """
+        Run paragraph-local rule over all paragraphs.
+        Paragraphs that were checked in the previous version of the document
+        and were not changed by the rule are skipped, their issues are reused.
+        """
+        for paragraph in self.document.paragraphs:
+            self._check_paragraph(rule, check, paragraph)
+
+    def _check_paragraph(self, rule: str, check, paragraph) -> None:
+        """Run paragraph-local rule on one paragraph or reuse its previous result"""
+        content_hash = self.paragraph_hashes.hash(paragraph)
+        issues = self.paragraph_hashes.reuse(rule, content_hash)
+        if issues is not None:
+            self.format_issues.extend(issues)
+            return
+
+        start = len(self.format_issues)
+        changed = check(paragraph)
+        self.paragraph_hashes.record(
+            rule, content_hash, self.format_issues[start:], changed
+        )
+
+    def _mark_dirty(self, part) -> None:
+        """Remember that rule changed the part, it is serialized on save"""
+        self.dirty_parts.add(part.partname)
+
+    def _document_title(self) -> str:
+        """Text of the first paragraph of the document"""
+        return self.document.paragraphs[0].text
+
+    def _title_case(self, text: str) -> str:
+        """Convert text to title case"""
+        return ' '.join([word.capitalize() for word in text.split()])
+
     def _is_title_case(self, text: str) -> bool:
         """Check if text is in title case"""
         words = text.split()
@@ -499,17 +652,32 @@ class DocumentWorkFlowAPA(DocumentWorkAbstract):
                 return False
         return True
 
+    def _is_heading(self, paragraph) -> bool:
+        """Check if paragraph has a heading or title style"""
+        name = paragraph.style.name if paragraph.style is not None else ""
+        return name.startswith("Heading") or name == "Title"
+
     def _is_centered(self, paragraph) -> bool:
         """Check if paragraph is centered"""
         return paragraph.alignment == WD_ALIGN_PARAGRAPH.CENTER
 
-    async def get_updated_document(self, user_name: str):
-        """Convert to docx after checking"""
-        file_name = f"updated_document_{datetime.now().date()}_{uuid.uuid4()}.docx"
-        file_path = f"articles/documents/{user_name}/{file_name}"
-
-        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    def save_to(self, target_path: str) -> None:
+        """Write the checked document to target_path"""
+        # untouched parts (media etc.) are copied without recompression
+        save_package(
+            self.document,
+            source_path=os.path.join(BASE_DIR, self.path),
+            target_path=target_path,
+            dirty_partnames=self.dirty_parts | {self.document.part.partname},
+        )
 
-        self.document.save(file_path)
+    async def get_updated_document(self, user_name: str):
+        """Convert to docx after checking, return storage key of the document"""
+        file_path = storage.temp_path()
+        try:
+            self.save_to(file_path)
+        except Exception:
+            os.remove(file_path)
+            raise
 
-        return file_path
+        return storage.save_file(file_path)
@@ -1,14 +1,35 @@
 """
 Document processing module for custom style
 """
+import os
+
+import docx
+
 from articles.article_service.document_work_abstract import DocumentWorkAbstract
+from articles.article_service.document_work_apa import BASE_DIR
+from articles.article_service.package_writer import save_package
+from articles.article_service.rule_plan import RulePlan
+from services.storage.storage import storage
+
+import logging
+from services.logger.logger import Logger
+
+logger = Logger(__name__, level=logging.INFO, log_to_file=True,
+                filename='workflow.log').get_logger()
 
 
 class DocumentWorkFlowCustom(DocumentWorkAbstract):
-    """Class to process document according to APA style"""
+    """Class to process document according to the magazine house style"""
+
+    def __init__(self, path: str, paragraph_hashes: dict = None,
+                 rule_plan: RulePlan = None, analyze_only: bool = False):
+        if rule_plan is None:
+            raise ValueError("Custom style requires a magazine rule set.")
 
-    def __init__(self, path: str):
         self.path = path
+        # every rule reports what it changes, nothing is skipped when analyzing
+        self.analyze_only = analyze_only
+        self.plan = rule_plan
         self.document = self._get_document()
 
         self.format_issues = []
@@ -19,16 +40,184 @@ class DocumentWorkFlowCustom(DocumentWorkAbstract):
 
     def _get_document(self):
         """Get document"""
-        return "test"
+        try:
+            looking_for = os.path.join(BASE_DIR, self.path)
+            return docx.Document(looking_for)
+        except Exception as e:
+            logger.error(f"Error getting document: {e}")
 
     async def start_flow(self):
         """Start document processing"""
-        pass
+        logger.info(
+            f"Start custom processing with rule set {self.plan.rule_set_id} "
+            f"version {self.plan.version}"
+        )
+        # citations rewrite paragraph text, so they go before run formatting
+        await self._run_rule("citations", self._citations)
+        await self._run_rule("fonts", self._fonts)
+        await self._run_rule("margins", self._margins)
+        await self._run_rule("spacing", self._spacing)
+        await self._run_rule("headings", self._headings)
+
+        return self.document
 
     async def create_report(self):
         """Create report"""
-        pass
+        report = {
+            "format_issues": {
+                "issues": self.format_issues,
+                "required_actions": self.required_format_actions
+            },
+            "citation_issues": {
+                "issues": self.citation_issues,
+                "required_actions": self.required_citation_actions
+            }
+        }
+        return report
+
+    async def _fonts(self):
+        """Check font name and size of all runs"""
+        name, size = self.plan.font_name, self.plan.font_size
+        if name is None and size is None:
+            return
+
+        for paragraph in self.document.paragraphs:
+            if paragraph.style.name in self.plan.headings:
+                continue
+            for run in paragraph.runs:
+                if name is not None and run.font.name != name:
+                    self.format_issues.append(f"{name} was used for: '{run.text}'")
+                    run.font.name = name
+
+                if size is not None and run.font.size and run.font.size != size:
+                    self.format_issues.append(
+                        f"Font size {size.pt:g} pt was used for text: '{run.text}'"
+                    )
+                    run.font.size = size
+
+    async def _margins(self):
+        """Check margins"""
+        if self.plan.margins is None:
+            return
+
+        top, bottom, left, right = self.plan.margins
+        for section in self.document.sections:
+            if (section.top_margin, section.bottom_margin,
+                    section.left_margin, section.right_margin) != self.plan.margins:
+                section.top_margin = top
+                section.bottom_margin = bottom
+                section.left_margin = left
+                section.right_margin = right
+                self.format_issues.append(
+                    f"Margins were corrected to {top.inches:g}, {bottom.inches:g}, "
+                    f"{left.inches:g}, {right.inches:g} inches"
+                )
+
+    async def _spacing(self):
+        """Check line spacing and space around paragraphs"""
+        plan = self.plan
+        for paragraph in self.document.paragraphs:
+            if not paragraph.text.strip():
+                continue
+
+            paragraph_format = paragraph.paragraph_format
+            if (plan.line_spacing is not None
+                    and paragraph_format.line_spacing != plan.line_spacing):
+                paragraph_format.line_spacing = plan.line_spacing
+                self.format_issues.append(
+                    f"Line spacing corrected to {plan.line_spacing:g} "
+                    f"for paragraph: '{paragraph.text}'"
+                )
+
+            if (plan.space_before is not None
+                    and paragraph_format.space_before not in (None, plan.space_before)):
+                paragraph_format.space_before = plan.space_before
+                self.format_issues.append(
+                    f"Space before paragraph corrected: '{paragraph.text}'"
+                )
+
+            if (plan.space_after is not None
+                    and paragraph_format.space_after not in (None, plan.space_after)):
+                paragraph_format.space_after = plan.space_after
+                self.format_issues.append(
+                    f"Space after paragraph corrected: '{paragraph.text}'"
+                )
+
+    async def _headings(self):
+        """Format headings by their levels"""
+        if not self.plan.headings:
+            return
+
+        for paragraph in self.document.paragraphs:
+            heading = self.plan.headings.get(paragraph.style.name)
+            if heading is None:
+                continue
+
+            changed = False
+            alignment = heading.alignment
+            if alignment is not None and paragraph.alignment != alignment:
+                paragraph.alignment = alignment
+                changed = True
+
+            if heading.title_case:
+                title = ' '.join(word.capitalize() for word in paragraph.text.split())
+                if title != paragraph.text and paragraph.runs:
+                    for run in paragraph.runs[1:]:
+                        run.text = ""
+                    paragraph.runs[0].text = title
+                    changed = True
+
+            for run in paragraph.runs:
+                for attribute in ("bold", "italic"):
+                    value = getattr(heading, attribute)
+                    if value is not None and getattr(run, attribute) != value:
+                        setattr(run, attribute, value)
+                        changed = True
+                if heading.font_size is not None and run.font.size != heading.font_size:
+                    run.font.size = heading.font_size
+                    changed = True
+
+            if changed:
+                self.format_issues.append(
+                    f"Formatted heading: '{paragraph.text}' to house style."
+                )
+
+    async def _citations(self):
+        """Check citations against house style patterns"""
+        if not self.plan.citations:
+            return
+
+        for paragraph in self.document.paragraphs:
+            text = paragraph.text
+            for citation in self.plan.citations:
+                found = citation.regex.findall(text)
+                if not found:
+                    continue
+
+                if citation.replace is None:
+                    self.required_citation_actions.append(
+                        f"{citation.issue}: '{text}'"
+                    )
+                    continue
+
+                text = citation.regex.sub(citation.replace, text)
+                self.citation_issues.append(f"{citation.issue}: '{paragraph.text}'")
+
+            if text != paragraph.text:
+                paragraph.text = text
 
     async def get_updated_document(self, user_name: str):
-        """Convert to docx after checking"""
-        pass
+        """Convert to docx after checking, return storage key of the document"""
+        file_path = storage.temp_path()
+        try:
+            save_package(
+                self.document,
+                source_path=os.path.join(BASE_DIR, self.path),
+                target_path=file_path,
+                dirty_partnames={self.document.part.partname},
+            )
+        except Exception:
+            os.remove(file_path)
+            raise
+
+        return storage.save_file(file_path)
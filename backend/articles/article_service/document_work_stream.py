@@ -0,0 +1,389 @@
+"""
+Streaming document processing module for APA style
+
+Large documents are not loaded into python-docx. The main document part is
+read with lxml iterparse, body elements are collected into small batches,
+every batch is checked by the usual APA rules and written to the new package
+right away, so memory depends on the batch size and not on the document size.
+"""
+from contextlib import contextmanager
+import os
+import shutil
+import zipfile
+
+from lxml import etree
+
+from articles.article_service.document_work_apa import BASE_DIR, DocumentWorkFlowAPA
+from articles.article_service.fragment import (
+    FragmentPart, build_fragment, fragment_elements,
+)
+from articles.article_service.headers import PackageHeaders
+from articles.article_service.images import collect_extents, merge_extents
+from articles.article_service.package_writer import copy_raw
+from articles.article_service.references import CitationCrossCheck
+from articles.article_service.tables import CAPTION_PATTERN, is_table_title
+from articles.article_service.package_info import (
+    STYLES, W_NS, document_xml_size, main_document_name, part_relationships,
+    related_part_name,
+)
+from services.storage.storage import storage
+from settings.config import (
+    STREAMING_BATCH_SIZE, STREAMING_FILE_SIZE, STREAMING_XML_SIZE,
+)
+
+import logging
+from services.logger.logger import Logger
+
+logger = Logger(__name__, level=logging.INFO, log_to_file=True,
+                filename='workflow.log').get_logger()
+
+W_BODY = f"{{{W_NS}}}body"
+W_P = f"{{{W_NS}}}p"
+W_SECT_PR = f"{{{W_NS}}}sectPr"
+
+# rules in the order they are applied to the whole document
+RULES = (
+    "front", "margins", "line_spacing", "headers",
+    "title_page", "abstract", "keywords", "main_text",
+    "in_text_citations", "heading_levels", "tables", "reference_list", "images",
+)
+TITLE_PAGE_PARAGRAPHS = 12
+ABSTRACT_LOOKAHEAD = 2
+# batches wait for the table after short paragraphs up to this many times the size
+CAPTION_BATCH_GROWTH = 2
+
+
+class NullXmlWriter:
+    """etree.xmlfile replacement which drops everything, used to only analyze"""
+
+    def write_declaration(self, *args, **kwargs):
+        pass
+
+    @contextmanager
+    def element(self, *args, **kwargs):
+        yield
+
+    def write(self, *args, **kwargs):
+        pass
+
+
+def use_streaming(path: str) -> bool:
+    """Check if the document is too large to be loaded into python-docx"""
+    looking_for = os.path.join(BASE_DIR, path)
+    try:
+        if os.path.getsize(looking_for) > STREAMING_FILE_SIZE:
+            return True
+        return document_xml_size(looking_for) > STREAMING_XML_SIZE
+    except (OSError, KeyError, zipfile.BadZipFile):
+        return False
+
+
+class DocumentWorkFlowAPAStream(DocumentWorkFlowAPA):
+    """Class to process large documents according to APA style with bounded memory"""
+
+    def __init__(self, path: str, paragraph_hashes: dict = None,
+                 batch_size: int = STREAMING_BATCH_SIZE, analyze_only: bool = False):
+        self.source_path = os.path.join(BASE_DIR, path)
+        self.batch_size = batch_size
+        self.part = FragmentPart(self._read_styles())
+        super().__init__(
+            path, paragraph_hashes=paragraph_hashes, analyze_only=analyze_only
+        )
+
+        self.issues_by_rule = {rule: [] for rule in RULES}
+        self.output_path = None
+
+        self._first_batch = True
+        self._title = None
+        self._abstract_found = False
+        self._abstract_page = False
+        self._keywords_found = False
+        self._final_batch = False
+        self._paragraph_index = 0
+        self._cross_check = CitationCrossCheck()
+        self._extents = {}
+        self._package_headers = None
+
+    def _get_document(self):
+        """Empty fragment, body elements are loaded batch by batch"""
+        return build_fragment([], self.part)
+
+    def _read_styles(self):
+        """Get styles.xml of the document"""
+        with zipfile.ZipFile(self.source_path) as package:
+            styles_name = related_part_name(
+                package, main_document_name(package), STYLES
+            )
+            if styles_name is None:
+                return None
+            return package.read(styles_name)
+
+    async def start_flow(self):
+        """Start document processing"""
+        logger.info("Start streaming document processing START")
+        if self.analyze_only:
+            await self._analyze_document()
+        else:
+            await self._rewrite_package()
+
+        if not self._abstract_found:
+            self.required_format_actions.append(
+                "Abstract heading should be added to the document"
+            )
+        elif not self._abstract_page:
+            self.required_format_actions.append(
+                "Abstract heading should be on a separate page"
+            )
+        if not self._keywords_found:
+            self.required_format_actions.append("Add Keywords section below Abstract")
+
+        self.format_issues = [
+            issue for rule in RULES for issue in self.issues_by_rule[rule]
+        ]
+        return self.document
+
+    async def _rewrite_package(self):
+        """Check main document part and write the new package to a temp file"""
+        self.output_path = storage.temp_path()
+
+        with zipfile.ZipFile(self.source_path) as source, \
+                open(self.source_path, "rb") as raw_source, \
+                zipfile.ZipFile(self.output_path, "w", zipfile.ZIP_DEFLATED) as target:
+            document_name = main_document_name(source)
+            images = self._image_members(source, document_name)
+            self._package_headers = PackageHeaders(source, document_name)
+            deferred = []
+            deferred_parts = []
+            for info in source.infolist():
+                if info.filename == document_name:
+                    await self._stream_document(source, info, target)
+                elif info.filename in images:
+                    # displayed sizes are known once the document was read
+                    deferred.append(info)
+                elif self._package_headers.is_deferred(info.filename):
+                    # sections are known once the document was read
+                    deferred_parts.append(info)
+                else:
+                    # other members are copied compressed, without inflate/deflate
+                    copy_raw(raw_source, info, target)
+            await self._run_rule("headers", lambda: self._write_headers(
+                source, raw_source, target, deferred_parts
+            ))
+            if self.downsampler is not None:
+                await self._run_rule("images", lambda: self._write_images(
+                    source, raw_source, target, deferred, images
+                ))
+
+    async def _check_headers(self, source) -> dict:
+        """Check distinct header and footer parts, return the changed ones"""
+        issues, parts = self._package_headers.check(source, self._title or "")
+        self.format_issues.extend(issues)
+        return parts
+
+    async def _write_headers(self, source, raw_source, target, deferred):
+        """Write checked and added headers, relationships and content types"""
+        parts = await self._check_headers(source)
+        headers = self._package_headers
+        for info in deferred:
+            if info.filename in parts:
+                target.writestr(info.filename, parts.pop(info.filename))
+                continue
+            data = None
+            if info.filename in headers.registries:
+                data = headers.updated_member(info.filename, source.read(info))
+            if data is None:
+                copy_raw(raw_source, info, target)
+            else:
+                target.writestr(info.filename, data)
+        # added headers
+        for name, data in parts.items():
+            target.writestr(name, data)
+
+    def _image_members(self, source, document_name: str) -> dict:
+        """Relationship ids of the main document part by related member name"""
+        if self.downsampler is None:
+            return {}
+        images = {}
+        for rid, name in part_relationships(source, document_name).items():
+            images.setdefault(name, []).append(rid)
+        return images
+
+    async def _write_images(self, source, raw_source, target, deferred, images):
+        """Write images downsampled to their displayed size, copy the others"""
+        for info in deferred:
+            extent = merge_extents(
+                self._extents[rid] for rid in images[info.filename]
+                if rid in self._extents
+            )
+            blob = None
+            if extent is not None and all(extent):
+                blob = self.downsampler.downsample(
+                    info.filename, source.read(info), extent
+                )
+            if blob is None:
+                copy_raw(raw_source, info, target)
+            else:
+                target.writestr(info.filename, blob)
+        self.format_issues.extend(self.downsampler.issues)
+
+    async def _analyze_document(self):
+        """Check main document part without writing anything"""
+        with zipfile.ZipFile(self.source_path) as source:
+            document_name = main_document_name(source)
+            self._package_headers = PackageHeaders(source, document_name)
+            with source.open(document_name) as stream:
+                await self._check_stream(stream, NullXmlWriter())
+            await self._run_rule("headers", lambda: self._check_headers(source))
+
+    async def _stream_document(self, source, info, target):
+        """Check main document part element by element and write it to target"""
+        target_info = zipfile.ZipInfo(info.filename, info.date_time)
+        target_info.compress_type = zipfile.ZIP_DEFLATED
+        force_zip64 = info.file_size > zipfile.ZIP64_LIMIT // 2
+
+        with source.open(info) as stream, \
+                target.open(target_info, "w", force_zip64=force_zip64) as output:
+            with etree.xmlfile(output, encoding="UTF-8") as xf:
+                await self._check_stream(stream, xf)
+
+    async def _check_stream(self, stream, xf):
+        """Parse main document part from stream and write checked elements to xf"""
+        events = etree.iterparse(stream, events=("start", "end"), huge_tree=True)
+        xf.write_declaration(standalone=True)
+        _, root = next(events)
+        with xf.element(root.tag, attrib=dict(root.attrib), nsmap=root.nsmap):
+            await self._write_root(events, root, xf)
+
+    async def _write_root(self, events, root, xf):
+        """Write children of w:document, body is processed in batches"""
+        depth = 0
+        for event, element in events:
+            if event == "start":
+                if depth == 0 and element.tag == W_BODY:
+                    with xf.element(element.tag, attrib=dict(element.attrib)):
+                        await self._write_body(events, element, xf)
+                    root.remove(element)
+                else:
+                    depth += 1
+                continue
+
+            if depth == 0:
+                break
+            depth -= 1
+            if depth == 0:
+                xf.write(element)
+                root.remove(element)
+
+    async def _write_body(self, events, body, xf):
+        """Collect body elements into batches and write checked batches"""
+        batch = []
+        depth = 0
+        for event, element in events:
+            if event == "start":
+                depth += 1
+                continue
+
+            if depth == 0:
+                break
+            depth -= 1
+            if depth > 0:
+                continue
+
+            is_paragraph = element.tag == W_P
+            text = "".join(element.itertext()).strip() if is_paragraph else ""
+            is_abstract = (
+                is_paragraph and not self._abstract_found and text.lower() == "abstract"
+            )
+            # the table after a caption must see it in the same batch
+            is_caption = is_paragraph and (
+                is_table_title(text) or CAPTION_PATTERN.match(text) is not None
+            )
+            if self.downsampler is not None:
+                collect_extents(element, self._extents)
+            batch.append(
+                (etree.tostring(element), is_paragraph, is_abstract, is_caption)
+            )
+            body.remove(element)
+
+            # the last section properties are needed by main text rule
+            if element.tag != W_SECT_PR and self._batch_ready(batch):
+                await self._check_batch(batch, xf, final=False)
+                batch = []
+
+        await self._check_batch(batch, xf, final=True)
+
+    def _batch_ready(self, batch) -> bool:
+        """Batch is full and rules with look-ahead have all elements they need"""
+        if len(batch) < self.batch_size:
+            return False
+        if self._first_batch:
+            paragraphs = sum(1 for _, is_paragraph, _, _ in batch if is_paragraph)
+            if paragraphs < TITLE_PAGE_PARAGRAPHS:
+                return False
+        if batch[-1][3] and len(batch) < self.batch_size * CAPTION_BATCH_GROWTH:
+            return False
+        return not any(
+            is_abstract for _, _, is_abstract, _ in batch[-ABSTRACT_LOOKAHEAD:]
+        )
+
+    async def _check_batch(self, batch, xf, final: bool):
+        """Run APA rules on batch of body elements and write the result"""
+        self.document = build_fragment([xml for xml, *_ in batch], self.part)
+        self._final_batch = final
+
+        await self._run_rule("front", self._front)
+        await self._run_rule("margins", self._margins)
+        await self._run_rule("line_spacing", self._line_spacing)
+        if self._first_batch:
+            await self._run_rule("title_page", self._title_page)
+        if not self._abstract_found:
+            self._abstract_found, self._abstract_page = await self._run_rule(
+                "abstract", self._format_abstract
+            )
+        if not self._keywords_found:
+            self._keywords_found = await self._run_rule(
+                "keywords", self._format_keywords
+            )
+        if self._first_batch and self.document.paragraphs:
+            self._title = self.document.paragraphs[0].text
+        if final:
+            await self._run_rule("main_text", self._main_text)
+        await self._run_rule("in_text_citations", self._in_text_citations)
+        await self._run_rule("heading_levels", self._heading_levels)
+        await self._run_rule("tables", self._tables)
+        await self._run_rule("reference_list", self._reference_list)
+
+        for element in fragment_elements(self.document):
+            # header references of the first section are added before it is written
+            for sect_pr in element.iter(W_SECT_PR):
+                self._package_headers.add_section(sect_pr)
+            xf.write(element)
+        self._first_batch = False
+
+    async def _run_rule(self, rule: str, check):
+        """Run rule collecting its issues separately to keep report order"""
+        self.format_issues = self.issues_by_rule[rule]
+        return await super()._run_rule(rule, check)
+
+    async def _reference_list(self):
+        """Collect citations and references of the batch, compare after the last"""
+        for paragraph in self.document.paragraphs:
+            self._cross_check.add_paragraph(
+                self._paragraph_index, paragraph.text, self._is_heading(paragraph)
+            )
+            self._paragraph_index += 1
+        if self._final_batch:
+            self.citation_issues.extend(self._cross_check.issues())
+
+    def _document_title(self) -> str:
+        """Text of the first paragraph of the document"""
+        return self._title
+
+    def save_to(self, target_path: str) -> None:
+        """Move the package written while checking to target_path"""
+        shutil.move(self.output_path, target_path)
+        self.output_path = target_path
+
+    async def get_updated_document(self, user_name: str):
+        """Move checked document to the storage, return its key"""
+        return storage.save_file(self.output_path)
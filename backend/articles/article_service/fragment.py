@@ -0,0 +1,47 @@
+"""
+Standalone python-docx documents built from a slice of body elements
+
+The streaming workflow, which does not load the whole package,
+wraps a part of ``w:body`` into a python-docx ``Document`` so the usual APA
+rules can run on it. Only styles are resolved, other parts are not available.
+"""
+from typing import Iterable
+
+from docx.document import Document
+from docx.oxml import parse_xml
+from docx.oxml.ns import nsdecls
+from docx.parts.styles import StylesPart
+from docx.styles.styles import Styles
+
+
+class FragmentPart:
+    """Minimal document part which resolves styles for fragment paragraphs"""
+
+    def __init__(self, styles_xml: bytes = None):
+        self.styles_xml = styles_xml or StylesPart._default_styles_xml()
+        self._styles = Styles(parse_xml(self.styles_xml))
+
+    @property
+    def styles(self):
+        return self._styles
+
+    def get_style(self, style_id, style_type):
+        return self._styles.get_by_id(style_id, style_type)
+
+    def get_style_id(self, style_or_name, style_type):
+        return self._styles.get_style_id(style_or_name, style_type)
+
+
+def build_fragment(elements: Iterable[bytes], part: FragmentPart) -> Document:
+    """Document whose body contains given serialized body elements"""
+    xml = b"".join([
+        f"<w:document {nsdecls('w')}><w:body>".encode(),
+        *elements,
+        b"</w:body></w:document>",
+    ])
+    return Document(parse_xml(xml), part)
+
+
+def fragment_elements(document: Document):
+    """Body elements of fragment document"""
+    return list(document.element.body)
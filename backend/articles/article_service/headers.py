@@ -0,0 +1,353 @@
+"""
+Running head and page number fields of headers and footers
+
+A section whose header is linked to the previous section has no header part
+of its own, multi-section documents mostly share one part. Parts are found
+by walking the sections once, every distinct part is checked once whatever
+the number of sections. The first line of a header gets the running head
+flush left and a PAGE field flush right, page numbers in footers are removed.
+"""
+import posixpath
+import re
+from typing import Dict, List, Optional, Set, Tuple
+
+from docx.enum.section import WD_HEADER_FOOTER
+from docx.enum.text import WD_ALIGN_PARAGRAPH, WD_TAB_ALIGNMENT
+from docx.opc.constants import CONTENT_TYPE as CT, RELATIONSHIP_TYPE as RT
+from docx.oxml import parse_xml
+from docx.oxml.ns import nsdecls, qn
+from docx.parts.hdrftr import HeaderPart
+from docx.shared import Inches, Twips
+from docx.text.paragraph import Paragraph
+from lxml import etree
+
+from articles.article_service.package_info import (
+    RELS_NS, part_relationships, related_part_name,
+)
+
+PAGE = "PAGE"
+# running heads are at most this long (APA 7)
+RUNNING_HEAD_MAX = 50
+RUNNING_HEAD_LABEL = re.compile(r"^\s*running head\s*:\s*", re.IGNORECASE)
+
+# header types used by python-docx sections and by w:headerReference
+HEADER_TYPES = (
+    ("header", "footer", WD_HEADER_FOOTER.PRIMARY),
+    ("first_page_header", "first_page_footer", WD_HEADER_FOOTER.FIRST_PAGE),
+    ("even_page_header", "even_page_footer", WD_HEADER_FOOTER.EVEN_PAGE),
+)
+CONTENT_TYPES = "[Content_Types].xml"
+CT_NS = "http://schemas.openxmlformats.org/package/2006/content-types"
+
+W_P = qn("w:p")
+W_R = qn("w:r")
+W_T = qn("w:t")
+W_FLD_SIMPLE = qn("w:fldSimple")
+W_FLD_CHAR = qn("w:fldChar")
+W_FLD_CHAR_TYPE = qn("w:fldCharType")
+W_INSTR = qn("w:instr")
+W_INSTR_TEXT = qn("w:instrText")
+
+PAGE_FIELD_XML = (
+    '<w:r><w:fldChar w:fldCharType="begin"/></w:r>'
+    '<w:r><w:instrText xml:space="preserve"> PAGE </w:instrText></w:r>'
+    '<w:r><w:fldChar w:fldCharType="separate"/></w:r>'
+    '<w:r><w:t>1</w:t></w:r>'
+    '<w:r><w:fldChar w:fldCharType="end"/></w:r>'
+)
+
+
+def header_types(title_page: bool, even_pages: bool) -> list:
+    """Header types shown in the document"""
+    return [
+        types for types in HEADER_TYPES
+        if types[2] == WD_HEADER_FOOTER.PRIMARY
+        or (types[2] == WD_HEADER_FOOTER.FIRST_PAGE and title_page)
+        or (types[2] == WD_HEADER_FOOTER.EVEN_PAGE and even_pages)
+    ]
+
+
+def distinct_definitions(sections, attribute: str, add_missing: bool) -> List[tuple]:
+    """
+    (section, header or footer) for every distinct part of one type.
+    With add_missing the first section gets a definition if it has none.
+    """
+    found = []
+    seen = set()
+    for index, section in enumerate(sections):
+        item = getattr(section, attribute)
+        if item.is_linked_to_previous:
+            # linked ones use the part found in an earlier section
+            if index > 0 or not add_missing:
+                continue
+            item.is_linked_to_previous = False
+        part = item.part
+        if part not in seen:
+            seen.add(part)
+            found.append((section, item))
+    return found
+
+
+def fields(p) -> Tuple[List[Tuple[str, list]], Set]:
+    """
+    Fields of the paragraph as (instruction, elements to remove them),
+    and all runs which belong to fields
+    """
+    found = []
+    field_runs = set()
+    open_fields = []
+    for element in p.iter(W_FLD_SIMPLE, W_R):
+        if element.tag == W_FLD_SIMPLE:
+            found.append((_instruction(element.get(W_INSTR, "")), [element]))
+            field_runs.update(element.iter(W_R))
+            continue
+        if element in field_runs:
+            continue
+
+        fld_char = element.find(W_FLD_CHAR)
+        char_type = fld_char.get(W_FLD_CHAR_TYPE) if fld_char is not None else None
+        if char_type == "begin":
+            open_fields.append(["", []])
+        if not open_fields:
+            continue
+        field_runs.add(element)
+        for field in open_fields:
+            field[1].append(element)
+        instruction = element.find(W_INSTR_TEXT)
+        if instruction is not None and instruction.text:
+            open_fields[-1][0] += instruction.text
+        if char_type == "end":
+            text, runs = open_fields.pop()
+            found.append((_instruction(text), runs))
+    return found, field_runs
+
+
+def _instruction(text: str) -> str:
+    words = text.split()
+    return words[0].upper() if words else ""
+
+
+def has_page_field(p) -> bool:
+    return any(instruction == PAGE for instruction, _ in fields(p)[0])
+
+
+def text_without_fields(p) -> str:
+    """Text of the paragraph without field codes and results"""
+    _, field_runs = fields(p)
+    return "".join(
+        text.text or "" for run in p.iter(W_R) if run not in field_runs
+        for text in run.iter(W_T)
+    )
+
+
+def remove_page_numbers(p) -> bool:
+    """Remove PAGE fields and literal page numbers, return True if any"""
+    found, field_runs = fields(p)
+    removed = False
+    for instruction, elements in found:
+        if instruction == PAGE:
+            for element in elements:
+                element.getparent().remove(element)
+            removed = True
+    for run in list(p.iter(W_R)):
+        if run in field_runs:
+            continue
+        text = "".join(t.text or "" for t in run.iter(W_T)).strip()
+        if text.isdigit():
+            run.getparent().remove(run)
+            removed = True
+    return removed
+
+
+def append_page_field(p) -> None:
+    for run in parse_xml(f"<w:p {nsdecls('w')}>{PAGE_FIELD_XML}</w:p>"):
+        p.append(run)
+
+
+def running_head_text(text: str) -> str:
+    """Upper case running head cut at a word within the length limit"""
+    text = " ".join(RUNNING_HEAD_LABEL.sub("", text).split()).upper()
+    if len(text) <= RUNNING_HEAD_MAX:
+        return text
+    cut = text[:RUNNING_HEAD_MAX + 1].rsplit(" ", 1)[0]
+    return cut if cut and len(cut) <= RUNNING_HEAD_MAX else text[:RUNNING_HEAD_MAX]
+
+
+def text_width(section):
+    """Width between the margins of a section or w:sectPr"""
+    if section.page_width is None:
+        return Inches(6.5)
+    width = section.page_width - (section.left_margin or 0) \
+        - (section.right_margin or 0)
+    # tab stops are stored in twips
+    return Twips(round(width / Twips(1)))
+
+
+def format_header(hdr, width, title: str) -> bool:
+    """Running head and PAGE field in the first line, return True if changed"""
+    paragraphs = [Paragraph(p, None) for p in hdr.iterchildren(W_P)]
+    if not paragraphs:
+        hdr.append(parse_xml(f"<w:p {nsdecls('w')}/>"))
+        paragraphs = [Paragraph(hdr[-1], None)]
+    lines = [(p, text_without_fields(p._p).strip()) for p in paragraphs]
+    source, text = next(
+        ((p, text) for p, text in lines if text and not text.isdigit()),
+        (None, title),
+    )
+    running_head = running_head_text(text)
+    first = paragraphs[0]
+    # the running head goes to the first line, page numbers are replaced
+    extra = [
+        p for p, text in lines[1:]
+        if p is source or text.isdigit() or (not text and has_page_field(p._p))
+    ]
+    tab_stops = first.paragraph_format.tab_stops
+    has_tab = any(
+        tab.alignment == WD_TAB_ALIGNMENT.RIGHT and tab.position == width
+        for tab in tab_stops
+    )
+    if (not extra and has_tab and has_page_field(first._p)
+            and lines[0][1] == running_head
+            and first.alignment in (None, WD_ALIGN_PARAGRAPH.LEFT)):
+        return False
+
+    for p in extra:
+        hdr.remove(p._p)
+    for child in list(first._p):
+        if child is not first._p.pPr:
+            first._p.remove(child)
+    first.add_run(running_head)
+    first.add_run().add_tab()
+    append_page_field(first._p)
+    first.alignment = WD_ALIGN_PARAGRAPH.LEFT
+    if not has_tab:
+        tab_stops.add_tab_stop(width, WD_TAB_ALIGNMENT.RIGHT)
+    return True
+
+
+def remove_footer_page_numbers(ftr) -> bool:
+    removed = [remove_page_numbers(p) for p in ftr.iterchildren(W_P)]
+    return any(removed)
+
+
+def serialize(element) -> bytes:
+    return etree.tostring(
+        element, encoding="UTF-8", standalone=True, xml_declaration=True
+    )
+
+
+class PackageHeaders:
+    """
+    Headers and footers of a package whose main part is streamed.
+    Sections are added in order while the main part is written, the first one
+    gets the header references it misses before it is written.
+    """
+
+    def __init__(self, package, document_name: str):
+        self.document_name = document_name
+        directory, name = posixpath.split(document_name)
+        self.rels_name = posixpath.join(directory, "_rels", f"{name}.rels")
+        self.headers = part_relationships(package, document_name, "/header")
+        self.footers = part_relationships(package, document_name, "/footer")
+        self.rel_ids = set(part_relationships(package, document_name, ""))
+        self.names = set(package.namelist())
+        self.even_pages = _even_pages(package, document_name)
+        self.title_page = False
+        self.sections: List[Tuple[dict, int]] = []
+        # member names of added headers with their relationship ids
+        self.new_parts: Dict[str, str] = {}
+
+    def is_deferred(self, name: str) -> bool:
+        """Member written after the main part"""
+        return name in self.headers.values() or name in self.footers.values() \
+            or name in self.registries
+
+    def add_section(self, sect_pr) -> None:
+        if not self.sections:
+            for _, _, type_ in header_types(sect_pr.titlePg_val, self.even_pages):
+                if sect_pr.get_headerReference(type_) is None:
+                    self._add_header(sect_pr, type_)
+        self.title_page = self.title_page or sect_pr.titlePg_val
+        references = {
+            (reference.tag, reference.type_): reference.rId
+            for reference in sect_pr.headerReference_lst + sect_pr.footerReference_lst
+        }
+        self.sections.append((references, text_width(sect_pr)))
+
+    def check(self, package, title: str) -> Tuple[List[str], Dict[str, bytes]]:
+        """Issues and changed parts, every distinct part is checked once"""
+        issues = []
+        parts = {}
+        for _, _, type_ in header_types(self.title_page, self.even_pages):
+            for name, width in self._distinct(qn("w:headerReference"), type_):
+                if name in self.new_parts:
+                    hdr = parse_xml(HeaderPart._default_header_xml())
+                else:
+                    hdr = parse_xml(package.read(name))
+                if format_header(hdr, width, title):
+                    parts[name] = serialize(hdr)
+                    issues.append(
+                        f"Running head and page number set in header /{name}"
+                    )
+            for name, _ in self._distinct(qn("w:footerReference"), type_):
+                ftr = parse_xml(package.read(name))
+                if remove_footer_page_numbers(ftr):
+                    parts[name] = serialize(ftr)
+                    issues.append(f"Page number moved from footer /{name} to header")
+        return issues, parts
+
+    @property
+    def registries(self) -> Tuple[str, str]:
+        """Members which list the parts of the package"""
+        return self.rels_name, CONTENT_TYPES
+
+    def updated_member(self, name: str, data: bytes) -> Optional[bytes]:
+        """Relationships or content types with the added headers, None if same"""
+        if not self.new_parts:
+            return None
+        root = etree.fromstring(data)
+        directory = posixpath.dirname(self.document_name)
+        for part_name, rid in self.new_parts.items():
+            if name == CONTENT_TYPES:
+                etree.SubElement(root, f"{{{CT_NS}}}Override", PartName=f"/{part_name}",
+                                 ContentType=CT.WML_HEADER)
+            else:
+                etree.SubElement(root, f"{{{RELS_NS}}}Relationship", Id=rid,
+                                 Type=RT.HEADER,
+                                 Target=posixpath.relpath(part_name, directory))
+        return serialize(root)
+
+    def _add_header(self, sect_pr, type_) -> None:
+        """Reference to a new header part, named like python-docx would"""
+        rid = next(
+            f"rId{n}" for n in range(1, len(self.rel_ids) + 2)
+            if f"rId{n}" not in self.rel_ids
+        )
+        name = next(
+            f"word/header{n}.xml" for n in range(1, len(self.names) + 2)
+            if f"word/header{n}.xml" not in self.names
+        )
+        self.rel_ids.add(rid)
+        self.names.add(name)
+        self.headers[rid] = name
+        self.new_parts[name] = rid
+        sect_pr.add_headerReference(type_, rid)
+
+    def _distinct(self, tag: str, type_):
+        """Parts referenced by sections, linked sections reference none"""
+        targets = self.headers if tag == qn("w:headerReference") else self.footers
+        seen = set()
+        for references, width in self.sections:
+            name = targets.get(references.get((tag, type_)))
+            if name is not None and name not in seen:
+                seen.add(name)
+                yield name, width
+
+
+def _even_pages(package, document_name: str) -> bool:
+    """Document settings ask for different even page headers"""
+    name = related_part_name(package, document_name, "/settings")
+    if name is None:
+        return False
+    settings = parse_xml(package.read(name))
+    return bool(settings.evenAndOddHeaders_val)
@@ -0,0 +1,188 @@
+"""
+Downsampling of embedded images to the size they are displayed at
+
+Camera photos are often embedded with many times the pixels needed for the
+few inches they take on the page. Images in word/media are resized to the
+target DPI of their largest displayed extent and recompressed in the same
+format, so the package does not change otherwise. Results are cached by the
+hash of the original image, repeated figures are encoded once.
+"""
+import hashlib
+import io
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+
+from PIL import Image
+
+from settings.config import (
+    IMAGE_CACHE_SIZE, IMAGE_DOWNSAMPLE, IMAGE_JPEG_QUALITY, IMAGE_TARGET_DPI,
+)
+
+WP_NS = "http://schemas.openxmlformats.org/drawingml/2006/wordprocessingDrawing"
+A_NS = "http://schemas.openxmlformats.org/drawingml/2006/main"
+R_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+
+WP_INLINE = f"{{{WP_NS}}}inline"
+WP_ANCHOR = f"{{{WP_NS}}}anchor"
+WP_EXTENT = f"{{{WP_NS}}}extent"
+A_BLIP = f"{{{A_NS}}}blip"
+A_SRC_RECT = f"{{{A_NS}}}srcRect"
+R_EMBED = f"{{{R_NS}}}embed"
+
+EMU_PER_INCH = 914400
+# formats written back as they were, others (GIF, EMF...) are left alone
+FORMATS = ("JPEG", "PNG")
+# images are only re-encoded when they shrink below this share of the size
+MAX_SCALE = 0.75
+
+# extent of an image that must keep all its pixels
+KEEP = None
+
+# bytes counted for every cache entry besides the image, so results of images
+# which are kept as they are (None) fill the cache too
+CACHE_ENTRY_SIZE = 256
+
+Extent = Optional[Tuple[int, int]]
+
+
+def downsampling_enabled() -> bool:
+    return IMAGE_DOWNSAMPLE
+
+
+def collect_extents(element, extents: Dict[str, Extent]) -> None:
+    """Largest displayed size in EMU of every image relationship id in element"""
+    for drawing in element.iter(WP_INLINE, WP_ANCHOR):
+        extent = drawing.find(WP_EXTENT)
+        if extent is None:
+            continue
+        size = (int(extent.get("cx", 0)), int(extent.get("cy", 0)))
+        # only a part of a cropped image is displayed at the extent
+        cropped = any(
+            source_rect.attrib for source_rect in drawing.iter(A_SRC_RECT)
+        )
+        for blip in drawing.iter(A_BLIP):
+            rid = blip.get(R_EMBED)
+            if rid is not None:
+                extents[rid] = merge_extents([extents.get(rid, (0, 0)),
+                                              KEEP if cropped else size])
+
+
+def merge_extents(extents: Iterable[Extent]) -> Extent:
+    """Extent covering all uses of an image"""
+    width = height = 0
+    for extent in extents:
+        if extent is KEEP:
+            return KEEP
+        width, height = max(width, extent[0]), max(height, extent[1])
+    return width, height
+
+
+class ImageCache:
+    """Downsampled images by hash of the original and target size, LRU by bytes"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._images: OrderedDict = OrderedDict()
+        self._bytes = 0
+
+    def get(self, key):
+        """Cached result or KeyError"""
+        result = self._images.pop(key)
+        self._images[key] = result
+        return result
+
+    def put(self, key, result) -> None:
+        size = self._size(result)
+        if size > self.max_bytes:
+            return
+        if key in self._images:
+            self._bytes -= self._size(self._images.pop(key))
+        self._images[key] = result
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            _, dropped = self._images.popitem(last=False)
+            self._bytes -= self._size(dropped)
+
+    @staticmethod
+    def _size(result) -> int:
+        return CACHE_ENTRY_SIZE + (len(result[0]) if result is not None else 0)
+
+
+image_cache = ImageCache(IMAGE_CACHE_SIZE)
+
+
+class ImageDownsampler:
+    """Shrinks images larger than needed for their displayed extent"""
+
+    def __init__(self, dpi: int = IMAGE_TARGET_DPI, quality: int = IMAGE_JPEG_QUALITY,
+                 cache: ImageCache = image_cache):
+        self.dpi = dpi
+        self.quality = quality
+        self.cache = cache
+
+        self.images = 0
+        self.bytes_saved = 0
+        self.issues = []
+
+    def target_size(self, extent: Tuple[int, int]) -> Tuple[int, int]:
+        """Pixels needed to show extent at the target DPI"""
+        return tuple(
+            max(1, round(emu / EMU_PER_INCH * self.dpi)) for emu in extent
+        )
+
+    def downsample(self, name: str, blob: bytes, extent: Extent) -> Optional[bytes]:
+        """Smaller image for the extent, None when the image is kept"""
+        if extent is KEEP or not all(extent):
+            return None
+        target = self.target_size(extent)
+        key = (hashlib.sha256(blob).hexdigest(), target, self.quality)
+        try:
+            result = self.cache.get(key)
+        except KeyError:
+            result = self._encode(blob, target)
+            self.cache.put(key, result)
+        if result is None:
+            return None
+
+        data, original_size, new_size = result
+        saved = len(blob) - len(data)
+        self.images += 1
+        self.bytes_saved += saved
+        self.issues.append(
+            f"Image {name} downsampled from {original_size[0]}x{original_size[1]} "
+            f"to {new_size[0]}x{new_size[1]} pixels, {saved // 1024} KB saved"
+        )
+        return data
+
+    def report(self) -> dict:
+        return {"downsampled": self.images, "bytes_saved": self.bytes_saved}
+
+    def _encode(self, blob: bytes, target: Tuple[int, int]):
+        """Resized image with original and new pixel sizes, None if not worth it"""
+        try:
+            with Image.open(io.BytesIO(blob)) as image:
+                if image.format not in FORMATS or getattr(image, "is_animated", False):
+                    return None
+                # both dimensions keep the pixels needed for the extent
+                scale = max(target[0] / image.width, target[1] / image.height)
+                if scale > MAX_SCALE:
+                    return None
+                size = (max(1, round(image.width * scale)),
+                        max(1, round(image.height * scale)))
+                options = {"optimize": True}
+                if image.format == "JPEG":
+                    options.update(quality=self.quality, progressive=True)
+                    # orientation and colors stay as they were
+                    for info in ("exif", "icc_profile"):
+                        if image.info.get(info):
+                            options[info] = image.info[info]
+                output = io.BytesIO()
+                image.resize(size, Image.LANCZOS).save(output, image.format, **options)
+                original_size = image.size
+        except (OSError, ValueError, Image.DecompressionBombError):
+            return None
+
+        data = output.getvalue()
+        if len(data) >= len(blob):
+            return None
+        return data, original_size, size
@@ -1,5 +1,11 @@
+from typing import Callable, Dict
+
+from articles.article_service.document_work_abstract import DocumentWorkAbstract
 from articles.article_service.document_work_apa import DocumentWorkFlowAPA
 from articles.article_service.document_work_custom import DocumentWorkFlowCustom
+from articles.article_service.document_work_stream import (
+    DocumentWorkFlowAPAStream, use_streaming,
+)
 
 
 class DocumentWorkFlowFactory:
@@ -7,15 +13,42 @@ class DocumentWorkFlowFactory:
     Factory to create document processing workflow depending on the style editing
     """
 
-    @staticmethod
-    def create_workflow(style: str, path: str):
+    workflows: Dict[str, Callable[..., DocumentWorkAbstract]] = {}
+
+    @classmethod
+    def register(cls, style: str):
+        """Register workflow builder for the style"""
+        def decorator(builder):
+            cls.workflows[style] = builder
+            return builder
+        return decorator
+
+    @classmethod
+    def create_workflow(cls, style: str, path: str, **options):
         """
         Create workflow depending on the style editing
         """
-        match style:
-            case "APA":
-                return DocumentWorkFlowAPA(path)
-            case "Custom":
-                return DocumentWorkFlowCustom(path)
-            case _:
-                raise ValueError("Unknown style")
+        builder = cls.workflows.get(getattr(style, "value", style))
+        if builder is None:
+            raise ValueError("Unknown style")
+        return builder(path, **options)
+
+
+@DocumentWorkFlowFactory.register("APA")
+def create_apa_workflow(path: str, paragraph_hashes: dict = None,
+                        analyze_only: bool = False, **options):
+    """APA workflow, large documents are streamed"""
+    if use_streaming(path):
+        return DocumentWorkFlowAPAStream(
+            path, paragraph_hashes=paragraph_hashes, analyze_only=analyze_only
+        )
+    return DocumentWorkFlowAPA(
+        path, paragraph_hashes=paragraph_hashes, analyze_only=analyze_only
+    )
+
+
+@DocumentWorkFlowFactory.register("Custom")
+def create_custom_workflow(path: str, rule_plan=None, analyze_only: bool = False,
+                           **options):
+    """Workflow driven by the compiled rule set of the magazine"""
+    return DocumentWorkFlowCustom(path, rule_plan=rule_plan, analyze_only=analyze_only)
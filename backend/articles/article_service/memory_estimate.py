@@ -0,0 +1,46 @@
+"""
+Memory needed to process a document, estimated before it is parsed
+
+Only the ZIP central directory is read, so zip bombs and documents which
+would not fit into memory are rejected before anything is decompressed.
+"""
+import zipfile
+
+from articles.article_service.document_work_stream import use_streaming
+from articles.article_service.package_info import PackageSize, package_size
+from settings.config import (
+    MAX_COMPRESSION_RATIO, MAX_MEMORY_ESTIMATE, MAX_UNCOMPRESSED_SIZE,
+)
+
+# lxml tree with python-docx proxies per byte of the main document part
+XML_MEMORY_FACTOR = 12
+# interpreter, styles and report of one job
+JOB_MEMORY = 64 * 1024 * 1024
+# batches of the streaming engine
+STREAMING_MEMORY = 128 * 1024 * 1024
+
+
+def estimate_memory(path: str, size: PackageSize = None) -> int:
+    """Bytes the workflow is expected to need for the document"""
+    size = size or package_size(path)
+    if use_streaming(path):
+        # other members are copied without inflating them
+        return JOB_MEMORY + STREAMING_MEMORY
+    # python-docx keeps every part in memory, the main part as a tree
+    other_parts = size.uncompressed - size.document_xml
+    return JOB_MEMORY + size.document_xml * XML_MEMORY_FACTOR + other_parts
+
+
+def check_package(path: str) -> PackageSize:
+    """Reject broken packages, zip bombs and documents too large to process"""
+    try:
+        size = package_size(path)
+    except (zipfile.BadZipFile, KeyError):
+        raise ValueError("Invalid .docx file.")
+
+    if (size.uncompressed > MAX_UNCOMPRESSED_SIZE
+            or size.compression_ratio > MAX_COMPRESSION_RATIO):
+        raise ValueError("Document is too large when uncompressed.")
+    if estimate_memory(path, size) > MAX_MEMORY_ESTIMATE:
+        raise ValueError("Document needs too much memory to be processed.")
+    return size
@@ -0,0 +1,107 @@
+"""
+Facts about a .docx package read from the ZIP central directory only
+"""
+import posixpath
+import zipfile
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from lxml import etree
+
+W_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+RELS_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+OFFICE_DOCUMENT = "/officeDocument"
+STYLES = "/styles"
+DEFAULT_DOCUMENT = "word/document.xml"
+
+
+def main_document_name(package: zipfile.ZipFile) -> str:
+    """Name of the main document part inside the package"""
+    return related_part_name(package, "", OFFICE_DOCUMENT) or DEFAULT_DOCUMENT
+
+
+def related_part_name(package: zipfile.ZipFile, source: str,
+                      rel_type: str) -> Optional[str]:
+    """Name of the first part related to source part by relationship type"""
+    for relationship, name in _internal_relationships(package, source):
+        if relationship.get("Type", "").endswith(rel_type):
+            return name
+    return None
+
+
+def part_relationships(package: zipfile.ZipFile, source: str,
+                       rel_type: str = "") -> Dict[str, str]:
+    """Names of parts related to source part by relationship id"""
+    return {
+        relationship.get("Id"): name
+        for relationship, name in _internal_relationships(package, source)
+        if relationship.get("Type", "").endswith(rel_type)
+    }
+
+
+def _internal_relationships(package: zipfile.ZipFile, source: str):
+    """Relationships of source part with names of their target parts"""
+    directory, name = posixpath.split(source)
+    rels_name = posixpath.join(directory, "_rels", f"{name}.rels")
+    try:
+        rels = etree.fromstring(package.read(rels_name))
+    except KeyError:
+        return
+
+    for relationship in rels.iterfind(f"{{{RELS_NS}}}Relationship"):
+        if relationship.get("TargetMode") == "External":
+            continue
+        target = relationship.get("Target")
+        if target.startswith("/"):
+            yield relationship, target.lstrip("/")
+        else:
+            yield relationship, posixpath.normpath(posixpath.join(directory, target))
+
+
+@dataclass
+class PackageSize:
+    """Sizes of package members in bytes"""
+    compressed: int
+    uncompressed: int
+    document_xml: int
+    media: int
+
+    @property
+    def compression_ratio(self) -> float:
+        return self.uncompressed / max(self.compressed, 1)
+
+
+def package_size(path: str) -> PackageSize:
+    """Sizes from the central directory, nothing is decompressed"""
+    with zipfile.ZipFile(path) as package:
+        members = package.infolist()
+        document_name = main_document_name(package)
+    return PackageSize(
+        compressed=sum(info.compress_size for info in members),
+        uncompressed=sum(info.file_size for info in members),
+        document_xml=sum(
+            info.file_size for info in members if info.filename == document_name
+        ),
+        media=sum(
+            info.file_size for info in members if "/media/" in f"/{info.filename}"
+        ),
+    )
+
+
+def document_xml_size(path: str) -> int:
+    """Uncompressed size of the main document part"""
+    with zipfile.ZipFile(path) as package:
+        return package.getinfo(main_document_name(package)).file_size
+
+
+def paragraph_count(path: str, limit: int) -> int:
+    """Number of paragraphs in the main document part, counting stops at limit"""
+    count = 0
+    with zipfile.ZipFile(path) as package, \
+            package.open(main_document_name(package)) as stream:
+        for _, element in etree.iterparse(stream, tag=f"{{{W_NS}}}p"):
+            element.clear()
+            count += 1
+            if count > limit:
+                break
+    return count
@@ -0,0 +1,75 @@
+"""
+Saving python-docx packages without recompressing untouched parts
+
+``Document.save`` serializes and deflates every part again. Workflows know
+which parts their rules changed, so only these parts are serialized, the
+content types and relationships are regenerated (they are small), and all
+other members are copied from the original ZIP byte-for-byte in compressed
+form.
+"""
+import copy
+import struct
+import zipfile
+from typing import Iterable
+
+from docx.opc.packuri import CONTENT_TYPES_URI, PACKAGE_URI
+from docx.opc.pkgwriter import _ContentTypesItem
+
+DATA_DESCRIPTOR_FLAG = 0x08
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+def save_package(document, source_path: str, target_path: str,
+                 dirty_partnames: Iterable[str]) -> None:
+    """Save document writing only dirty parts, other parts are copied raw"""
+    package = document.part.package
+    parts = list(package.iter_parts())
+    dirty = set(dirty_partnames)
+
+    with zipfile.ZipFile(source_path) as source, \
+            open(source_path, "rb") as raw_source, \
+            zipfile.ZipFile(target_path, "w", zipfile.ZIP_DEFLATED) as target:
+        members = {info.filename: info for info in source.infolist()}
+
+        target.writestr(
+            CONTENT_TYPES_URI.membername, _ContentTypesItem.from_parts(parts).blob
+        )
+        target.writestr(PACKAGE_URI.rels_uri.membername, package.rels.xml)
+
+        for part in parts:
+            name = part.partname.membername
+            if part.partname in dirty or name not in members:
+                target.writestr(name, part.blob)
+            else:
+                copy_raw(raw_source, members[name], target)
+            if len(part.rels):
+                target.writestr(part.partname.rels_uri.membername, part.rels.xml)
+
+
+def copy_raw(source, info: zipfile.ZipInfo, target: zipfile.ZipFile) -> None:
+    """Copy compressed member data from source file to target ZIP as is"""
+    source.seek(info.header_offset)
+    header = source.read(zipfile.sizeFileHeader)
+    name_length, extra_length = struct.unpack("<HH", header[26:30])
+    data_offset = zipfile.sizeFileHeader + name_length + extra_length
+    source.seek(info.header_offset + data_offset)
+
+    member = copy.copy(info)
+    # sizes and CRC are known, they are written in the local header
+    member.flag_bits &= ~DATA_DESCRIPTOR_FLAG
+    member.extra = b""
+    member.header_offset = target.fp.tell()
+    target.fp.write(member.FileHeader())
+
+    remaining = info.compress_size
+    while remaining:
+        chunk = source.read(min(COPY_CHUNK_SIZE, remaining))
+        if not chunk:
+            raise zipfile.BadZipFile(f"Truncated member: {info.filename}")
+        target.fp.write(chunk)
+        remaining -= len(chunk)
+
+    target.filelist.append(member)
+    target.NameToInfo[member.filename] = member
+    target.start_dir = target.fp.tell()
+    target._didModify = True
@@ -0,0 +1,78 @@
+"""
+Per-paragraph content hashes for incremental re-check of revised documents
+
+For every paragraph-local rule the hash of the paragraph XML (as seen by the
+rule) is stored with the issues the rule reported and whether it changed the
+paragraph. When a new version of the document is uploaded, a paragraph with a
+known hash that the rule did not change gives exactly the same result, so the
+rule is skipped and the stored issues are reused.
+"""
+import hashlib
+from typing import Dict, List, Optional
+
+from lxml import etree
+
+from articles.article_service.document_work_abstract import RULE_ENGINE_VERSION
+
+HASHES_VERSION = 1
+
+
+class ParagraphHashes:
+    """Recorded rule results of one processed document"""
+
+    def __init__(self, style: str, document, previous: Optional[dict] = None):
+        self.style = style
+        self.styles_hash = self._styles_hash(document)
+        self.rules: Dict[str, Dict[str, dict]] = {}
+        self.previous = self._compatible_rules(previous)
+
+    def hash(self, paragraph) -> str:
+        """Hash of the paragraph XML"""
+        content = etree.tostring(paragraph._p, method="c14n", exclusive=True)
+        return hashlib.blake2b(content, digest_size=16).hexdigest()
+
+    def reuse(self, rule: str, content_hash: str) -> Optional[List]:
+        """Issues recorded for unchanged paragraph or None if rule must run"""
+        known = self.previous.get(rule, {}).get(content_hash)
+        if known is None or known["changed"]:
+            return None
+
+        self.rules.setdefault(rule, {})[content_hash] = known
+        return known["issues"]
+
+    def record(self, rule: str, content_hash: str, issues: List, changed: bool):
+        """Store result of rule for paragraph"""
+        self.rules.setdefault(rule, {})[content_hash] = {
+            "issues": list(issues),
+            "changed": changed,
+        }
+
+    def to_dict(self) -> dict:
+        """Data to save with the article"""
+        return {
+            "version": HASHES_VERSION,
+            "rule_version": RULE_ENGINE_VERSION,
+            "style": self.style,
+            "styles": self.styles_hash,
+            "rules": self.rules,
+        }
+
+    def _compatible_rules(self, previous: Optional[dict]) -> Dict[str, dict]:
+        """Previous results are valid only for the same rules and style definitions"""
+        if not previous:
+            return {}
+        if (previous.get("version") != HASHES_VERSION
+                or previous.get("rule_version") != RULE_ENGINE_VERSION
+                or previous.get("style") != self.style
+                or previous.get("styles") != self.styles_hash):
+            return {}
+        return previous.get("rules", {})
+
+    @staticmethod
+    def _styles_hash(document) -> Optional[str]:
+        """Hash of styles.xml, heading rules depend on style names"""
+        if document is None:
+            return None
+        styles = document.styles.element
+        content = etree.tostring(styles, method="c14n", exclusive=True)
+        return hashlib.blake2b(content, digest_size=16).hexdigest()
@@ -0,0 +1,182 @@
+"""
+Cross-check of in-text citations against the reference list
+
+The References section is parsed once into a hash index keyed by the
+normalized surname of the first author and the year, so every citation is
+looked up in constant time and the whole check is linear in the document.
+"""
+import re
+import unicodedata
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+CITATION_PATTERN = re.compile(r"\(([^()]+), (\d{4})(, p\. \d+)?\)")
+REFERENCE_HEADINGS = {"references", "reference list", "bibliography"}
+# "Smith, J. A., & Jones, B. (2019). Title" or "Smith, J. (2019, May 3). Title"
+REFERENCE_PATTERN = re.compile(r"^(?P<authors>.+?)\s*\((?P<year>\d{4})[a-z]?[,)]")
+CITED_WORK = re.compile(r"^(?P<authors>.+?),\s*(?P<year>\d{4})[a-z]?$")
+INITIALS = re.compile(r"^(?:[A-Z]\.\s*-?)+$")
+ET_AL = re.compile(r"\s+et al\.?$")
+AUTHOR_SEPARATOR = re.compile(r",|&|\band\b")
+
+ReferenceKey = Tuple[str, str]
+
+
+def normalize_name(name: str) -> str:
+    """Surname without case, accents and punctuation"""
+    name = unicodedata.normalize("NFKD", name)
+    name = "".join(char for char in name if not unicodedata.combining(char))
+    return re.sub(r"[^\w ]", "", name).strip().casefold()
+
+
+def reference_surnames(authors: str) -> List[str]:
+    """Surnames of the reference authors, initials are dropped"""
+    parts = (part.strip() for part in AUTHOR_SEPARATOR.split(authors))
+    return [
+        normalize_name(part) for part in parts
+        if part and part != "..." and not INITIALS.match(part)
+    ]
+
+
+def cited_surnames(authors: str) -> Tuple[List[str], bool]:
+    """Surnames of cited authors and whether the list is shortened by et al."""
+    authors = authors.strip()
+    et_al = bool(ET_AL.search(authors))
+    authors = ET_AL.sub("", authors)
+    surnames = [
+        normalize_name(part) for part in AUTHOR_SEPARATOR.split(authors)
+        if part.strip()
+    ]
+    return surnames, et_al
+
+
+@dataclass
+class Reference:
+    text: str
+    paragraph: int
+    surnames: List[str]
+    year: str
+    cited: bool = False
+
+
+@dataclass
+class Citation:
+    text: str
+    author: str
+    year: str
+    surnames: List[str]
+    et_al: bool
+    paragraphs: List[int] = field(default_factory=list)
+
+
+class ReferenceIndex:
+    """Reference list entries by (first author surname, year)"""
+
+    def __init__(self):
+        self.references: List[Reference] = []
+        self.by_key: Dict[ReferenceKey, List[Reference]] = defaultdict(list)
+
+    def add(self, paragraph: int, text: str) -> Optional[Reference]:
+        match = REFERENCE_PATTERN.match(text.strip())
+        if not match:
+            return None
+        surnames = reference_surnames(match.group("authors"))
+        if not surnames:
+            return None
+        reference = Reference(text.strip(), paragraph, surnames, match.group("year"))
+        self.references.append(reference)
+        self.by_key[(surnames[0], reference.year)].append(reference)
+        return reference
+
+    def find(self, citation: Citation) -> List[Reference]:
+        """References matching the citation, several for ambiguous ones"""
+        if not citation.surnames:
+            return []
+        candidates = self.by_key.get((citation.surnames[0], citation.year), [])
+        if citation.et_al:
+            return candidates
+        count = len(citation.surnames)
+        return [
+            reference for reference in candidates
+            if reference.surnames[:count] == citation.surnames
+        ]
+
+
+class CitationCrossCheck:
+    """Collect citations and references paragraph by paragraph, then compare"""
+
+    def __init__(self):
+        self.index = ReferenceIndex()
+        self.citations: Dict[Tuple[Tuple[str, ...], bool, str], Citation] = {}
+        self.references_found = False
+        self._in_references = False
+
+    def add_paragraph(self, paragraph: int, text: str, is_heading: bool) -> None:
+        stripped = text.strip()
+        if stripped.lower().rstrip(":") in REFERENCE_HEADINGS:
+            self.references_found = True
+            self._in_references = True
+            return
+        if self._in_references:
+            if not is_heading:
+                if stripped:
+                    self.index.add(paragraph, stripped)
+                return
+            self._in_references = False
+        self._add_citations(paragraph, text)
+
+    def _add_citations(self, paragraph: int, text: str) -> None:
+        for match in CITATION_PATTERN.finditer(text):
+            # "(Smith, 2019; Lee & Park, 2020)" cites two works
+            authors, year, _ = match.groups()
+            for work in f"{authors}, {year}".split(";"):
+                cited = CITED_WORK.match(work.strip())
+                if not cited:
+                    continue
+                surnames, et_al = cited_surnames(cited.group("authors"))
+                key = (tuple(surnames), et_al, cited.group("year"))
+                citation = self.citations.get(key)
+                if citation is None:
+                    citation = Citation(
+                        match.group(0), cited.group("authors").strip(),
+                        cited.group("year"), surnames, et_al,
+                    )
+                    self.citations[key] = citation
+                citation.paragraphs.append(paragraph)
+
+    def issues(self) -> List[dict]:
+        """Citations without reference and references which are never cited"""
+        if not self.references_found:
+            if not self.citations:
+                return []
+            return [{
+                "type": "missing_reference_list",
+                "description": "Document has citations but no References section.",
+            }]
+
+        issues = []
+        for citation in self.citations.values():
+            references = self.index.find(citation)
+            for reference in references:
+                reference.cited = True
+            if not references:
+                issues.append({
+                    "type": "missing_reference",
+                    "description": f"Citation {citation.author}, {citation.year} "
+                                   f"is not in the reference list.",
+                    "author": citation.author,
+                    "year": int(citation.year),
+                    "paragraphs": citation.paragraphs,
+                })
+        for reference in self.index.references:
+            if not reference.cited:
+                issues.append({
+                    "type": "unused_reference",
+                    "description": f"Reference is not cited in the text: "
+                                   f"'{reference.text}'",
+                    "reference": reference.text,
+                    "year": int(reference.year),
+                    "paragraph": reference.paragraph,
+                })
+        return issues
@@ -0,0 +1,150 @@
+"""
+Compiled magazine rule sets for the Custom style
+
+A rule set definition (JSON/YAML stored in the rule_sets table) is validated
+and compiled once into a RulePlan: regexes are precompiled and style values are
+resolved into python-docx units. Plans are cached by rule set id and version,
+so processing a document never parses the configuration again.
+"""
+import re
+from dataclasses import dataclass
+from typing import Dict, Optional, Pattern, Tuple
+
+from docx.enum.text import WD_ALIGN_PARAGRAPH
+from docx.shared import Inches, Length, Pt
+from pydantic import ValidationError
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from magazines.cache import magazine_cache
+from rule_sets.models import RuleSet
+from rule_sets.schemas import RuleSetDefinition
+from services.cache.ttl_cache import TTLCache
+from settings.config import RULE_PLAN_CACHE_SIZE
+
+ALIGNMENTS = {
+    "left": WD_ALIGN_PARAGRAPH.LEFT,
+    "center": WD_ALIGN_PARAGRAPH.CENTER,
+    "right": WD_ALIGN_PARAGRAPH.RIGHT,
+    "justify": WD_ALIGN_PARAGRAPH.JUSTIFY,
+}
+
+
+@dataclass(frozen=True)
+class CitationPlan:
+    regex: Pattern
+    issue: str
+    replace: Optional[str]
+
+
+@dataclass(frozen=True)
+class HeadingPlan:
+    alignment: Optional[WD_ALIGN_PARAGRAPH]
+    bold: Optional[bool]
+    italic: Optional[bool]
+    title_case: bool
+    font_size: Optional[Length]
+
+
+@dataclass(frozen=True)
+class RulePlan:
+    rule_set_id: int
+    version: int
+    font_name: Optional[str]
+    font_size: Optional[Length]
+    margins: Optional[Tuple[Length, Length, Length, Length]]
+    line_spacing: Optional[float]
+    space_before: Optional[Length]
+    space_after: Optional[Length]
+    headings: Dict[str, HeadingPlan]
+    citations: Tuple[CitationPlan, ...]
+
+
+_plans = TTLCache(maxsize=RULE_PLAN_CACHE_SIZE, ttl=float("inf"))
+
+
+def compile_rule_set(rule_set_id: int, version: int, definition: dict) -> RulePlan:
+    """Validate rule set definition and compile it into executable plan"""
+    try:
+        rules = RuleSetDefinition.model_validate(definition)
+    except ValidationError as e:
+        raise ValueError(f"Invalid rule set: {e}")
+
+    font = rules.font
+    spacing = rules.paragraph_spacing
+    margins = rules.margins
+    return RulePlan(
+        rule_set_id=rule_set_id,
+        version=version,
+        font_name=font.name if font else None,
+        font_size=Pt(font.size) if font and font.size else None,
+        margins=(
+            Inches(margins.top), Inches(margins.bottom),
+            Inches(margins.left), Inches(margins.right),
+        ) if margins else None,
+        line_spacing=rules.line_spacing,
+        space_before=_points(spacing.before) if spacing else None,
+        space_after=_points(spacing.after) if spacing else None,
+        headings={
+            f"Heading {level}": HeadingPlan(
+                alignment=ALIGNMENTS[heading.alignment.value]
+                if heading.alignment else None,
+                bold=heading.bold,
+                italic=heading.italic,
+                title_case=heading.title_case,
+                font_size=_points(heading.font_size),
+            )
+            for level, heading in rules.headings.items()
+        },
+        citations=tuple(_compile_citation(citation) for citation in rules.citations),
+    )
+
+
+def get_rule_plan(rule_set_id: int, version: int, definition: dict) -> RulePlan:
+    """Get compiled plan for rule set version, compile it on first use"""
+    key = (rule_set_id, version)
+    plan = _plans.get(key)
+    if plan is None:
+        plan = compile_rule_set(rule_set_id, version, definition)
+        _plans.set(key, plan)
+    return plan
+
+
+async def load_rule_plan(session: AsyncSession, magazine_id: int) -> RulePlan:
+    """Get compiled plan of the rule set attached to magazine"""
+    magazine = await magazine_cache.get(session, magazine_id)
+    if not magazine or not magazine.get("rule_set_id"):
+        raise ValueError("Magazine has no rule set for Custom style.")
+
+    result = await session.execute(
+        select(RuleSet.c.id, RuleSet.c.version).where(
+            RuleSet.c.id == magazine["rule_set_id"]
+        )
+    )
+    rule_set = result.fetchone()
+    if not rule_set:
+        raise ValueError("Rule set not found.")
+
+    plan = _plans.get((rule_set.id, rule_set.version))
+    if plan is not None:
+        return plan
+
+    # definition is loaded only when this version was not compiled yet
+    result = await session.execute(
+        select(RuleSet.c.definition).where(RuleSet.c.id == rule_set.id)
+    )
+    return get_rule_plan(rule_set.id, rule_set.version, result.scalar())
+
+
+def _compile_citation(citation) -> CitationPlan:
+    try:
+        regex = re.compile(citation.pattern)
+        if citation.replace is not None:
+            regex.sub(citation.replace, "")
+    except re.error as e:
+        raise ValueError(f"Invalid citation pattern '{citation.pattern}': {e}")
+    return CitationPlan(regex=regex, issue=citation.issue, replace=citation.replace)
+
+
+def _points(value: Optional[float]) -> Optional[Length]:
+    return Pt(value) if value is not None else None
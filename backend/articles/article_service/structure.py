@@ -0,0 +1,119 @@
+"""
+Structure of a document extracted once while it is processed
+
+The main document part is read with lxml iterparse, so extraction needs
+little memory and works for documents of any size. Body paragraphs are
+counted the same way as ``Document.paragraphs`` of python-docx.
+"""
+import re
+import zipfile
+from typing import Dict, List, Optional
+
+from lxml import etree
+
+from articles.article_service.document_work_apa import CITATION_PATTERN
+from articles.article_service.package_info import (
+    STYLES, W_NS, main_document_name, related_part_name,
+)
+
+W_BODY = f"{{{W_NS}}}body"
+W_P = f"{{{W_NS}}}p"
+W_T = f"{{{W_NS}}}t"
+W_TBL = f"{{{W_NS}}}tbl"
+W_DRAWING = f"{{{W_NS}}}drawing"
+W_STYLE = f"{{{W_NS}}}style"
+W_NAME = f"{{{W_NS}}}name"
+W_VAL = f"{{{W_NS}}}val"
+W_STYLE_ID = f"{{{W_NS}}}styleId"
+PARAGRAPH_STYLE = etree.XPath("./w:pPr/w:pStyle/@w:val", namespaces={"w": W_NS})
+
+HEADING_NAME = re.compile(r"heading (\d)", re.IGNORECASE)
+
+# structure of documents processed before this version has to be extracted again
+STRUCTURE_VERSION = 1
+
+
+def extract_structure(path: str, texts: Optional[List[str]] = None) -> dict:
+    """Outline, counts and citations of the document, paragraph text goes to texts"""
+    with zipfile.ZipFile(path) as package:
+        document_name = main_document_name(package)
+        styles_name = related_part_name(package, document_name, STYLES)
+        headings = _heading_levels(package.read(styles_name)) if styles_name else {}
+
+        structure = {
+            "version": STRUCTURE_VERSION,
+            "paragraphs": 0,
+            "words": 0,
+            "tables": 0,
+            "figures": 0,
+            "outline": [],
+            "citations": [],
+        }
+        with package.open(document_name) as stream:
+            for _, element in etree.iterparse(stream, huge_tree=True):
+                parent = element.getparent()
+                if parent is None or parent.tag != W_BODY:
+                    continue
+                _add_element(structure, element, headings, texts)
+                # processed body elements are not needed any more
+                element.clear()
+                while element.getprevious() is not None:
+                    del parent[0]
+    return structure
+
+
+def _add_element(structure: dict, element, headings: Dict[str, int],
+                 texts: Optional[List[str]]) -> None:
+    structure["figures"] += sum(1 for _ in element.iter(W_DRAWING))
+    if element.tag == W_TBL:
+        structure["tables"] += 1
+        return
+    if element.tag != W_P:
+        return
+
+    index = structure["paragraphs"]
+    structure["paragraphs"] += 1
+    text = "".join(t.text or "" for t in element.iter(W_T))
+    structure["words"] += len(text.split())
+    if texts is not None and text:
+        texts.append(text)
+
+    style = PARAGRAPH_STYLE(element)
+    level = headings.get(style[0]) if style else None
+    if level is not None and text.strip():
+        structure["outline"].append(
+            {"level": level, "text": text.strip(), "paragraph": index}
+        )
+
+    for match in CITATION_PATTERN.finditer(text):
+        author, year, page = match.groups()
+        structure["citations"].append({
+            "text": match.group(0),
+            "author": author.strip(),
+            "year": int(year),
+            "page": _page_number(page),
+            "paragraph": index,
+        })
+
+
+def _heading_levels(styles_xml: bytes) -> Dict[str, int]:
+    """Outline level of heading styles by style id, title is level 0"""
+    levels = {}
+    for style in etree.fromstring(styles_xml).iter(W_STYLE):
+        name = style.find(W_NAME)
+        if name is None:
+            continue
+        name = name.get(W_VAL, "")
+        match = HEADING_NAME.fullmatch(name)
+        if match:
+            levels[style.get(W_STYLE_ID)] = int(match.group(1))
+        elif name.lower() == "title":
+            levels[style.get(W_STYLE_ID)] = 0
+    return levels
+
+
+def _page_number(page: Optional[str]) -> Optional[int]:
+    """Page of citation like ', p. 12'"""
+    if not page:
+        return None
+    return int(page.rsplit(" ", 1)[1])
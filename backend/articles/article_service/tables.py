@@ -0,0 +1,129 @@
+"""
+APA borders and captions of tables
+
+APA tables have only horizontal borders: above and below the table and
+below the header row. Every w:tbl is handled with one XPath query over its
+properties, header row cells and cell borders, so the cost grows linearly
+with the number of cells. Captions are the bold table number and the italic
+title in the paragraphs right above the table.
+"""
+import re
+
+from docx.oxml import parse_xml
+from docx.oxml.ns import nsdecls, qn
+
+CAPTION_PATTERN = re.compile(
+    r"^\s*Table\s+(\d+)\s*[:.\-–—]?\s*(.*?)\s*$", re.IGNORECASE
+)
+# longer paragraphs above a table are text, not its title
+TITLE_MAX_WORDS = 20
+
+W_TBL = qn("w:tbl")
+W_TBL_PR = qn("w:tblPr")
+W_TC = qn("w:tc")
+W_P = qn("w:p")
+W_VAL = qn("w:val")
+
+TABLE_QUERY = "./w:tblPr | ./w:tr[1]/w:tc | ./w:tr/w:tc/w:tcPr/w:tcBorders"
+# sides of w:tblBorders in schema order, True for a single line
+TABLE_BORDERS = (
+    ("top", True), ("left", False), ("bottom", True), ("right", False),
+    ("insideH", False), ("insideV", False),
+)
+SINGLE_LINE = 'w:val="single" w:sz="4" w:space="0" w:color="auto"'
+NO_LINE = 'w:val="nil"'
+# elements following w:tblBorders in w:tblPr and w:tcBorders in w:tcPr
+TBL_BORDERS_SUCCESSORS = (
+    "w:shd", "w:tblLayout", "w:tblCellMar", "w:tblLook", "w:tblCaption",
+    "w:tblDescription", "w:tblPrChange",
+)
+TC_BORDERS_SUCCESSORS = (
+    "w:shd", "w:noWrap", "w:tcMar", "w:textDirection", "w:tcFitText", "w:vAlign",
+    "w:hideMark", "w:headers", "w:cellIns", "w:cellDel", "w:cellMerge",
+    "w:tcPrChange",
+)
+
+
+def format_table_borders(tbl) -> bool:
+    """Set APA borders of the table, return True if anything changed"""
+    changed = False
+    header_cells = set()
+    for element in tbl.xpath(TABLE_QUERY):
+        if element.tag == W_TBL_PR:
+            changed |= _table_borders(element)
+        elif element.tag == W_TC:
+            header_cells.add(element)
+        elif element.getparent().getparent() in header_cells:
+            if not _is_header_border(element):
+                element.getparent().remove(element)
+                changed = True
+        else:
+            # cell borders override the borders of the table
+            element.getparent().remove(element)
+            changed = True
+
+    for cell in header_cells:
+        changed |= _header_border(cell)
+    return changed
+
+
+def _table_borders(tbl_pr) -> bool:
+    borders = tbl_pr.find(qn("w:tblBorders"))
+    if borders is not None and all(
+        _border_value(borders, side) == ("single" if line else "nil")
+        for side, line in TABLE_BORDERS
+    ):
+        return False
+
+    if borders is not None:
+        tbl_pr.remove(borders)
+    sides = "".join(
+        f"<w:{side} {SINGLE_LINE if line else NO_LINE}/>"
+        for side, line in TABLE_BORDERS
+    )
+    tbl_pr.insert_element_before(
+        parse_xml(f"<w:tblBorders {nsdecls('w')}>{sides}</w:tblBorders>"),
+        *TBL_BORDERS_SUCCESSORS,
+    )
+    return True
+
+
+def _border_value(borders, side: str):
+    border = borders.find(qn(f"w:{side}"))
+    return border.get(W_VAL) if border is not None else None
+
+
+def _is_header_border(tc_borders) -> bool:
+    """Only the line below the header row"""
+    return len(tc_borders) == 1 and _border_value(tc_borders, "bottom") == "single"
+
+
+def _header_border(tc) -> bool:
+    tc_pr = tc.get_or_add_tcPr()
+    if tc_pr.find(qn("w:tcBorders")) is not None:
+        return False
+    tc_pr.insert_element_before(
+        parse_xml(
+            f"<w:tcBorders {nsdecls('w')}><w:bottom {SINGLE_LINE}/></w:tcBorders>"
+        ),
+        *TC_BORDERS_SUCCESSORS,
+    )
+    return True
+
+
+def previous_paragraph(element):
+    """Paragraph right before the element, None if it is not a paragraph"""
+    previous = element.getprevious()
+    return previous if previous is not None and previous.tag == W_P else None
+
+
+def is_table_title(text: str) -> bool:
+    """Short text without final period, like a title"""
+    text = text.strip()
+    return bool(text) and len(text.split()) <= TITLE_MAX_WORDS \
+        and not text.endswith(".")
+
+
+def caption_paragraph():
+    """Empty paragraph kept on the page of the table"""
+    return parse_xml(f"<w:p {nsdecls('w')}><w:pPr><w:keepNext/></w:pPr></w:p>")
@@ -0,0 +1,227 @@
+"""
+Offline batch check of a directory of documents
+
+Documents are checked in worker processes, without the API and the database.
+The updated document and a JSON report of every file are written to the
+output directory with the same relative path, summary.json aggregates the
+reports. With --resume files whose report matches the size and modification
+time of the source are skipped.
+
+    python -m articles.batch archive/ checked/ --style APA
+    python -m articles.batch archive/ checked/ --resume
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from typing import Callable, List, Optional
+
+from articles.article_service.document_work_abstract import RULE_ENGINE_VERSION
+from articles.article_service.mapper_type import DocumentWorkFlowFactory
+from services.workers.pool import RecyclingPool
+from settings.config import WORKER_MAX_JOBS, WORKER_MAX_RSS
+
+import logging
+from services.logger.logger import Logger
+
+logger = Logger(__name__, level=logging.INFO, log_to_file=True,
+                filename='batch.log').get_logger()
+
+# Custom style needs the rule set of a magazine from the database
+STYLES = ("APA",)
+REPORT_SUFFIX = ".report.json"
+SUMMARY_NAME = "summary.json"
+
+
+def find_documents(input_dir: str) -> List[str]:
+    """Relative paths of .docx files under input_dir"""
+    found = []
+    for directory, _, files in os.walk(input_dir):
+        for name in files:
+            # Word lock files start with ~$
+            if name.lower().endswith(".docx") and not name.startswith("~$"):
+                found.append(os.path.relpath(os.path.join(directory, name), input_dir))
+    return sorted(found)
+
+
+def report_path(output_dir: str, relative: str) -> str:
+    return os.path.join(output_dir, os.path.splitext(relative)[0] + REPORT_SUFFIX)
+
+
+def _source_stamp(source: str) -> dict:
+    stat = os.stat(source)
+    return {"source_size": stat.st_size, "source_mtime": stat.st_mtime}
+
+
+def read_report(path: str) -> Optional[dict]:
+    try:
+        with open(path) as report:
+            return json.load(report)
+    except (OSError, ValueError):
+        return None
+
+
+def is_done(input_dir: str, output_dir: str, relative: str, style: str) -> bool:
+    """Report of the file exists and was made from the current source"""
+    report = read_report(report_path(output_dir, relative))
+    if report is None or report.get("style") != style:
+        return False
+    stamp = _source_stamp(os.path.join(input_dir, relative))
+    return all(report.get(key) == value for key, value in stamp.items())
+
+
+def _write_json(path: str, data: dict) -> None:
+    """Write through a temp file, a killed run leaves no partial report"""
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w") as output:
+        json.dump(data, output, indent=2, ensure_ascii=False)
+    os.replace(temp_path, path)
+
+
+def _issue_count(report: dict) -> int:
+    return sum(
+        len(group.get("issues", [])) + len(group.get("required_actions", []))
+        for group in report.values() if isinstance(group, dict)
+    )
+
+
+async def check_file(style: str, input_dir: str, output_dir: str, relative: str,
+                     progress: Callable[[str], None] = None) -> dict:
+    """Check one document, write the updated document and its report"""
+    input_dir, output_dir = os.path.abspath(input_dir), os.path.abspath(output_dir)
+    source = os.path.join(input_dir, relative)
+    target = os.path.join(output_dir, relative)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+
+    started = time.monotonic()
+    doc = DocumentWorkFlowFactory.create_workflow(style=style, path=source)
+    doc.progress_callback = progress
+    await doc.start_flow()
+    doc.save_to(target)
+
+    issues = await doc.create_report()
+    report = {
+        "source": relative,
+        "output": relative,
+        "style": style,
+        "rule_version": RULE_ENGINE_VERSION,
+        **_source_stamp(source),
+        "seconds": round(time.monotonic() - started, 3),
+        "issue_count": _issue_count(issues),
+        "report": issues,
+    }
+    # the report is written last, it marks the file as done
+    _write_json(report_path(output_dir, relative), report)
+    return report
+
+
+def run_check_file(*args, progress: Callable[[str], None] = None, **kwargs) -> dict:
+    """check_file for a worker process"""
+    return asyncio.run(check_file(*args, progress=progress, **kwargs))
+
+
+def write_summary(output_dir: str, files: List[str], failures: dict,
+                  style: str, seconds: float) -> dict:
+    """Aggregate reports of all files, including the ones done by earlier runs"""
+    checked = []
+    for relative in files:
+        report = read_report(report_path(output_dir, relative))
+        if report is not None and relative not in failures:
+            checked.append(report)
+    summary = {
+        "style": style,
+        "rule_version": RULE_ENGINE_VERSION,
+        "files": len(files),
+        "checked": len(checked),
+        "failed": len(failures),
+        "issues": sum(report["issue_count"] for report in checked),
+        "seconds": round(seconds, 3),
+        "failures": failures,
+        "documents": {report["source"]: report["issue_count"] for report in checked},
+    }
+    _write_json(os.path.join(output_dir, SUMMARY_NAME), summary)
+    return summary
+
+
+def _print_progress(done: int, total: int, failed: int, started: float) -> None:
+    elapsed = time.monotonic() - started
+    rate = done / elapsed if elapsed > 0 else 0.0
+    left = round((total - done) / rate) if rate else None
+    print(
+        f"{done}/{total} files, {failed} failed, {rate:.2f} files/s, {left} s left",
+        flush=True,
+    )
+
+
+async def run_batch(input_dir: str, output_dir: str, style: str = "APA",
+                    workers: int = None, resume: bool = False,
+                    on_progress: Callable[[int, int, int, float], None] = None) -> dict:
+    """Check all documents of input_dir in parallel, return the summary"""
+    # workers get absolute paths, they do not depend on the working directory
+    input_dir, output_dir = os.path.abspath(input_dir), os.path.abspath(output_dir)
+    started = time.monotonic()
+    files = find_documents(input_dir)
+    pending = [
+        relative for relative in files
+        if not (resume and is_done(input_dir, output_dir, relative, style))
+    ]
+    logger.info(
+        f"Batch of {len(files)} files from {input_dir}, "
+        f"{len(files) - len(pending)} already done"
+    )
+    os.makedirs(output_dir, exist_ok=True)
+
+    workers = workers or os.cpu_count() or 1
+    pool = RecyclingPool(workers, WORKER_MAX_JOBS, WORKER_MAX_RSS)
+    # jobs are submitted as workers get free, so progress is steady
+    slots = asyncio.Semaphore(workers * 2)
+    failures = {}
+    done = 0
+
+    async def check(relative: str) -> None:
+        nonlocal done
+        async with slots:
+            try:
+                await pool.run(run_check_file, style, input_dir, output_dir, relative)
+            except Exception as e:
+                logger.error(f"Error checking {relative}: {e}")
+                failures[relative] = f"{type(e).__name__}: {e}"
+        done += 1
+        if on_progress is not None:
+            on_progress(done, len(pending), len(failures), started)
+
+    try:
+        await asyncio.gather(*[check(relative) for relative in pending])
+    finally:
+        pool.shutdown()
+
+    summary = write_summary(
+        output_dir, files, failures, style, time.monotonic() - started
+    )
+    logger.info(
+        f"Batch done: {summary['checked']} checked, {summary['failed']} failed"
+    )
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check a directory of documents")
+    parser.add_argument("input_dir", help="directory with .docx files")
+    parser.add_argument("output_dir", help="directory for documents and reports")
+    parser.add_argument("--style", choices=STYLES, default="APA")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="worker processes, all cores by default")
+    parser.add_argument("--resume", action="store_true",
+                        help="skip files already checked by an earlier run")
+    arguments = parser.parse_args()
+    result = asyncio.run(run_batch(
+        arguments.input_dir, arguments.output_dir, arguments.style,
+        arguments.workers, arguments.resume, on_progress=_print_progress,
+    ))
+    print(
+        f"{result['checked']}/{result['files']} files checked, "
+        f"{result['failed']} failed, {result['issues']} issues, "
+        f"summary in {os.path.join(arguments.output_dir, SUMMARY_NAME)}",
+        flush=True,
+    )
@@ -0,0 +1,97 @@
+"""
+Article processing status events
+
+Status changes are published through pub/sub, so a client connected to any
+worker process gets events of documents processed by all of them. Clients
+receive them as server-sent events instead of polling the articles table.
+"""
+import asyncio
+import json
+from collections import deque
+from typing import Callable, Iterable, Optional
+
+from services.pubsub.pubsub import pubsub
+
+ARTICLE_STATUS_CHANNEL = "article_status"
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+FINAL_STATUSES = (DONE, FAILED)
+
+KEEPALIVE_INTERVAL = 15
+# buffered events of a slow client, terminal events are kept beyond the limit
+EVENTS_QUEUE_SIZE = 100
+
+
+async def publish_status(article_id: int, user_id, status: str, **details) -> None:
+    """Send status event of the article to all processes"""
+    event = {"article_id": article_id, "user_id": str(user_id), "status": status}
+    event.update(details)
+    await pubsub.publish(ARTICLE_STATUS_CHANNEL, json.dumps(event))
+
+
+def format_event(event: dict) -> str:
+    """Server-sent event message"""
+    return f"event: {event['status']}\ndata: {json.dumps(event)}\n\n"
+
+
+class StatusSubscription:
+    """Status events accepted by the filter, buffered until they are streamed"""
+
+    def __init__(self, accept: Callable[[dict], bool],
+                 until: Optional[Callable[[dict], bool]] = None):
+        self.accept = accept
+        self.until = until
+        self._events = deque()
+        self._ready = asyncio.Event()
+        # subscribed right away, so events sent while the request is handled are kept
+        self._unsubscribe = pubsub.subscribe(ARTICLE_STATUS_CHANNEL, self._on_event)
+
+    def close(self) -> None:
+        """Stop receiving events"""
+        self._unsubscribe()
+
+    async def stream(self, initial: Iterable[dict] = ()):
+        """Server-sent event messages, comments are sent to keep connection alive"""
+        try:
+            for event in initial:
+                yield format_event(event)
+                if self.until is not None and self.until(event):
+                    return
+
+            while True:
+                if not self._events:
+                    self._ready.clear()
+                    try:
+                        await asyncio.wait_for(self._ready.wait(), KEEPALIVE_INTERVAL)
+                    except asyncio.TimeoutError:
+                        yield ": keepalive\n\n"
+                    continue
+
+                event = self._events.popleft()
+                yield format_event(event)
+                if self.until is not None and self.until(event):
+                    return
+        finally:
+            self.close()
+
+    def _on_event(self, payload: str) -> None:
+        event = json.loads(payload)
+        if not self.accept(event):
+            return
+        if len(self._events) >= EVENTS_QUEUE_SIZE and not self._drop_progress():
+            # only terminal events are buffered, they are never dropped
+            if event["status"] not in FINAL_STATUSES:
+                return
+        self._events.append(event)
+        self._ready.set()
+
+    def _drop_progress(self) -> bool:
+        """Drop the oldest buffered event which is not terminal"""
+        for index, event in enumerate(self._events):
+            if event["status"] not in FINAL_STATUSES:
+                del self._events[index]
+                return True
+        return False
@@ -0,0 +1,293 @@
+"""
+Processing jobs shared between the API and separate worker processes
+
+With the embedded worker, jobs go to the fair scheduler of the API process.
+Otherwise the API stores them in the processing_jobs table and wakes the
+workers through pub/sub. Workers claim jobs with SKIP LOCKED in the fair
+order of the scheduler: the start tag of a job is the cost of the jobs of
+its user queued or running before it, so one user's large documents do not
+hold back small documents of others. Workers keep renewing the lease of
+running jobs and delete them when done, so jobs of a worker which died are
+taken by another one. Every claim counts as an attempt, the article of a job
+which failed or was lost JOB_MAX_ATTEMPTS times is marked failed. Recheck
+runs are queued the same way with no cost, a failed attempt goes on from the
+checkpoint of the run.
+
+The API process does not run jobs, so workers publish the processing speed
+of finished jobs and the API estimates the queue wait with it and with the
+number of jobs all workers run at once.
+"""
+import asyncio
+import os
+import socket
+import time
+from datetime import datetime, timedelta
+from functools import partial
+from typing import Dict, List, Optional
+
+from sqlalchemy import delete, func, or_, select, update
+
+from articles.models import ProcessingJobs
+from articles.recheck import recheck_job, run_recheck
+from articles.tasks import ProcessingFailed, document_process_job, save_failure
+from services.pubsub.pubsub import pubsub
+from services.scheduler.scheduler import scheduler
+from settings.config import (
+    EMBEDDED_WORKER, JOB_LEASE, JOB_MAX_ATTEMPTS, JOB_POLL_INTERVAL, JOB_WORKERS,
+    SHUTDOWN_TIMEOUT, WORKER_CONCURRENCY,
+)
+from settings.database import async_session_maker
+
+import logging
+from services.logger.logger import Logger
+
+logger = Logger(__name__, level=logging.INFO, log_to_file=True,
+                filename='tasks.log').get_logger()
+
+JOBS_CHANNEL = "processing_jobs"
+# seconds per cost unit of jobs finished by workers
+SPEED_CHANNEL = "processing_speed"
+
+# recheck runs of the embedded worker, kept until they finish
+_recheck_tasks = set()
+
+
+async def admit_job(session, cost: float) -> None:
+    """Raise QueueFull if the job would wait too long"""
+    if EMBEDDED_WORKER:
+        scheduler.admit(cost)
+        return
+    pending = await session.scalar(select(func.coalesce(func.sum(
+        ProcessingJobs.c.cost), 0.0)))
+    scheduler.admit(cost, pending=pending,
+                    concurrency=WORKER_CONCURRENCY * JOB_WORKERS)
+
+
+async def submit_job(session, user_id, cost: float, process: dict) -> None:
+    """Queue processing of the article"""
+    if EMBEDDED_WORKER:
+        scheduler.submit(user_id, cost, partial(document_process_job, **process))
+        return
+    await session.execute(ProcessingJobs.insert().values(
+        article_id=process["article_id"], user_id=user_id, cost=cost, options=process,
+    ))
+    await session.commit()
+    await pubsub.publish(JOBS_CHANNEL)
+
+
+async def submit_recheck(session, user_id, run_id: int) -> None:
+    """Queue the recheck run"""
+    if EMBEDDED_WORKER:
+        task = asyncio.ensure_future(recheck_job(run_id))
+        _recheck_tasks.add(task)
+        task.add_done_callback(_recheck_tasks.discard)
+        return
+    await session.execute(ProcessingJobs.insert().values(
+        recheck_run_id=run_id, user_id=user_id, cost=0.0, options={},
+    ))
+    await session.commit()
+    await pubsub.publish(JOBS_CHANNEL)
+
+
+def _lease_expired():
+    return datetime.utcnow() - timedelta(seconds=JOB_LEASE)
+
+
+def _is_free(claimed_at):
+    return or_(claimed_at.is_(None), claimed_at < _lease_expired())
+
+
+async def claim_jobs(session, worker_id: str, limit: int) -> List[dict]:
+    """Take free jobs with the smallest start tags"""
+    # running jobs of the user count, they are still in the table
+    start = func.coalesce(func.sum(ProcessingJobs.c.cost).over(
+        partition_by=ProcessingJobs.c.user_id, order_by=ProcessingJobs.c.id,
+        rows=(None, -1),
+    ), 0.0)
+    candidates = select(
+        ProcessingJobs.c.id, ProcessingJobs.c.claimed_at, start.label("start")
+    ).subquery()
+    ordered = select(candidates.c.id).where(
+        _is_free(candidates.c.claimed_at)
+    ).order_by(candidates.c.start, candidates.c.id).limit(limit * 2)
+    ids = (await session.execute(ordered)).scalars().all()
+    if not ids:
+        return []
+
+    # rows taken by another worker meanwhile are skipped
+    result = await session.execute(
+        select(ProcessingJobs)
+        .where(ProcessingJobs.c.id.in_(ids), _is_free(ProcessingJobs.c.claimed_at))
+        .with_for_update(skip_locked=True)
+    )
+    jobs = sorted(result.mappings().all(), key=lambda job: ids.index(job["id"]))[:limit]
+    if jobs:
+        await session.execute(update(ProcessingJobs).where(
+            ProcessingJobs.c.id.in_([job["id"] for job in jobs])
+        ).values(claimed_by=worker_id, claimed_at=datetime.utcnow(),
+                 attempts=ProcessingJobs.c.attempts + 1))
+    await session.commit()
+    return [{**job, "attempts": job["attempts"] + 1} for job in jobs]
+
+
+class JobWorker:
+    """Run jobs from the processing_jobs table until stopped"""
+
+    def __init__(self, concurrency: int = WORKER_CONCURRENCY,
+                 poll_interval: float = JOB_POLL_INTERVAL, lease: float = JOB_LEASE,
+                 max_attempts: int = JOB_MAX_ATTEMPTS,
+                 session_maker=async_session_maker, process=document_process_job,
+                 recheck=run_recheck):
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.lease = lease
+        self.max_attempts = max_attempts
+        self.session_maker = session_maker
+        self.process = process
+        self.recheck = recheck
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._running: Dict[int, asyncio.Task] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stopping = False
+
+    def wake(self, payload: str = "") -> None:
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def stop(self) -> None:
+        """Stop claiming jobs, running ones are drained by run()"""
+        self._stopping = True
+        self.wake()
+
+    async def run(self, shutdown_timeout: float = SHUTDOWN_TIMEOUT) -> None:
+        self._wakeup = asyncio.Event()
+        unsubscribe = pubsub.subscribe(JOBS_CHANNEL, self.wake)
+        last_renewal = time.monotonic()
+        logger.info(f"Worker {self.worker_id} started")
+        try:
+            while not self._stopping:
+                self._wakeup.clear()
+                free = self.concurrency - len(self._running)
+                if free > 0:
+                    await self._claim(free)
+                if time.monotonic() - last_renewal > self.lease / 3:
+                    await self._renew()
+                    last_renewal = time.monotonic()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            unsubscribe()
+            await self._drain(shutdown_timeout)
+
+    async def _claim(self, limit: int) -> None:
+        try:
+            async with self.session_maker() as session:
+                jobs = await claim_jobs(session, self.worker_id, limit)
+        except Exception as e:
+            logger.error(f"Error claiming jobs: {e}")
+            return
+        for job in jobs:
+            task = asyncio.ensure_future(self._run_job(job))
+            self._running[job["id"]] = task
+
+    async def _run_job(self, job: dict) -> None:
+        try:
+            if job["attempts"] > self.max_attempts:
+                # earlier attempts never finished, their workers died
+                await self._fail(job, RuntimeError(
+                    f"Processing was interrupted {self.max_attempts} times"
+                ))
+                return
+            began = time.monotonic()
+            try:
+                if job["recheck_run_id"] is not None:
+                    await self.recheck(job["recheck_run_id"])
+                else:
+                    await self.process(**job["options"])
+            except Exception as e:
+                logger.error(
+                    f"Error in job {job['id']}, attempt {job['attempts']}: {e}"
+                )
+                if job["attempts"] < self.max_attempts:
+                    await self._release(job)
+                elif isinstance(e, ProcessingFailed):
+                    # the article is marked failed already
+                    await self._delete(job)
+                else:
+                    await self._fail(job, e)
+                return
+            await self._delete(job)
+            if job["cost"]:
+                await pubsub.publish(
+                    SPEED_CHANNEL, f"{(time.monotonic() - began) / job['cost']}"
+                )
+        except Exception as e:
+            logger.error(f"Error finishing job {job['id']}: {e}")
+        finally:
+            self._running.pop(job["id"], None)
+            # a slot is free
+            self.wake()
+
+    async def _delete(self, job: dict) -> None:
+        async with self.session_maker() as session:
+            await session.execute(
+                delete(ProcessingJobs).where(ProcessingJobs.c.id == job["id"])
+            )
+            await session.commit()
+
+    async def _release(self, job: dict) -> None:
+        """Give the job back to the queue for another attempt"""
+        async with self.session_maker() as session:
+            await session.execute(update(ProcessingJobs).where(
+                ProcessingJobs.c.id == job["id"]
+            ).values(claimed_by=None, claimed_at=None))
+            await session.commit()
+
+    async def _fail(self, job: dict, error: Exception) -> None:
+        """Mark the article failed and drop its job"""
+        logger.error(f"Job {job['id']} failed after {job['attempts']} attempts")
+        # an unfinished recheck run is resumed by starting it again
+        if job["article_id"] is not None:
+            async with self.session_maker() as session:
+                await save_failure(session, job["article_id"], job["user_id"], error)
+        await self._delete(job)
+
+    async def _renew(self) -> None:
+        """Extend the lease of running jobs"""
+        if not self._running:
+            return
+        try:
+            async with self.session_maker() as session:
+                await session.execute(update(ProcessingJobs).where(
+                    ProcessingJobs.c.id.in_(list(self._running))
+                ).values(claimed_at=datetime.utcnow()))
+                await session.commit()
+        except Exception as e:
+            logger.error(f"Error renewing job leases: {e}")
+
+    async def _drain(self, timeout: float) -> None:
+        """Let running jobs finish, give unfinished ones back to the queue"""
+        if self._running:
+            logger.info(f"Waiting for {len(self._running)} running jobs")
+            await asyncio.wait(list(self._running.values()), timeout=timeout)
+        unfinished = list(self._running)
+        for task in self._running.values():
+            task.cancel()
+        if unfinished:
+            async with self.session_maker() as session:
+                await session.execute(update(ProcessingJobs).where(
+                    ProcessingJobs.c.id.in_(unfinished)
+                ).values(claimed_by=None, claimed_at=None))
+                await session.commit()
+            logger.info(f"Jobs {unfinished} returned to the queue")
+        logger.info(f"Worker {self.worker_id} stopped")
+
+
+def observe_speed(payload: str) -> None:
+    """Speed of a job finished by a worker"""
+    scheduler.observe(float(payload))
+
+
+pubsub.subscribe(SPEED_CHANNEL, observe_speed)
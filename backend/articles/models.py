@@ -7,7 +7,8 @@ from sqlalchemy import (
     Integer, String,
     TIMESTAMP, ForeignKey,
     Boolean, MetaData,
-    JSON,
+    JSON, literal_column,
+    Float,
 )
 
 from auth.models import User
@@ -26,12 +27,76 @@ Articles = Table(
     metadata,
     Column('id', Integer, primary_key=True),
     Column('title', String, nullable=False),
-    Column('updated_file', String, nullable=True),
-    Column('original_file', String, nullable=True),
+    Column('updated_file', String, nullable=True, index=True),
+    Column('original_file', String, nullable=True, index=True),
     Column('user_id', ForeignKey(User.id)),
     Column('magazine_id', ForeignKey(Magazine.c.id)),
     Column('publish_date', TIMESTAMP, default=datetime.utcnow),
     Column('checked', Boolean, default=False, nullable=False),
     Column('list_issues', JSON, nullable=True),
-    Column('refactor_type', Enum(RefactorType), nullable=False)
+    Column('refactor_type', Enum(RefactorType), nullable=False),
+    Column('paragraph_hashes', JSON, nullable=True),
+    Column('status', String, nullable=True),
+    Column('rule_version', Integer, nullable=True, index=True),
+    # changed by every update, ETags of article responses are derived from it
+    Column('version', Integer, nullable=False, default=1, server_default='1',
+           onupdate=literal_column('version') + 1),
+    Column('updated_at', TIMESTAMP, default=datetime.utcnow,
+           onupdate=datetime.utcnow, index=True),
+)
+
+
+ArticleStructures = Table(
+    'article_structures',
+    metadata,
+    Column('article_id', ForeignKey('articles.id', ondelete='CASCADE'),
+           primary_key=True),
+    Column('version', Integer, nullable=False),
+    Column('paragraphs', Integer, nullable=False),
+    Column('words', Integer, nullable=False),
+    Column('tables', Integer, nullable=False),
+    Column('figures', Integer, nullable=False),
+    Column('outline', JSON, nullable=False),
+    Column('citations', JSON, nullable=False),
+    Column('created_at', TIMESTAMP, default=datetime.utcnow),
+)
+
+
+RecheckRuns = Table(
+    'recheck_runs',
+    metadata,
+    Column('id', Integer, primary_key=True),
+    Column('magazine_id', ForeignKey(Magazine.c.id), nullable=True),
+    Column('outdated', Boolean, default=False, nullable=False),
+    Column('rule_version', Integer, nullable=False),
+    Column('last_article_id', Integer, default=0, nullable=False),
+    Column('total', Integer, default=0, nullable=False),
+    Column('processed', Integer, default=0, nullable=False),
+    Column('failed', Integer, default=0, nullable=False),
+    Column('status', String, nullable=False),
+    Column('started_at', TIMESTAMP, default=datetime.utcnow),
+    Column('updated_at', TIMESTAMP, default=datetime.utcnow),
+    # process running the run, others do not start it while the lease is fresh
+    Column('claimed_by', String, nullable=True),
+    Column('claimed_at', TIMESTAMP, nullable=True),
+)
+
+
+# documents or recheck runs waiting for a processing worker, claimed rows have
+# a lease
+ProcessingJobs = Table(
+    'processing_jobs',
+    metadata,
+    Column('id', Integer, primary_key=True),
+    Column('article_id', ForeignKey('articles.id', ondelete='CASCADE'), nullable=True),
+    Column('recheck_run_id', ForeignKey('recheck_runs.id', ondelete='CASCADE'),
+           nullable=True),
+    Column('user_id', Integer, nullable=True),
+    Column('cost', Float, nullable=False),
+    Column('options', JSON, nullable=False),
+    Column('created_at', TIMESTAMP, default=datetime.utcnow),
+    Column('claimed_by', String, nullable=True),
+    Column('claimed_at', TIMESTAMP, nullable=True, index=True),
+    # claims of the job, jobs which keep failing or killing workers are dropped
+    Column('attempts', Integer, nullable=False, default=0, server_default='0'),
 )
@@ -0,0 +1,49 @@
+"""
+Statements of hot article queries, built once
+
+Constructing a statement on every request costs more than executing it from
+the compiled cache, so handlers execute these with bound parameters. The
+same SQL text also lets asyncpg reuse its prepared statements.
+"""
+from typing import List, Type
+
+from pydantic import BaseModel
+from sqlalchemy import Column, Table, bindparam, delete, func, select
+
+from articles.models import Articles, ArticleStructures
+from articles.schemas import ArticleDetail, ArticleSummary
+
+
+def projection(table: Table, model: Type[BaseModel]) -> List[Column]:
+    """Columns of the table named by the fields of the response model"""
+    return [table.c[name] for name in model.model_fields]
+
+
+ARTICLE_SUMMARIES = select(*projection(Articles, ArticleSummary)).order_by(
+    Articles.c.id
+)
+
+ARTICLE_DETAIL = select(*projection(Articles, ArticleDetail)).where(
+    Articles.c.id == bindparam("article_id")
+)
+
+# cheap queries for ETags, they do not load the rows
+ARTICLE_VERSION = select(Articles.c.version).where(
+    Articles.c.id == bindparam("article_id")
+)
+
+ARTICLES_VERSION = select(func.count(), func.max(Articles.c.updated_at)).select_from(
+    Articles
+)
+
+ARTICLE_BY_ID = select(Articles).where(Articles.c.id == bindparam("article_id"))
+
+STRUCTURE_BY_ARTICLE = select(ArticleStructures).where(
+    ArticleStructures.c.article_id == bindparam("article_id")
+)
+
+DELETE_ARTICLE = delete(Articles).where(Articles.c.id == bindparam("article_id"))
+
+DELETE_STRUCTURE = delete(ArticleStructures).where(
+    ArticleStructures.c.article_id == bindparam("article_id")
+)
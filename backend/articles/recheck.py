@@ -0,0 +1,294 @@
+"""
+Bulk re-check of processed articles after rule changes
+
+Articles of a magazine, or articles checked by an older rule engine, are
+checked again in the worker pool. Results are committed in chunks together
+with the checkpoint of the run, so an interrupted run started again with the
+same scope goes on after the last committed article. A process claims the
+run in the database before it checks articles and keeps renewing its lease,
+so a run is never checked by two processes at once. Runs started from the API
+go through the job queue like uploaded documents.
+
+    python -m articles.recheck --magazine 3
+    python -m articles.recheck --outdated
+"""
+import argparse
+import asyncio
+import os
+import socket
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+
+from sqlalchemy import func, insert, or_, select, update
+
+from articles.article_service.document_work_abstract import RULE_ENGINE_VERSION
+from articles.article_service.rule_plan import load_rule_plan
+from articles.models import Articles, RecheckRuns
+from articles.result_writer import write_result
+from articles.tasks import process_in_worker
+from services.workers.pool import processing_pool
+from settings.config import JOB_LEASE, RECHECK_CHUNK_SIZE
+from settings.database import async_session_maker
+
+import logging
+from services.logger.logger import Logger
+
+logger = Logger(__name__, level=logging.INFO, log_to_file=True,
+                filename='recheck.log').get_logger()
+
+RUNNING = "running"
+DONE = "done"
+
+
+def _scope(magazine_id: Optional[int], outdated: bool):
+    """Conditions of articles which belong to the run"""
+    conditions = [Articles.c.original_file.isnot(None)]
+    if magazine_id is not None:
+        conditions.append(Articles.c.magazine_id == magazine_id)
+    if outdated:
+        conditions.append(or_(
+            Articles.c.rule_version.is_(None),
+            Articles.c.rule_version < RULE_ENGINE_VERSION,
+        ))
+    return conditions
+
+
+async def start_run(session, magazine_id: Optional[int] = None,
+                    outdated: bool = False) -> dict:
+    """Unfinished run with the same scope, or a new one"""
+    result = await session.execute(select(RecheckRuns).where(
+        RecheckRuns.c.status == RUNNING,
+        RecheckRuns.c.outdated == outdated,
+        RecheckRuns.c.rule_version == RULE_ENGINE_VERSION,
+        RecheckRuns.c.magazine_id.is_(None) if magazine_id is None
+        else RecheckRuns.c.magazine_id == magazine_id,
+    ).order_by(RecheckRuns.c.id.desc()))
+    run = result.mappings().first()
+    if run is not None:
+        logger.info(f"Recheck run {run['id']} resumed after {run['last_article_id']}")
+        return dict(run)
+
+    total = await session.scalar(
+        select(func.count()).select_from(Articles).where(
+            *_scope(magazine_id, outdated)
+        )
+    )
+    result = await session.execute(insert(RecheckRuns).values(
+        magazine_id=magazine_id, outdated=outdated, rule_version=RULE_ENGINE_VERSION,
+        last_article_id=0, total=total, processed=0, failed=0, status=RUNNING,
+    ))
+    await session.commit()
+    run_id = result.inserted_primary_key[0]
+    logger.info(f"Recheck run {run_id} started for {total} articles")
+    return await get_run(session, run_id)
+
+
+async def get_run(session, run_id: int) -> Optional[dict]:
+    result = await session.execute(
+        select(RecheckRuns).where(RecheckRuns.c.id == run_id)
+    )
+    run = result.mappings().first()
+    return dict(run) if run is not None else None
+
+
+def run_progress(run: dict) -> dict:
+    """Run with its throughput and expected time left"""
+    elapsed = (run["updated_at"] - run["started_at"]).total_seconds()
+    done = run["processed"] + run["failed"]
+    rate = done / elapsed if elapsed > 0 else 0.0
+    left = max(run["total"] - done, 0)
+    return {
+        **run,
+        "articles_per_second": round(rate, 3),
+        "seconds_left": round(left / rate) if rate else None,
+    }
+
+
+async def _rule_plans(session, articles, plans: dict) -> None:
+    """Load rule sets of magazines with Custom style articles in the chunk"""
+    for article in articles:
+        if article.refactor_type.value == "Custom" and article.magazine_id not in plans:
+            try:
+                plans[article.magazine_id] = await load_rule_plan(
+                    session, article.magazine_id
+                )
+            except ValueError as e:
+                plans[article.magazine_id] = e
+
+
+async def _recheck_article(article, plans: dict) -> dict:
+    rule_plan = None
+    if article.refactor_type.value == "Custom":
+        rule_plan = plans[article.magazine_id]
+        if isinstance(rule_plan, Exception):
+            raise rule_plan
+    # rules changed, issues of unchanged paragraphs cannot be reused
+    return await process_in_worker(
+        article.refactor_type.value, article.original_file, "recheck",
+        rule_plan=rule_plan,
+    )
+
+
+async def recheck(session, run: dict, chunk_size: int = RECHECK_CHUNK_SIZE,
+                  on_progress: Callable[[dict], None] = None) -> dict:
+    """Check articles of the run chunk by chunk from its checkpoint"""
+    conditions = _scope(run["magazine_id"], run["outdated"])
+    plans = {}
+    while True:
+        result = await session.execute(
+            select(Articles.c.id, Articles.c.original_file, Articles.c.refactor_type,
+                   Articles.c.magazine_id)
+            .where(Articles.c.id > run["last_article_id"], *conditions)
+            .order_by(Articles.c.id)
+            .limit(chunk_size)
+        )
+        articles = result.fetchall()
+        if not articles:
+            break
+
+        started = time.monotonic()
+        await _rule_plans(session, articles, plans)
+        results = await asyncio.gather(
+            *[_recheck_article(article, plans) for article in articles],
+            return_exceptions=True,
+        )
+        processed = failed = 0
+        for article, checked in zip(articles, results):
+            if isinstance(checked, Exception):
+                logger.error(f"Recheck of article {article.id} failed: {checked}")
+                failed += 1
+                continue
+            await write_result(session, article.id, checked)
+            processed += 1
+
+        # results and checkpoint of the chunk are committed together
+        run.update(
+            last_article_id=articles[-1].id,
+            processed=run["processed"] + processed,
+            failed=run["failed"] + failed,
+            updated_at=datetime.utcnow(),
+        )
+        await session.execute(update(RecheckRuns).where(
+            RecheckRuns.c.id == run["id"]
+        ).values(
+            last_article_id=run["last_article_id"], processed=run["processed"],
+            failed=run["failed"], updated_at=run["updated_at"],
+        ))
+        await session.commit()
+
+        progress = run_progress(run)
+        logger.info(
+            f"Recheck run {run['id']}: {run['processed'] + run['failed']}"
+            f"/{run['total']}, chunk of {len(articles)} in "
+            f"{time.monotonic() - started:.1f}s, "
+            f"{progress['articles_per_second']} articles/s"
+        )
+        if on_progress is not None:
+            on_progress(progress)
+
+    run.update(status=DONE, updated_at=datetime.utcnow())
+    await session.execute(update(RecheckRuns).where(
+        RecheckRuns.c.id == run["id"]
+    ).values(status=DONE, updated_at=run["updated_at"]))
+    await session.commit()
+    logger.info(f"Recheck run {run['id']} finished")
+    return run
+
+
+async def claim_run(session, run_id: int, owner: str,
+                    lease: float = JOB_LEASE) -> bool:
+    """Take the unfinished run, False if another process holds its lease"""
+    now = datetime.utcnow()
+    result = await session.execute(update(RecheckRuns).where(
+        RecheckRuns.c.id == run_id,
+        RecheckRuns.c.status == RUNNING,
+        or_(RecheckRuns.c.claimed_at.is_(None),
+            RecheckRuns.c.claimed_at < now - timedelta(seconds=lease)),
+    ).values(claimed_by=owner, claimed_at=now))
+    await session.commit()
+    return result.rowcount == 1
+
+
+async def _renew_claim(session_maker, run_id: int, owner: str, lease: float) -> None:
+    while True:
+        await asyncio.sleep(lease / 3)
+        try:
+            async with session_maker() as session:
+                await session.execute(update(RecheckRuns).where(
+                    RecheckRuns.c.id == run_id, RecheckRuns.c.claimed_by == owner
+                ).values(claimed_at=datetime.utcnow()))
+                await session.commit()
+        except Exception as e:
+            logger.error(f"Error renewing recheck run {run_id}: {e}")
+
+
+async def _release_run(session_maker, run_id: int, owner: str) -> None:
+    async with session_maker() as session:
+        await session.execute(update(RecheckRuns).where(
+            RecheckRuns.c.id == run_id, RecheckRuns.c.claimed_by == owner
+        ).values(claimed_by=None, claimed_at=None))
+        await session.commit()
+
+
+async def run_recheck(run_id: int, chunk_size: int = RECHECK_CHUNK_SIZE,
+                      on_progress: Callable[[dict], None] = None,
+                      lease: float = JOB_LEASE,
+                      session_maker=async_session_maker) -> Optional[dict]:
+    """Check the run unless another process does, None if it does"""
+    owner = f"{socket.gethostname()}:{os.getpid()}"
+    async with session_maker() as session:
+        if not await claim_run(session, run_id, owner, lease):
+            logger.info(f"Recheck run {run_id} is running in another process")
+            return None
+        renewal = asyncio.ensure_future(
+            _renew_claim(session_maker, run_id, owner, lease)
+        )
+        try:
+            run = await get_run(session, run_id)
+            return await recheck(session, run, chunk_size, on_progress)
+        finally:
+            renewal.cancel()
+            await _release_run(session_maker, run_id, owner)
+
+
+async def recheck_job(run_id: int) -> None:
+    """Run started from the API by the embedded worker"""
+    try:
+        await run_recheck(run_id)
+    except Exception as e:
+        logger.error(f"Recheck run {run_id} stopped: {e}")
+
+
+def _print_progress(progress: dict) -> None:
+    done = progress["processed"] + progress["failed"]
+    print(
+        f"{done}/{progress['total']} articles, {progress['failed']} failed, "
+        f"{progress['articles_per_second']} articles/s, "
+        f"{progress['seconds_left']} s left",
+        flush=True,
+    )
+
+
+async def main(magazine_id: Optional[int], outdated: bool, chunk_size: int) -> None:
+    try:
+        async with async_session_maker() as session:
+            run = await start_run(session, magazine_id, outdated)
+        print(f"Recheck run {run['id']}, {run['total']} articles", flush=True)
+        if await run_recheck(run["id"], chunk_size,
+                             on_progress=_print_progress) is None:
+            print(f"Recheck run {run['id']} is running in another process",
+                  flush=True)
+    finally:
+        processing_pool.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check processed articles again")
+    parser.add_argument("--magazine", type=int, help="only articles of the magazine")
+    parser.add_argument("--outdated", action="store_true",
+                        help="only articles checked by an older rule engine")
+    parser.add_argument("--chunk", type=int, default=RECHECK_CHUNK_SIZE,
+                        help="articles committed at once")
+    arguments = parser.parse_args()
+    asyncio.run(main(arguments.magazine, arguments.outdated, arguments.chunk))
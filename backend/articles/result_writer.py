@@ -0,0 +1,176 @@
+"""
+Group commit of processing results
+
+Finished jobs hand their results to the writer, which waits a few
+milliseconds for more of them and writes the whole batch with one statement
+per table in one transaction. If the batch fails, every result is written
+again in its own savepoint, so one bad row does not lose the others. Texts
+are indexed for search in savepoints of their own, a failed index entry is
+only logged.
+"""
+import asyncio
+from dataclasses import dataclass
+from typing import List, Optional, Set
+
+from sqlalchemy import bindparam, delete, insert, select, update
+
+from articles.article_service.document_work_abstract import RULE_ENGINE_VERSION
+from articles.events import DONE, publish_status
+from articles.models import Articles, ArticleStructures
+from services.search.search import index_article
+from settings.config import RESULT_BATCH_DELAY, RESULT_BATCH_SIZE
+from settings.database import async_session_maker
+
+import logging
+from services.logger.logger import Logger
+
+logger = Logger(__name__, level=logging.INFO, log_to_file=True,
+                filename='tasks.log').get_logger()
+
+
+async def write_result(session, article_id: int, result: dict):
+    """Write checked document, report, structure and search index, not committed"""
+    await write_results(session, [(article_id, result)])
+
+
+async def write_results(session, results: List[tuple]):
+    """Write results of (article id, result) pairs, not committed"""
+    articles = []
+    structures = []
+    texts = {}
+    for article_id, result in results:
+        result = dict(result)
+        structure = result.pop("structure", None)
+        text = result.pop("text", None)
+        articles.append({"article_id": article_id, **result})
+        if structure is not None:
+            structures.append({"article_id": article_id, **structure})
+        if text is not None:
+            texts[article_id] = text
+
+    columns = {
+        column: bindparam(column) for column in articles[0] if column != "article_id"
+    }
+    await session.execute(
+        update(Articles).where(Articles.c.id == bindparam("article_id")).values(
+            checked=True, status=DONE, rule_version=RULE_ENGINE_VERSION, **columns
+        ),
+        articles,
+    )
+    await session.execute(delete(ArticleStructures).where(
+        ArticleStructures.c.article_id.in_([row["article_id"] for row in articles])
+    ))
+    if structures:
+        await session.execute(insert(ArticleStructures), structures)
+    if texts:
+        await index_texts(session, texts)
+
+
+async def index_texts(session, texts: dict):
+    """Put document texts of articles into the search index"""
+    result = await session.execute(
+        select(Articles.c.id, Articles.c.title, Articles.c.magazine_id)
+        .where(Articles.c.id.in_(list(texts)))
+    )
+    for article in result.fetchall():
+        # an article which cannot be indexed is still saved, only not searchable
+        try:
+            async with session.begin_nested():
+                await index_article(session, article.id, article.magazine_id,
+                                    article.title, texts[article.id])
+        except Exception as e:
+            logger.error(f"Search index of article {article.id} failed: {e}")
+
+
+@dataclass
+class PendingResult:
+    article_id: int
+    user_id: object
+    result: dict
+    future: asyncio.Future
+
+
+class ResultWriter:
+    """Buffer finished results and commit them in batches"""
+
+    def __init__(self, max_batch: int = RESULT_BATCH_SIZE,
+                 max_delay: float = RESULT_BATCH_DELAY,
+                 session_maker=async_session_maker):
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.session_maker = session_maker
+        self._pending: List[PendingResult] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._writes: Set[asyncio.Task] = set()
+
+    async def save(self, article_id: int, user_id, result: dict) -> None:
+        """Wait until the result is committed, raise if this row failed"""
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append(PendingResult(article_id, user_id, result, future))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(
+                self.max_delay, self._flush
+            )
+        await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.ensure_future(self._write(batch))
+            self._writes.add(task)
+            task.add_done_callback(self._writes.discard)
+
+    async def _write(self, batch: List[PendingResult]) -> None:
+        failed = {}
+        try:
+            async with self.session_maker() as session:
+                try:
+                    async with session.begin_nested():
+                        await write_results(
+                            session, [(item.article_id, item.result) for item in batch]
+                        )
+                except Exception as e:
+                    logger.error(f"Batch of {len(batch)} results failed: {e}")
+                    failed = await self._write_one_by_one(session, batch)
+                await session.commit()
+        except Exception as e:
+            logger.error(f"Error committing results: {e}")
+            for item in batch:
+                if not item.future.done():
+                    item.future.set_exception(e)
+            return
+
+        for item in batch:
+            if item.future.done():
+                continue
+            if item.article_id in failed:
+                item.future.set_exception(failed[item.article_id])
+            else:
+                item.future.set_result(None)
+                await publish_status(item.article_id, item.user_id, DONE)
+
+    async def _write_one_by_one(self, session, batch: List[PendingResult]) -> dict:
+        """Write every result in its own savepoint, return errors by article"""
+        failed = {}
+        for item in batch:
+            try:
+                async with session.begin_nested():
+                    await write_result(session, item.article_id, item.result)
+            except Exception as e:
+                logger.error(f"Error saving result of article {item.article_id}: {e}")
+                failed[item.article_id] = e
+        return failed
+
+    async def stop(self) -> None:
+        """Write buffered results"""
+        self._flush()
+        if self._writes:
+            await asyncio.gather(*self._writes, return_exceptions=True)
+
+
+result_writer = ResultWriter()
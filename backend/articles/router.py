@@ -1,47 +1,97 @@
 from fastapi import (
     APIRouter, Depends,
     Form, UploadFile,
-    File, BackgroundTasks
+    File, BackgroundTasks,
+    Query, Request,
 )
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import (
-    insert, select,
-    update, delete,
-)
+from sqlalchemy import insert, update
 
 from auth.models import User
 from articles.models import Articles
-from articles.schemas import RefactorType
+from articles.queries import (
+    ARTICLE_BY_ID, ARTICLE_DETAIL, ARTICLE_SUMMARIES, ARTICLE_VERSION,
+    ARTICLES_VERSION, DELETE_ARTICLE, DELETE_STRUCTURE, STRUCTURE_BY_ARTICLE,
+)
+from articles.events import (
+    DONE, FINAL_STATUSES, QUEUED, StatusSubscription, publish_status,
+)
+from articles.schemas import (
+    ArticleDetail, ArticleReportResponse, ArticleSummary, RefactorType,
+)
 from articles.article_service.document_init import DocumentInit
 from articles.article_service.report import Report
-from auth.base_config import current_user
+from articles.article_service.rule_plan import load_rule_plan
+from articles.recheck import get_run, run_progress, start_run
+from auth.base_config import current_superuser, current_user
 from settings.database import get_async_session
-from articles.tasks import document_process
+from articles.job_queue import admit_job, submit_job, submit_recheck
+from articles.tasks import document_process_inline, use_fast_path
+from services.scheduler.scheduler import QueueFull, scheduler
+from services.responses.conditional import check_etag, make_etag
+from services.responses.responses import FastJSONResponse
+from services.search.search import remove_article, search_articles
+from services.storage.storage import storage
 
 from services.logger.logger import Logger
+import asyncio
 import logging
 import os
+from typing import List, Optional
 
 logger = Logger(__name__, level=logging.INFO, log_to_file=True,
                 filename='article.log').get_logger()
 
 router = APIRouter()
 
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+def too_many_requests(error: QueueFull) -> JSONResponse:
+    """Response for uploads rejected by admission control"""
+    logger.info(f"Upload rejected: {error}")
+    return JSONResponse(
+        status_code=429,
+        headers={"Retry-After": str(error.retry_after)},
+        content={"status": 429, "description": f"{error}"},
+    )
+
+
+async def articles_etag(
+        request: Request,
+        session: AsyncSession = Depends(get_async_session),
+):
+    """ETag of the article list from the number and the last change of articles"""
+    count, updated_at = (await session.execute(ARTICLES_VERSION)).one()
+    check_etag(request, make_etag("articles", count, updated_at))
+
+
+async def article_etag(
+        article_id: int,
+        request: Request,
+        session: AsyncSession = Depends(get_async_session),
+):
+    """ETag of article responses from its version"""
+    version = await session.scalar(ARTICLE_VERSION, {"article_id": article_id})
+    if version is not None:
+        check_etag(request, make_etag("article", article_id, version))
 
-@router.get("/all", status_code=200)
+
+@router.get("/all", status_code=200,
+            responses={200: {"model": List[ArticleSummary]}})
 async def get_all_articles(
         user: User = Depends(current_user),
+        etag: None = Depends(articles_etag),
         session: AsyncSession = Depends(get_async_session),
 ):
     """
     Get all articles from all magazines
     """
     try:
-        articles = await session.execute(select(Articles
-                                                ).order_by(Articles.c.id))
+        articles = await session.execute(ARTICLE_SUMMARIES)
 
-        return articles.mappings().all()
+        return FastJSONResponse([dict(row) for row in articles.mappings()])
     except IndexError:
         return {"status": 404, "description": "Articles not found"}
     except Exception as e:
@@ -49,20 +99,159 @@ async def get_all_articles(
         return {"status": 500, "description": f"{e}"}
 
 
-@router.get("/{articles_id}", status_code=200)
+@router.get("/search", status_code=200)
+async def search(
+        q: str = Query(..., min_length=1),
+        magazine_id: Optional[List[int]] = Query(None),
+        limit: int = Query(20, ge=1, le=100),
+        offset: int = Query(0, ge=0),
+        user: User = Depends(current_user),
+        session: AsyncSession = Depends(get_async_session),
+):
+    """
+    Search articles by words or quoted phrases in their title and text
+    """
+    try:
+        return FastJSONResponse(await search_articles(
+            session, q, magazine_ids=magazine_id, limit=limit, offset=offset
+        ))
+    except Exception as e:
+        logger.error(f"Error searching articles: {e}")
+        return {"status": 500, "description": f"{e}"}
+
+
+@router.post("/recheck", status_code=202)
+async def recheck_articles(
+        magazine_id: Optional[int] = Form(None),
+        outdated: bool = Form(False),
+        user: User = Depends(current_superuser),
+        session: AsyncSession = Depends(get_async_session),
+):
+    """
+    Check articles of the magazine, or checked by an older rule engine, again.
+    An interrupted run with the same scope goes on from its checkpoint.
+    """
+    try:
+        run = await start_run(session, magazine_id, outdated)
+        await submit_recheck(session, user.id, run["id"])
+        logger.info(f"Recheck run {run['id']} started by user: {user.username}")
+        return {
+            "status": 202,
+            "description": f"Recheck of {run['total']} articles started",
+            "run_id": run["id"],
+        }
+    except Exception as e:
+        await session.rollback()
+        logger.error(f"Error starting recheck: {e}")
+        return {"status": 500, "description": f"{e}"}
+
+
+@router.get("/recheck/{run_id}", status_code=200)
+async def recheck_progress(
+        run_id: int,
+        user: User = Depends(current_superuser),
+        session: AsyncSession = Depends(get_async_session),
+):
+    """
+    Progress and throughput of the recheck run
+    """
+    try:
+        run = await get_run(session, run_id)
+        if run is None:
+            return {"status": 404, "description": "Recheck run not found"}
+        return run_progress(run)
+    except Exception as e:
+        logger.error(f"Error getting recheck progress: {e}")
+        return {"status": 500, "description": f"{e}"}
+
+
+@router.get("/events", status_code=200)
+async def user_status_events(
+        user: User = Depends(current_user),
+):
+    """
+    Stream of processing status events of all articles of the user
+    """
+    subscription = StatusSubscription(
+        accept=lambda event: event["user_id"] == str(user.id)
+    )
+    return StreamingResponse(
+        subscription.stream(), media_type="text/event-stream", headers=SSE_HEADERS
+    )
+
+
+@router.get("/{article_id}/events", status_code=200)
+async def article_status_events(
+        article_id: int,
+        user: User = Depends(current_user),
+        session: AsyncSession = Depends(get_async_session),
+):
+    """
+    Stream of processing status events of the article, ends when it is processed
+    """
+    subscription = StatusSubscription(
+        accept=lambda event: event["article_id"] == article_id,
+        until=lambda event: event["status"] in FINAL_STATUSES,
+    )
+    try:
+        result = await session.execute(ARTICLE_BY_ID, {"article_id": article_id})
+        article = result.fetchone()
+        if not article:
+            subscription.close()
+            return {"status": 404, "description": "Article not found"}
+
+        status = DONE if article.checked else article.status or QUEUED
+        current = {
+            "article_id": article_id, "user_id": str(article.user_id), "status": status
+        }
+        return StreamingResponse(
+            subscription.stream(initial=[current]),
+            media_type="text/event-stream",
+            headers=SSE_HEADERS,
+        )
+    except Exception as e:
+        subscription.close()
+        logger.error(f"Error streaming article status: {e}")
+        return {"status": 500, "description": f"{e}"}
+
+
+@router.get("/{article_id}/structure", status_code=200)
+async def get_article_structure(
+        article_id: int,
+        user: User = Depends(current_user),
+        etag: None = Depends(article_etag),
+        session: AsyncSession = Depends(get_async_session),
+):
+    """
+    Get outline, counts and citations of the article document
+    """
+    try:
+        result = await session.execute(
+            STRUCTURE_BY_ARTICLE, {"article_id": article_id}
+        )
+        structure = result.mappings().first()
+        if not structure:
+            return {"status": 404, "description": "Structure not found"}
+        return FastJSONResponse(dict(structure))
+    except Exception as e:
+        logger.error(f"Error getting article structure: {e}")
+        return {"status": 500, "description": f"{e}"}
+
+
+@router.get("/{article_id}", status_code=200,
+            responses={200: {"model": ArticleDetail}})
 async def get_articles_by_id(
-        articles_id: int,
+        article_id: int,
         user: User = Depends(current_user),
+        etag: None = Depends(article_etag),
         session: AsyncSession = Depends(get_async_session),
 ):
     """
     Get magazine by id
     """
     try:
-        articles = await session.execute(select(Articles).where(
-            Articles.c.id == articles_id
-        ).order_by(Articles.c.id))
-        return articles.mappings().all()[0]
+        articles = await session.execute(ARTICLE_DETAIL, {"article_id": article_id})
+        return FastJSONResponse(dict(articles.mappings().all()[0]))
     except IndexError:
         return {"status": 404, "description": "Article not found"}
     except Exception as e:
@@ -80,14 +269,16 @@ async def download_updated_file(
     Download the updated file for the given article ID
     """
     try:
-        result = await session.execute(select(Articles
-                                              ).where(Articles.c.id == article_id))
+        result = await session.execute(ARTICLE_BY_ID, {"article_id": article_id})
         article = result.fetchone()
 
         if not article:
             return {"status": 404, "description": "Article not found"}
 
-        updated_file_path = article[2]
+        # the S3 backend downloads the object
+        updated_file_path = article[2] and await asyncio.to_thread(
+            storage.local_path, article[2]
+        )
         if not updated_file_path or not os.path.exists(updated_file_path):
             return {"status": 404, "description": "Updated file not found"}
 
@@ -102,18 +293,19 @@ async def download_updated_file(
         return {"status": 500, "description": f"{e}"}
 
 
-@router.get("/{article_id}/report", status_code=200)
+@router.get("/{article_id}/report", status_code=200,
+            responses={200: {"model": ArticleReportResponse}})
 async def get_work_report(
         article_id: int,
         user: User = Depends(current_user),
+        etag: None = Depends(article_etag),
         session: AsyncSession = Depends(get_async_session)
 ):
     """
     Get the work report for the given article ID
     """
     try:
-        result = await session.execute(select(Articles
-                                              ).where(Articles.c.id == article_id))
+        result = await session.execute(ARTICLE_BY_ID, {"article_id": article_id})
         article = result.fetchone()
 
         if not article:
@@ -126,7 +318,9 @@ async def get_work_report(
         report = Report(report)
         result = report.get_report()
 
-        return {"status": 200, "description": f"{result}"}
+        return FastJSONResponse(
+            {"status": 200, "description": f"{result}", "report": result}
+        )
 
     except Exception as e:
         logger.error(f"Error during report creation: {e}")
@@ -140,13 +334,23 @@ async def create_articles(
         magazine_id: int = Form(...),
         refactor_type: RefactorType = Form(...),
         file: UploadFile = File(...),
+        analyze_only: bool = Form(False),
         user: User = Depends(current_user),
         session: AsyncSession = Depends(get_async_session),
 ):
     """
-    Create article
+    Create article.
+    With analyze_only the document is checked but the updated file is not saved.
+    Small documents are checked right away and the report is returned.
     """
     try:
+        cost = scheduler.cost(file.size)
+        await admit_job(session, cost)
+
+        if refactor_type == RefactorType.Custom:
+            # fails early if the magazine has no valid rule set
+            await load_rule_plan(session, magazine_id)
+
         document = DocumentInit(file=file, magazine_id=magazine_id)
         document_path = await document.save_document(
             user_name=user.username, session=session
@@ -158,7 +362,8 @@ async def create_articles(
             magazine_id=magazine_id,
             updated_file=None,
             original_file=document_path,
-            refactor_type=refactor_type
+            refactor_type=refactor_type,
+            status=QUEUED,
         )
         result = await session.execute(insert_stmt)
         await session.commit()
@@ -167,14 +372,28 @@ async def create_articles(
 
         logger.info(f"Article: {article_id} - {title} created by user: {user.username}")
 
-        background_tasks.add_task(
-            document_process,
+        process = dict(
             style=refactor_type,
             path=document_path,
             article_id=article_id,
             user_name=user.username,
-            session=session
+            magazine_id=magazine_id,
+            analyze_only=analyze_only,
+            user_id=user.id,
         )
+        if await asyncio.to_thread(use_fast_path, document_path):
+            report = await document_process_inline(
+                background_tasks, session=session, **process
+            )
+            if report is not None:
+                return {
+                    "status": 201,
+                    "description": "Article was created and checked successfully",
+                    "report": report,
+                }
+        else:
+            await submit_job(session, user.id, cost, process)
+            await publish_status(article_id, user.id, QUEUED)
 
         return {
             "status": 201,
@@ -182,6 +401,8 @@ async def create_articles(
                            "I need 1 minute to check your document. "
                            "Check the status later"
         }
+    except QueueFull as e:
+        return too_many_requests(e)
     except Exception as e:
         await session.rollback()
         logger.error(f"Error creating magazine: {e}")
@@ -196,6 +417,7 @@ async def update_article(
         magazine_id: int = Form(...),
         refactor_type: RefactorType = Form(...),
         file: UploadFile = File(...),
+        analyze_only: bool = Form(False),
         user: User = Depends(current_user),
         session: AsyncSession = Depends(get_async_session),
 ):
@@ -203,14 +425,21 @@ async def update_article(
     Update magazine
     """
     try:
-        result = await session.execute(select(Articles
-                                              ).where(Articles.c.id == article_id))
+        result = await session.execute(ARTICLE_BY_ID, {"article_id": article_id})
         article = result.fetchone()
         if not article:
             return {"status": 404, "description": "Article not found"}
 
+        cost = scheduler.cost(file.size)
+        await admit_job(session, cost)
+
         old_original_path = article[2]
         old_updated_path = article[3]
+        previous_hashes = article.paragraph_hashes
+
+        if refactor_type == RefactorType.Custom:
+            # fails early if the magazine has no valid rule set
+            await load_rule_plan(session, magazine_id)
 
         document = DocumentInit(file=file, magazine_id=magazine_id)
         document_path = await document.save_document(
@@ -231,26 +460,44 @@ async def update_article(
                 updated_file=None,
                 checked=False,
                 user_id=user.id,
-                refactor_type=refactor_type
+                refactor_type=refactor_type,
+                status=QUEUED,
             )
         )
         await session.commit()
         logger.info(f"Article was updated by user: {user.username}")
 
-        background_tasks.add_task(
-            document_process,
+        process = dict(
             style=refactor_type,
             path=document_path,
             article_id=article_id,
             user_name=user.username,
-            session=session
+            paragraph_hashes=previous_hashes,
+            magazine_id=magazine_id,
+            analyze_only=analyze_only,
+            user_id=user.id,
         )
+        if await asyncio.to_thread(use_fast_path, document_path):
+            report = await document_process_inline(
+                background_tasks, session=session, **process
+            )
+            if report is not None:
+                return {
+                    "status": 200,
+                    "description": "Article changed and checked successfully",
+                    "report": report,
+                }
+        else:
+            await submit_job(session, user.id, cost, process)
+            await publish_status(article_id, user.id, QUEUED)
 
         return {
             "status": 200,
             "description": "Article changed successfully. "
                            "Wait 10 sec to check your document. Check the status later"
         }
+    except QueueFull as e:
+        return too_many_requests(e)
     except Exception as e:
         await session.rollback()
         logger.error(f"Error updating article: {e}")
@@ -267,8 +514,7 @@ async def delete_article(
     Delete magazine
     """
     try:
-        result = await session.execute(select(Articles
-                                              ).where(Articles.c.id == article_id))
+        result = await session.execute(ARTICLE_BY_ID, {"article_id": article_id})
         article = result.fetchone()
         if not article:
             return {"status": 404, "description": "Article not found"}
@@ -281,7 +527,9 @@ async def delete_article(
         if update_path:
             await DocumentInit.delete_document(update_path)
 
-        await session.execute(delete(Articles).where(Articles.c.id == article_id))
+        await remove_article(session, article_id)
+        await session.execute(DELETE_STRUCTURE, {"article_id": article_id})
+        await session.execute(DELETE_ARTICLE, {"article_id": article_id})
         await session.commit()
 
         logger.info(f"Article deleted by user: {user.username}")
@@ -1,3 +1,6 @@
+from datetime import datetime
+from typing import List, Optional
+
 from pydantic import BaseModel
 from enum import Enum
 
@@ -23,3 +26,39 @@ class ArticleUpdateRequest(BaseModel):
 
     class Config:
         from_attributes = True
+
+
+class ArticleSummary(BaseModel):
+    """Article in listings, without reports and other JSON blobs"""
+    id: int
+    title: str
+    magazine_id: Optional[int]
+    user_id: Optional[int]
+    publish_date: Optional[datetime]
+    checked: bool
+    refactor_type: RefactorType
+    status: Optional[str]
+    version: int
+    updated_at: Optional[datetime]
+
+
+class ArticleDetail(ArticleSummary):
+    original_file: Optional[str]
+    updated_file: Optional[str]
+    list_issues: Optional[dict]
+
+
+class ArticleReport(BaseModel):
+    total_count: int
+    format_issues: int
+    citation_issues: int
+    total_recommendations: int
+    format_recommendations: int
+    citation_recommendations: int
+    recommendations: List[str]
+
+
+class ArticleReportResponse(BaseModel):
+    status: int
+    description: str
+    report: ArticleReport
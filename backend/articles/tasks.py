@@ -1,6 +1,23 @@
 import asyncio
+import os
+import time
+from typing import Callable, Optional, Tuple
+
+from fastapi import BackgroundTasks
+
 from articles.article_service.mapper_type import DocumentWorkFlowFactory
+from articles.article_service.memory_estimate import estimate_memory
+from articles.article_service.package_info import paragraph_count
+from articles.article_service.rule_plan import load_rule_plan
+from articles.article_service.structure import extract_structure
+from articles.events import DONE, FAILED, RUNNING, publish_status
 from articles.models import Articles
+from articles.result_writer import result_writer, write_result
+from services.storage.storage import storage
+from services.workers.memory import memory_budget
+from services.workers.pool import processing_pool
+from settings.database import async_session_maker
+from settings.config import SYNC_MAX_FILE_SIZE, SYNC_MAX_PARAGRAPHS, SYNC_TIME_BUDGET
 from sqlalchemy import update
 
 import logging
@@ -9,31 +26,214 @@ from services.logger.logger import Logger
 logger = Logger(__name__, level=logging.INFO, log_to_file=True,
                 filename='tasks.log').get_logger()
 
+# rule progress events of one document are sent at most this often
+PROGRESS_INTERVAL = 0.5
+
+
+def progress_reporter(article_id: int, user_id) -> Callable[[str], None]:
+    """
+    Workflow progress callback publishing running events.
+    The workflow may run in another thread, events are sent from the loop.
+    """
+    loop = asyncio.get_running_loop()
+    last_report = 0.0
+
+    def report(rule: str) -> None:
+        nonlocal last_report
+        now = time.monotonic()
+        if now - last_report < PROGRESS_INTERVAL:
+            return
+        last_report = now
+        loop.call_soon_threadsafe(asyncio.ensure_future, publish_status(
+            article_id, user_id, RUNNING, rule=rule
+        ))
+
+    return report
+
+
+def use_fast_path(path: str) -> bool:
+    """
+    Check if the document is small enough to be checked inside the request.
+    Blocking, the S3 backend downloads the document.
+    """
+    try:
+        looking_for = storage.local_path(path)
+        if os.path.getsize(looking_for) > SYNC_MAX_FILE_SIZE:
+            return False
+        return paragraph_count(looking_for, SYNC_MAX_PARAGRAPHS) <= SYNC_MAX_PARAGRAPHS
+    except Exception as e:
+        logger.error(f"Error counting paragraphs: {e}")
+        return False
+
+
+async def check_document(
+        style: str, path: str, user_name: str,
+        paragraph_hashes: dict = None, rule_plan=None, analyze_only: bool = False,
+        progress: Callable[[str], None] = None,
+) -> dict:
+    """
+    Run the workflow, the updated document is saved unless only analyzing.
+    Structure and text of the original document are extracted on the way.
+    """
+    local_path = storage.local_path(path)
+    # paragraphs unchanged since the previous version are not checked again
+    doc = DocumentWorkFlowFactory.create_workflow(
+        style=style, path=local_path, paragraph_hashes=paragraph_hashes,
+        rule_plan=rule_plan, analyze_only=analyze_only,
+    )
+    doc.progress_callback = progress
+    await doc.start_flow()
+
+    new_path = None
+    if not analyze_only:
+        new_path = await doc.get_updated_document(user_name=user_name)
+
+    structure, text = read_structure(local_path)
+    return {
+        "updated_file": new_path,
+        "list_issues": await doc.create_report(),
+        "paragraph_hashes": await doc.get_paragraph_hashes(),
+        "structure": structure,
+        "text": text,
+    }
+
+
+def read_structure(path: str) -> Tuple[Optional[dict], Optional[str]]:
+    """Structure and text of the document, the check does not fail without them"""
+    texts = []
+    try:
+        return extract_structure(path, texts), "\n".join(texts)
+    except Exception as e:
+        logger.error(f"Error extracting document structure: {e}")
+        return None, None
+
+
+def run_check_document(*args, progress: Callable[[str], None] = None, **kwargs):
+    """check_document for a worker process"""
+    return asyncio.run(check_document(*args, progress=progress, **kwargs))
+
+
+async def process_in_worker(style: str, path: str, user_name: str, **kwargs) -> dict:
+    """
+    Run check_document in the worker pool once memory estimated
+    for the document is available
+    """
+    estimate = await asyncio.to_thread(estimate_memory, storage.local_path(path))
+    async with memory_budget.reserve(estimate):
+        return await processing_pool.run(
+            run_check_document, style, path, user_name, **kwargs
+        )
+
+
+class ProcessingFailed(Exception):
+    """Processing error already saved as the failed status of the article"""
+
+
+async def save_result(session, article_id: int, user_id, result: dict):
+    """Store the result of the check and notify the user"""
+    await write_result(session, article_id, result)
+    await session.commit()
+    await publish_status(article_id, user_id, DONE)
+
+
+async def save_failure(session, article_id: int, user_id, error: Exception):
+    """Mark the article as failed"""
+    try:
+        await session.rollback()
+        await session.execute(
+            update(Articles).where(Articles.c.id == article_id).values(status=FAILED)
+        )
+        await session.commit()
+    except Exception as e:
+        logger.error(f"Error saving failed status: {e}")
+    await publish_status(article_id, user_id, FAILED, description=f"{error}")
+
 
 async def document_process(
         style: str, path: str,
-        article_id: int, user_name: str, session
+        article_id: int, user_name: str, session,
+        paragraph_hashes: dict = None, magazine_id: int = None,
+        analyze_only: bool = False, user_id=None,
 ):
     """Function to process the document"""
     await asyncio.sleep(1)
 
     try:
-        # check and replace issues in the document
-        doc = DocumentWorkFlowFactory.create_workflow(style=style, path=path)
-        await doc.start_flow()
-        report = await doc.create_report()
+        await publish_status(article_id, user_id, RUNNING)
 
-        # get back updated document: "path"
-        new_path = await doc.get_updated_document(user_name=user_name)
+        # Custom style is driven by the compiled rule set of the magazine
+        rule_plan = None
+        if style == "Custom":
+            rule_plan = await load_rule_plan(session, magazine_id)
 
-        await session.execute(
-            update(Articles).where(Articles.c.id == article_id).values(
-                updated_file=new_path, checked=True, list_issues=report)
+        result = await process_in_worker(
+            style, path, user_name, paragraph_hashes=paragraph_hashes,
+            rule_plan=rule_plan, analyze_only=analyze_only,
+            progress=progress_reporter(article_id, user_id),
         )
-        await session.commit()
+        # results of concurrent jobs are committed together
+        await result_writer.save(article_id, user_id, result)
 
         logger.info(f"Document with article id {article_id} was updated: {path}")
 
     except Exception as e:
         logger.error(f"Error processing document: {e}")
+        await save_failure(session, article_id, user_id, e)
+        # job queue workers retry the job or drop it
+        raise ProcessingFailed(f"{e}") from e
+
+
+async def document_process_job(**process):
+    """Scheduled processing, the request session is closed by now"""
+    async with async_session_maker() as session:
+        await document_process(session=session, **process)
+
+
+async def document_process_inline(
+        background_tasks: BackgroundTasks, style: str, path: str,
+        article_id: int, user_name: str, session,
+        paragraph_hashes: dict = None, magazine_id: int = None,
+        analyze_only: bool = False, user_id=None,
+) -> Optional[dict]:
+    """
+    Process the document in a worker and return its report if it is ready
+    within the time budget. Otherwise the processing goes on and its result
+    is saved by a background task, None is returned.
+    """
+    await publish_status(article_id, user_id, RUNNING)
+    try:
+        rule_plan = None
+        if style == "Custom":
+            rule_plan = await load_rule_plan(session, magazine_id)
+
+        work = asyncio.ensure_future(process_in_worker(
+            style, path, user_name, paragraph_hashes=paragraph_hashes,
+            rule_plan=rule_plan, analyze_only=analyze_only,
+            progress=progress_reporter(article_id, user_id),
+        ))
+        result = await asyncio.wait_for(asyncio.shield(work), SYNC_TIME_BUDGET)
+    except asyncio.TimeoutError:
+        logger.info(f"Article id {article_id} is over the time budget, queued")
+        background_tasks.add_task(
+            finish_document_process, work, article_id, user_id, session
+        )
+        return None
+    except Exception as e:
+        await save_failure(session, article_id, user_id, e)
+        raise
+
+    await save_result(session, article_id, user_id, result)
+    logger.info(f"Document with article id {article_id} was checked inline: {path}")
+    return result["list_issues"]
+
+
+async def finish_document_process(work: asyncio.Future, article_id: int, user_id,
+                                  session):
+    """Save result of the processing which did not fit into the time budget"""
+    try:
+        await save_result(session, article_id, user_id, await work)
+        logger.info(f"Document with article id {article_id} was updated")
+    except Exception as e:
+        logger.error(f"Error processing document: {e}")
+        await save_failure(session, article_id, user_id, e)
         return {"status": 500, "description": f"{e}"}
@@ -25,3 +25,4 @@ fastapi_users = FastAPIUsers[User, int](
 )
 
 current_user = fastapi_users.current_user()
+current_superuser = fastapi_users.current_user(active=True, superuser=True)
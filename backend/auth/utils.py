@@ -1,10 +1,78 @@
+from typing import Any, Dict, Optional
+
 from fastapi import Depends
 from fastapi_users_db_sqlalchemy import SQLAlchemyUserDatabase
+from sqlalchemy import inspect
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
 
 from auth.models import User
+from services.cache.ttl_cache import TTLCache
+from services.pubsub.pubsub import pubsub
+from settings.config import USER_CACHE_SIZE, USER_CACHE_TTL
 from settings.database import get_async_session
 
+USERS_CHANNEL = "users_changed"
+
+# keyed by the id as text, the payload of invalidation messages
+user_cache = TTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+
+
+def invalidate_user(payload: str) -> None:
+    """Drop the cached record of the user id in payload"""
+    user_cache.invalidate(payload)
+
+
+async def user_changed(user_id: Any) -> None:
+    """Invalidate cached user in this and all other processes"""
+    invalidate_user(str(user_id))
+    await pubsub.publish(USERS_CHANNEL, str(user_id))
+
+
+class CachedUserDatabase(SQLAlchemyUserDatabase):
+    """
+    User database adapter which keeps user records by id in ``user_cache``.
+    Active/verified checks are still done by fastapi-users on every request,
+    only the row lookup is skipped.
+    """
+
+    async def get(self, id: Any) -> Optional[User]:
+        """Get user by id from the cache or from the database"""
+        cached = user_cache.get(str(id))
+        if cached is not None:
+            return await self.session.merge(cached, load=False)
+
+        user = await super().get(id)
+        if user is not None:
+            user_cache.set(str(id), self._detached_copy(user))
+        return user
+
+    async def update(self, user: User, update_dict: Dict[str, Any]) -> User:
+        invalidate_user(str(user.id))
+        user = await super().update(user, update_dict)
+        # other processes may hold the old role or active flag
+        await user_changed(user.id)
+        return user
+
+    async def delete(self, user: User) -> None:
+        user_id = user.id
+        invalidate_user(str(user_id))
+        await super().delete(user)
+        await user_changed(user_id)
+
+    @staticmethod
+    def _detached_copy(user: User) -> User:
+        """Copy of the loaded row which is not bound to any session"""
+        columns = inspect(User).column_attrs
+        copy = User(**{attr.key: getattr(user, attr.key) for attr in columns})
+        make_transient_to_detached(copy)
+        return copy
+
 
 async def get_user_db(session: AsyncSession = Depends(get_async_session)):
-    yield SQLAlchemyUserDatabase(session, User)
+    yield CachedUserDatabase(session, User)
+
+
+pubsub.subscribe(USERS_CHANNEL, invalidate_user)
+# invalidations published while pub/sub was disconnected are lost
+pubsub.on_reconnect(user_cache.clear)
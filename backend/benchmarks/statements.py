@@ -0,0 +1,60 @@
+"""
+CPU spent on article lookups with statements built per request and built once
+
+    python -m benchmarks.statements
+"""
+import asyncio
+import time
+
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from articles.models import Articles, metadata
+from articles.queries import ARTICLE_BY_ID
+
+REQUESTS = 20000
+
+
+async def per_request(session, article_id: int):
+    result = await session.execute(select(Articles).where(Articles.c.id == article_id))
+    return result.fetchone()
+
+
+async def prebuilt(session, article_id: int):
+    result = await session.execute(ARTICLE_BY_ID, {"article_id": article_id})
+    return result.fetchone()
+
+
+async def measure(session, lookup) -> float:
+    """CPU seconds per lookup"""
+    for article_id in range(1, 101):
+        await lookup(session, article_id)
+    started = time.process_time()
+    for number in range(REQUESTS):
+        await lookup(session, number % 100 + 1)
+    return (time.process_time() - started) / REQUESTS
+
+
+async def main():
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(metadata.create_all)
+        await conn.execute(insert(Articles), [
+            {"title": f"Article {number}", "refactor_type": "APA"}
+            for number in range(100)
+        ])
+    session_maker = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with session_maker() as session:
+        built = await measure(session, per_request)
+        cached = await measure(session, prebuilt)
+    await engine.dispose()
+
+    print(f"built per request: {built * 1e6:.1f} us")
+    print(f"built once:        {cached * 1e6:.1f} us")
+    print(f"saved:             {(built - cached) * 1e6:.1f} us "
+          f"({(built - cached) / built:.0%})")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
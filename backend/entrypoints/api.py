@@ -0,0 +1,25 @@
+"""
+API server with several worker processes
+
+    python -m entrypoints.api
+
+With EMBEDDED_WORKER=false documents are processed by entrypoints.worker,
+so API and processing capacity are scaled separately.
+"""
+import uvicorn
+
+from settings.config import API_HOST, API_PORT, API_WORKERS, SHUTDOWN_TIMEOUT
+
+
+def main() -> None:
+    uvicorn.run(
+        "settings.main:app",
+        host=API_HOST,
+        port=API_PORT,
+        workers=API_WORKERS,
+        timeout_graceful_shutdown=int(SHUTDOWN_TIMEOUT),
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,21 @@
+"""
+Apply database migrations once before API and workers start
+
+    python -m entrypoints.migrate
+"""
+import os
+
+from alembic import command
+from alembic.config import Config
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def main() -> None:
+    config = Config(os.path.join(BACKEND_DIR, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(BACKEND_DIR, "alembic"))
+    command.upgrade(config, "head")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""
+Document processing worker
+
+    python -m entrypoints.worker
+
+Runs jobs queued by the API in the processing_jobs table, WORKER_CONCURRENCY
+at a time, and collects storage garbage. On SIGTERM it stops claiming jobs,
+lets running ones finish within SHUTDOWN_TIMEOUT and gives the rest back to
+the queue.
+"""
+import asyncio
+import signal
+
+from articles.job_queue import JobWorker
+from articles.result_writer import result_writer
+from services.pubsub.pubsub import pubsub
+from services.storage.gc import run_garbage_collector
+from services.workers.pool import processing_pool
+from settings.database import engine
+
+
+async def run() -> None:
+    if engine.dialect.name == "postgresql":
+        dsn = engine.url.set(drivername="postgresql")
+        await pubsub.start(dsn.render_as_string(hide_password=False))
+
+    worker = JobWorker()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signum, worker.stop)
+
+    storage_gc = asyncio.ensure_future(run_garbage_collector())
+    try:
+        await worker.run()
+    finally:
+        storage_gc.cancel()
+        await result_writer.stop()
+        await pubsub.stop()
+        processing_pool.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
@@ -0,0 +1,72 @@
+"""
+Read-through cache of the magazines table
+
+The whole table is small, so it is loaded with one query and kept until it
+expires or a magazine is created, updated or deleted in any process. Changes
+published while the pub/sub connection was down are not received, so the
+cache is also dropped when it reconnects.
+"""
+import time
+from typing import Dict, List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from magazines.models import Magazine
+from services.pubsub.pubsub import pubsub
+from settings.config import MAGAZINE_CACHE_TTL
+
+MAGAZINES_CHANNEL = "magazines_changed"
+
+
+class MagazineCache:
+    """Magazines rows kept in memory and ordered by id"""
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._rows: Optional[List[dict]] = None
+        self._by_id: Dict[int, dict] = {}
+        self._expires_at = 0.0
+        self._generation = 0
+
+    async def all(self, session: AsyncSession) -> List[dict]:
+        """Get all magazines"""
+        await self._ensure_loaded(session)
+        return self._rows
+
+    async def get(self, session: AsyncSession, magazine_id: int) -> Optional[dict]:
+        """Get magazine by id or None"""
+        await self._ensure_loaded(session)
+        return self._by_id.get(magazine_id)
+
+    def invalidate(self, payload: str = "") -> None:
+        """Forget loaded rows, next read goes to the database"""
+        self._generation += 1
+        self._rows = None
+        self._by_id = {}
+
+    async def changed(self) -> None:
+        """Invalidate cache in this and all other processes"""
+        self.invalidate()
+        await pubsub.publish(MAGAZINES_CHANNEL)
+
+    async def _ensure_loaded(self, session: AsyncSession) -> None:
+        if self._rows is not None and self._expires_at > time.monotonic():
+            return
+
+        generation = self._generation
+        result = await session.execute(select(Magazine).order_by(Magazine.c.id))
+        rows = [dict(row) for row in result.mappings().all()]
+
+        self._rows = rows
+        self._by_id = {row["id"]: row for row in rows}
+        # rows invalidated while loading are served once and reloaded next time
+        if generation == self._generation:
+            self._expires_at = time.monotonic() + self.ttl
+        else:
+            self._expires_at = 0.0
+
+
+magazine_cache = MagazineCache(ttl=MAGAZINE_CACHE_TTL)
+pubsub.subscribe(MAGAZINES_CHANNEL, magazine_cache.invalidate)
+pubsub.on_reconnect(magazine_cache.invalidate)
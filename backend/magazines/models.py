@@ -3,9 +3,12 @@ from datetime import datetime
 from sqlalchemy import (
     Table, Column,
     Integer, String,
-    TIMESTAMP, MetaData,
+    TIMESTAMP, ForeignKey,
+    MetaData, literal_column,
 )
 
+from rule_sets.models import RuleSet
+
 metadata = MetaData()
 
 Magazine = Table(
@@ -15,4 +18,8 @@ Magazine = Table(
     Column('title', String, nullable=False),
     Column('publish_date', TIMESTAMP, default=datetime.utcnow),
     Column('maximum_articles', Integer, nullable=False),
+    Column('rule_set_id', ForeignKey(RuleSet.c.id), nullable=True),
+    Column('version', Integer, nullable=False, default=1, server_default='1',
+           onupdate=literal_column('version') + 1),
+    Column('updated_at', TIMESTAMP, default=datetime.utcnow, onupdate=datetime.utcnow),
 )
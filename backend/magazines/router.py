@@ -1,18 +1,24 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import (
-    insert, select,
+    insert,
     update, delete,
 )
 
 from auth.models import User
+from magazines.cache import magazine_cache
 from magazines.models import Magazine
-from magazines.schemas import MagazineCreateRequest, MagazineUpdateRequest
+from magazines.schemas import (
+    MagazineCreateRequest, MagazineResponse, MagazineUpdateRequest,
+)
 from auth.base_config import current_user
 from settings.database import get_async_session
+from services.responses.conditional import check_etag, make_etag
+from services.responses.responses import FastJSONResponse
 
 from services.logger.logger import Logger
 import logging
+from typing import List
 
 logger = Logger(__name__, level=logging.INFO, log_to_file=True,
                 filename='magazine.log').get_logger()
@@ -20,18 +26,40 @@ logger = Logger(__name__, level=logging.INFO, log_to_file=True,
 router = APIRouter()
 
 
-@router.get("/all", status_code=200)
+async def magazines_etag(
+        request: Request,
+        session: AsyncSession = Depends(get_async_session),
+):
+    """ETag of the magazine list from versions of cached magazines"""
+    rows = await magazine_cache.all(session)
+    check_etag(request, make_etag(
+        "magazines", [(row["id"], row["version"]) for row in rows]
+    ))
+
+
+async def magazine_etag(
+        magazine_id: int,
+        request: Request,
+        session: AsyncSession = Depends(get_async_session),
+):
+    """ETag of the magazine from its version"""
+    magazine = await magazine_cache.get(session, magazine_id)
+    if magazine is not None:
+        check_etag(request, make_etag("magazine", magazine_id, magazine["version"]))
+
+
+@router.get("/all", status_code=200,
+            responses={200: {"model": List[MagazineResponse]}})
 async def get_all_magazines(
         user: User = Depends(current_user),
+        etag: None = Depends(magazines_etag),
         session: AsyncSession = Depends(get_async_session),
 ):
     """
     Get all magazines
     """
     try:
-        magazines = await session.execute(select(Magazine).order_by(Magazine.c.id))
-
-        return magazines.mappings().all()
+        return FastJSONResponse(await magazine_cache.all(session))
     except IndexError:
         return {"status": 404, "description": "Magazines not found"}
     except Exception as e:
@@ -39,20 +67,22 @@ async def get_all_magazines(
         return {"status": 500, "description": f"{e}"}
 
 
-@router.get("/{magazine_id}", status_code=200)
+@router.get("/{magazine_id}", status_code=200,
+            responses={200: {"model": MagazineResponse}})
 async def get_magazine_by_id(
         magazine_id: int,
         user: User = Depends(current_user),
+        etag: None = Depends(magazine_etag),
         session: AsyncSession = Depends(get_async_session),
 ):
     """
     Get magazine by id
     """
     try:
-        magazine = await session.execute(select(Magazine).where(
-            Magazine.c.id == magazine_id
-        ).order_by(Magazine.c.id))
-        return magazine.mappings().all()[0]
+        magazine = await magazine_cache.get(session, magazine_id)
+        if magazine is None:
+            raise IndexError
+        return FastJSONResponse(magazine)
     except IndexError:
         return {"status": 404, "description": "Magazine not found"}
     except Exception as e:
@@ -80,9 +110,11 @@ async def create_magazine(
         await session.execute(insert(Magazine).values(
             title=post_request.title,
             maximum_articles=post_request.maximum_articles,
+            rule_set_id=post_request.rule_set_id,
         ))
         await session.commit()
         await session.close()
+        await magazine_cache.changed()
 
         logger.info(
             f"Magazine: {post_request.title} created by superuser: {user.username}"
@@ -115,12 +147,19 @@ async def update_magazine(
                 "description": "Forbidden. Only superusers can update magazines"
             }
 
+        values = {
+            "title": post_update.title,
+            "maximum_articles": post_update.maximum_articles,
+        }
+        # the rule set is kept unless the request names one, null clears it
+        if "rule_set_id" in post_update.model_fields_set:
+            values["rule_set_id"] = post_update.rule_set_id
         await session.execute(update(Magazine
                                      ).where(Magazine.c.id == magazine_id).values(
-            title=post_update.title,
-            maximum_articles=post_update.maximum_articles,
+            **values
         ))
         await session.commit()
+        await magazine_cache.changed()
         logger.info(
             f"Magazine: {magazine_id} was updated by superuser: {user.username}"
         )
@@ -148,6 +187,7 @@ async def delete_magazine(
     try:
         await session.execute(delete(Magazine).where(Magazine.c.id == magazine_id))
         await session.commit()
+        await magazine_cache.changed()
 
         logger.info(f"Magazine: {magazine_id} was deleted by user: {user.username}")
 
@@ -1,11 +1,26 @@
+from datetime import datetime
+from typing import Optional
+
 from pydantic import BaseModel
 
 
 class MagazineCreateRequest(BaseModel):
     title: str
     maximum_articles: int
+    rule_set_id: Optional[int] = None
 
 
 class MagazineUpdateRequest(BaseModel):
     title: str
     maximum_articles: int
+    rule_set_id: Optional[int] = None
+
+
+class MagazineResponse(BaseModel):
+    id: int
+    title: str
+    publish_date: Optional[datetime]
+    maximum_articles: int
+    rule_set_id: Optional[int]
+    version: int
+    updated_at: Optional[datetime]
@@ -0,0 +1,20 @@
+from datetime import datetime
+
+from sqlalchemy import (
+    Table, Column,
+    Integer, String,
+    TIMESTAMP, MetaData,
+    JSON,
+)
+
+metadata = MetaData()
+
+RuleSet = Table(
+    'rule_sets',
+    metadata,
+    Column('id', Integer, primary_key=True),
+    Column('name', String, nullable=False),
+    Column('version', Integer, nullable=False, default=1),
+    Column('definition', JSON, nullable=False),
+    Column('created_at', TIMESTAMP, default=datetime.utcnow),
+)
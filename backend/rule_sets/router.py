@@ -0,0 +1,209 @@
+from fastapi import APIRouter, Depends, File, Form, UploadFile
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import (
+    insert, select,
+    update, delete,
+)
+
+from auth.models import User
+from auth.base_config import current_user
+from articles.article_service.rule_plan import compile_rule_set
+from magazines.models import Magazine
+from rule_sets.models import RuleSet
+from rule_sets.schemas import RuleSetCreateRequest, RuleSetUpdateRequest
+from rule_sets.utils import parse_definition
+from settings.database import get_async_session
+
+from services.logger.logger import Logger
+import logging
+
+logger = Logger(__name__, level=logging.INFO, log_to_file=True,
+                filename='rule_set.log').get_logger()
+
+router = APIRouter()
+
+
+@router.get("/all", status_code=200)
+async def get_all_rule_sets(
+        user: User = Depends(current_user),
+        session: AsyncSession = Depends(get_async_session),
+):
+    """
+    Get all rule sets
+    """
+    try:
+        rule_sets = await session.execute(select(RuleSet).order_by(RuleSet.c.id))
+        return rule_sets.mappings().all()
+    except Exception as e:
+        logger.error(f"Error getting all rule sets: {e}")
+        return {"status": 500, "description": f"{e}"}
+
+
+@router.get("/{rule_set_id}", status_code=200)
+async def get_rule_set_by_id(
+        rule_set_id: int,
+        user: User = Depends(current_user),
+        session: AsyncSession = Depends(get_async_session),
+):
+    """
+    Get rule set by id
+    """
+    try:
+        rule_set = await session.execute(select(RuleSet).where(
+            RuleSet.c.id == rule_set_id
+        ))
+        return rule_set.mappings().all()[0]
+    except IndexError:
+        return {"status": 404, "description": "Rule set not found"}
+    except Exception as e:
+        logger.error(f"Error getting rule set by id: {e}")
+        return {"status": 500, "description": f"{e}"}
+
+
+@router.post("/", status_code=201)
+async def create_rule_set(
+        post_request: RuleSetCreateRequest,
+        user: User = Depends(current_user),
+        session: AsyncSession = Depends(get_async_session),
+):
+    """
+    Create rule set from JSON body
+    """
+    definition = post_request.definition.model_dump(mode="json", exclude_none=True)
+    return await _create_rule_set(post_request.name, definition, user, session)
+
+
+@router.post("/upload", status_code=201)
+async def upload_rule_set(
+        name: str = Form(...),
+        file: UploadFile = File(...),
+        user: User = Depends(current_user),
+        session: AsyncSession = Depends(get_async_session),
+):
+    """
+    Create rule set from JSON or YAML file
+    """
+    try:
+        definition = parse_definition(file.filename, await file.read())
+    except ValueError as e:
+        return {"status": 400, "description": f"{e}"}
+    return await _create_rule_set(name, definition, user, session)
+
+
+@router.patch("/{rule_set_id}", status_code=200)
+async def update_rule_set(
+        rule_set_id: int,
+        post_update: RuleSetUpdateRequest,
+        user: User = Depends(current_user),
+        session: AsyncSession = Depends(get_async_session),
+):
+    """
+    Update rule set, every update creates a new version
+    """
+    try:
+        if not user.is_superuser:
+            logger.error(f"User: {user.username} is not a superuser")
+            return {
+                "status": 403,
+                "description": "Forbidden. Only superusers can update rule sets"
+            }
+
+        definition = post_update.definition.model_dump(mode="json", exclude_none=True)
+        compile_rule_set(rule_set_id, 0, definition)
+
+        result = await session.execute(update(RuleSet).where(
+            RuleSet.c.id == rule_set_id
+        ).values(
+            name=post_update.name,
+            definition=definition,
+            version=RuleSet.c.version + 1,
+        ))
+        if not result.rowcount:
+            raise IndexError
+        await session.commit()
+        logger.info(
+            f"Rule set: {rule_set_id} was updated by superuser: {user.username}"
+        )
+        return {"status": 200, "description": "Rule set changed successfully"}
+    except IndexError:
+        return {"status": 404, "description": "Rule set not found"}
+    except ValueError as e:
+        return {"status": 400, "description": f"{e}"}
+    except Exception as e:
+        await session.rollback()
+        logger.error(f"Error updating rule set: {e}")
+        return {"status": 500, "description": f"{e}"}
+
+
+@router.delete("/{rule_set_id}", status_code=200)
+async def delete_rule_set(
+        rule_set_id: int,
+        user: User = Depends(current_user),
+        session: AsyncSession = Depends(get_async_session),
+):
+    """
+    Delete rule set
+    """
+    try:
+        if not user.is_superuser:
+            logger.error(f"User: {user.username} is not a superuser")
+            return {
+                "status": 403,
+                "description": "Forbidden. Only superusers can delete rule sets"
+            }
+
+        # magazines using the rule set are moved to another one first
+        magazine_ids = (await session.execute(
+            select(Magazine.c.id).where(Magazine.c.rule_set_id == rule_set_id)
+        )).scalars().all()
+        if magazine_ids:
+            return {
+                "status": 409,
+                "description": f"Rule set is used by magazines: "
+                               f"{', '.join(map(str, magazine_ids))}"
+            }
+
+        await session.execute(delete(RuleSet).where(RuleSet.c.id == rule_set_id))
+        await session.commit()
+
+        logger.info(f"Rule set: {rule_set_id} was deleted by user: {user.username}")
+
+        return {"status": 200, "description": "Rule set deleted successfully"}
+    except Exception as e:
+        await session.rollback()
+        logger.error(f"Error deleting rule set: {e}")
+        return {"status": 500, "description": f"{e}"}
+
+
+async def _create_rule_set(name: str, definition: dict, user: User,
+                           session: AsyncSession):
+    """Validate and store new rule set"""
+    try:
+        if not user.is_superuser:
+            logger.error(f"User: {user.username} is not a superuser")
+            return {
+                "status": 403,
+                "description": "Forbidden. Only superusers can create rule sets"
+            }
+
+        compile_rule_set(0, 0, definition)
+
+        result = await session.execute(insert(RuleSet).values(
+            name=name,
+            definition=definition,
+            version=1,
+        ))
+        await session.commit()
+
+        logger.info(f"Rule set: {name} created by superuser: {user.username}")
+        return {
+            "status": 201,
+            "description": "Rule set created successfully",
+            "id": result.inserted_primary_key[0],
+        }
+    except ValueError as e:
+        return {"status": 400, "description": f"{e}"}
+    except Exception as e:
+        await session.rollback()
+        logger.error(f"Error creating rule set: {e}")
+        return {"status": 500, "description": f"{e}"}
@@ -0,0 +1,64 @@
+from enum import Enum
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel, Field
+
+
+class Alignment(str, Enum):
+    left = 'left'
+    center = 'center'
+    right = 'right'
+    justify = 'justify'
+
+
+class FontRule(BaseModel):
+    name: Optional[str] = None
+    size: Optional[float] = Field(default=None, gt=0)
+
+
+class MarginsRule(BaseModel):
+    """Margins in inches"""
+    top: float = Field(ge=0)
+    bottom: float = Field(ge=0)
+    left: float = Field(ge=0)
+    right: float = Field(ge=0)
+
+
+class SpacingRule(BaseModel):
+    """Space before and after paragraphs in points"""
+    before: Optional[float] = Field(default=None, ge=0)
+    after: Optional[float] = Field(default=None, ge=0)
+
+
+class HeadingRule(BaseModel):
+    alignment: Optional[Alignment] = None
+    bold: Optional[bool] = None
+    italic: Optional[bool] = None
+    title_case: bool = False
+    font_size: Optional[float] = Field(default=None, gt=0)
+
+
+class CitationRule(BaseModel):
+    """Citation form that breaks the house style and optional replacement"""
+    pattern: str
+    issue: str
+    replace: Optional[str] = None
+
+
+class RuleSetDefinition(BaseModel):
+    font: Optional[FontRule] = None
+    margins: Optional[MarginsRule] = None
+    line_spacing: Optional[float] = Field(default=None, gt=0)
+    paragraph_spacing: Optional[SpacingRule] = None
+    headings: Dict[int, HeadingRule] = Field(default_factory=dict)
+    citations: List[CitationRule] = Field(default_factory=list)
+
+
+class RuleSetCreateRequest(BaseModel):
+    name: str
+    definition: RuleSetDefinition
+
+
+class RuleSetUpdateRequest(BaseModel):
+    name: str
+    definition: RuleSetDefinition
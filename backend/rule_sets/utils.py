@@ -0,0 +1,20 @@
+import json
+
+import yaml
+
+
+def parse_definition(filename: str, content: bytes) -> dict:
+    """Parse rule set definition from JSON or YAML file"""
+    name = filename.lower()
+    if name.endswith((".yaml", ".yml")):
+        definition = yaml.safe_load(content)
+    elif name.endswith(".json"):
+        definition = json.loads(content)
+    else:
+        raise ValueError(
+            "Invalid file extension. Only .json and .yaml files are allowed"
+        )
+
+    if not isinstance(definition, dict):
+        raise ValueError("Rule set definition must be a mapping")
+    return definition
@@ -1,5 +1,6 @@
 import os
 from auth.models import User
+from magazines.cache import magazine_cache
 from magazines.models import Magazine
 from passlib.context import CryptContext
 from sqlalchemy import select, insert
@@ -60,6 +61,7 @@ class InitializationData:
                 stmt = insert(Magazine).values(title="Magazine 1", maximum_articles=5)
                 await self.session.execute(stmt)
                 await self.session.commit()
+                magazine_cache.invalidate()
                 logger.info("Magazines created")
 
         except Exception as e:
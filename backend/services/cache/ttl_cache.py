@@ -0,0 +1,59 @@
+"""
+In-process TTL cache with LRU eviction
+"""
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+
+class TTLCache:
+    """
+    Size-limited mapping whose entries expire after ``ttl`` seconds.
+    The least recently used entry is evicted when ``maxsize`` is reached.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+
+    def get(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        """Return a fresh value for the key or default"""
+        item = self._data.get(key)
+        if item is None:
+            return default
+
+        expires_at, value = item
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            return default
+
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Store value for the key, evicting the oldest entries if needed"""
+        if self.maxsize <= 0:
+            return
+
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def invalidate(self, key: Hashable) -> None:
+        """Drop the key from the cache"""
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        """Drop all keys"""
+        self._data.clear()
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+_MISSING = object()
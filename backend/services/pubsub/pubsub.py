@@ -0,0 +1,141 @@
+"""
+Publish/subscribe between uvicorn worker processes
+
+Subscribers are plain callables registered per channel. When the database is
+PostgreSQL, messages are sent with NOTIFY and every process (including the
+sender) receives them through its own LISTEN connection. Otherwise messages
+are only delivered inside the current process.
+
+Messages sent while the connection is down are lost, so reconnect callbacks
+are called every time it is established again, caches drop what they hold.
+"""
+import asyncio
+from typing import Callable, Dict, Optional, Set
+
+import asyncpg
+
+import logging
+from services.logger.logger import Logger
+
+logger = Logger(__name__, level=logging.INFO, log_to_file=True,
+                filename='pubsub.log').get_logger()
+
+Subscriber = Callable[[str], None]
+
+RECONNECT_DELAY = 5
+
+
+class PubSub:
+    """Channel based pub/sub with an optional Postgres LISTEN/NOTIFY bridge"""
+
+    def __init__(self):
+        self._subscribers: Dict[str, Set[Subscriber]] = {}
+        self._reconnect_callbacks: Set[Callable[[], None]] = set()
+        self._dsn: Optional[str] = None
+        self._connection: Optional[asyncpg.Connection] = None
+        self._connection_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._connected = asyncio.Event()
+
+    def subscribe(self, channel: str, callback: Subscriber) -> Callable[[], None]:
+        """Register callback for channel, return function to unsubscribe"""
+        if channel not in self._subscribers and self._connection is not None:
+            asyncio.ensure_future(self._listen(channel))
+        self._subscribers.setdefault(channel, set()).add(callback)
+
+        def unsubscribe():
+            self._subscribers.get(channel, set()).discard(callback)
+
+        return unsubscribe
+
+    def on_reconnect(self, callback: Callable[[], None]) -> Callable[[], None]:
+        """Register callback for messages possibly missed, return unsubscribe"""
+        self._reconnect_callbacks.add(callback)
+
+        def unsubscribe():
+            self._reconnect_callbacks.discard(callback)
+
+        return unsubscribe
+
+    async def publish(self, channel: str, payload: str = "") -> None:
+        """Send payload to all subscribers of channel in all processes"""
+        if self._connection is not None:
+            try:
+                async with self._connection_lock:
+                    await self._connection.execute(
+                        "SELECT pg_notify($1, $2)", channel, payload
+                    )
+                return
+            except Exception as e:
+                logger.error(f"Error publishing to channel {channel}: {e}")
+
+        self._dispatch(channel, payload)
+
+    async def start(self, dsn: str) -> None:
+        """Start LISTEN connection to the database"""
+        self._dsn = dsn
+        self._task = asyncio.ensure_future(self._run())
+        try:
+            await asyncio.wait_for(self._connected.wait(), timeout=RECONNECT_DELAY)
+        except asyncio.TimeoutError:
+            logger.error("Pub/sub is working in local mode, database is not ready")
+
+    async def stop(self) -> None:
+        """Close LISTEN connection"""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._connection is not None:
+            await self._connection.close()
+            self._connection = None
+
+    async def _run(self) -> None:
+        """Keep LISTEN connection open, reconnecting when it is lost"""
+        first_attempt = True
+        while True:
+            lost = asyncio.Event()
+            try:
+                self._connection = await asyncpg.connect(self._dsn)
+                self._connection.add_termination_listener(lambda _: lost.set())
+                for channel in list(self._subscribers):
+                    await self._listen(channel)
+                self._connected.set()
+                logger.info("Pub/sub connected")
+                if not first_attempt:
+                    self._reconnected()
+                first_attempt = False
+                await lost.wait()
+                logger.error("Pub/sub connection lost")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Pub/sub connection error: {e}")
+
+            first_attempt = False
+            self._connection = None
+            await asyncio.sleep(RECONNECT_DELAY)
+
+    async def _listen(self, channel: str) -> None:
+        """LISTEN on channel using the shared connection"""
+        async with self._connection_lock:
+            await self._connection.add_listener(channel, self._on_notification)
+
+    def _on_notification(self, connection, pid, channel, payload) -> None:
+        self._dispatch(channel, payload)
+
+    def _reconnected(self) -> None:
+        for callback in list(self._reconnect_callbacks):
+            try:
+                callback()
+            except Exception as e:
+                logger.error(f"Error in reconnect callback: {e}")
+
+    def _dispatch(self, channel: str, payload: str) -> None:
+        for callback in list(self._subscribers.get(channel, ())):
+            try:
+                callback(payload)
+            except Exception as e:
+                logger.error(f"Error in subscriber of channel {channel}: {e}")
+
+
+pubsub = PubSub()
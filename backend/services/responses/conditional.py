@@ -0,0 +1,106 @@
+"""
+Conditional GET and compression of JSON responses
+
+Endpoints get a strong ETag from a cheap query, usually the version column
+of one row, through a dependency which answers a matching If-None-Match
+with 304 before the handler loads anything. The middleware adds the ETag
+to the response and compresses large JSON bodies.
+"""
+import gzip
+import hashlib
+
+from fastapi import HTTPException, Request
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from settings.config import GZIP_LEVEL, GZIP_MIN_SIZE
+
+ETAG_STATE = "etag"
+GZIP_SUFFIX = "-gzip"
+
+
+def make_etag(*parts) -> str:
+    """Strong ETag of the values the representation depends on"""
+    digest = hashlib.sha1(repr(parts).encode()).hexdigest()[:24]
+    return f'"{digest}"'
+
+
+def _matches(header: str, etag: str) -> bool:
+    if header.strip() == "*":
+        return True
+    for candidate in header.split(","):
+        candidate = candidate.strip().removeprefix("W/")
+        # the compressed representation has its own tag
+        if candidate.replace(GZIP_SUFFIX + '"', '"') == etag:
+            return True
+    return False
+
+
+def check_etag(request: Request, etag: str) -> None:
+    """Remember the ETag of the response, stop with 304 if client has it"""
+    request.state.etag = etag
+    header = request.headers.get("if-none-match")
+    if header and _matches(header, etag):
+        raise HTTPException(status_code=304, headers={
+            "ETag": etag, "Cache-Control": "private, no-cache",
+        })
+
+
+class ConditionalGetMiddleware:
+    """Add ETag set by the endpoint to successful responses, gzip large JSON"""
+
+    def __init__(self, app: ASGIApp, minimum_size: int = GZIP_MIN_SIZE,
+                 level: int = GZIP_LEVEL):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.level = level
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        # the endpoint writes its ETag here
+        state = scope.setdefault("state", {})
+        accepts_gzip = "gzip" in Headers(scope=scope).get("accept-encoding", "")
+        start: Message = {}
+        body = []
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal start
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                if not headers.get("content-type", "").startswith("application/json"):
+                    await send(message)
+                    start = {}
+                    return
+                start = message
+                return
+            if not start:
+                await send(message)
+                return
+
+            body.append(message.get("body", b""))
+            if message.get("more_body", False):
+                return
+            await self._send_json(start, b"".join(body), state, accepts_gzip, send)
+
+        await self.app(scope, receive, send_wrapper)
+
+    async def _send_json(self, start: Message, body: bytes, state: dict,
+                         accepts_gzip: bool, send: Send) -> None:
+        headers = MutableHeaders(raw=start["headers"])
+        etag = state.get(ETAG_STATE) if start["status"] == 200 else None
+        compress = accepts_gzip and len(body) >= self.minimum_size
+
+        if compress:
+            body = gzip.compress(body, compresslevel=self.level)
+            headers["Content-Encoding"] = "gzip"
+            headers["Content-Length"] = str(len(body))
+            headers.add_vary_header("Accept-Encoding")
+        if etag:
+            headers["ETag"] = etag[:-1] + GZIP_SUFFIX + '"' if compress else etag
+            headers["Cache-Control"] = "private, no-cache"
+
+        await send(start)
+        await send({"type": "http.response.body", "body": body})
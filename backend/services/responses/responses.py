@@ -0,0 +1,24 @@
+"""
+JSON response serialized with orjson
+
+Handlers return plain rows of explicit projections in this response, so
+FastAPI neither validates them nor runs jsonable_encoder over every value.
+orjson serializes datetime, enum and UUID values itself.
+"""
+from typing import Any
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+
+def _default(value: Any):
+    """Values orjson does not know, like Decimal or RowMapping"""
+    return jsonable_encoder(value)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson"""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
@@ -0,0 +1,162 @@
+"""
+Fair-share scheduler for document processing jobs
+
+Jobs are queued per user and served in start-time fair queuing order: every
+job gets a virtual start tag which is the later of the current virtual time
+and the finish tag of the previous job of the same user, and the job with the
+smallest start tag runs next. The finish tag grows by the job cost, which
+depends on the document size, so a user with many or large documents does
+not delay small documents of other users.
+
+The queue wait is estimated from the queued cost and the observed processing
+speed, new jobs are not admitted when the estimate is over the limit.
+"""
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import logging
+from services.logger.logger import Logger
+from settings.config import (
+    SCHEDULER_CONCURRENCY, SCHEDULER_COST_UNIT,
+    SCHEDULER_MAX_WAIT, SCHEDULER_SECONDS_PER_COST,
+)
+
+logger = Logger(__name__, level=logging.INFO, log_to_file=True,
+                filename='scheduler.log').get_logger()
+
+Job = Callable[[], Awaitable[Any]]
+
+# weight of the last job in the processing speed estimate
+SPEED_SMOOTHING = 0.2
+DRAIN_POLL_INTERVAL = 0.1
+
+
+class QueueFull(Exception):
+    """Estimated queue wait is over the limit"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Processing queue is full, retry after {retry_after} s")
+        self.retry_after = retry_after
+
+
+class FairScheduler:
+    """Per-user fair queue of jobs run by a fixed number of workers"""
+
+    def __init__(self, concurrency: int, max_wait: float, cost_unit: int,
+                 seconds_per_cost: float):
+        self.concurrency = concurrency
+        self.max_wait = max_wait
+        self.cost_unit = cost_unit
+        self.seconds_per_cost = seconds_per_cost
+
+        self._heap: List[Tuple[float, int, Any, float, Job]] = []
+        self._finish_tags: Dict[Any, float] = {}
+        self._virtual_time = 0.0
+        self._sequence = itertools.count()
+        self._queued_cost = 0.0
+        self._running_cost = 0.0
+        self._running = 0
+        self._available: Optional[asyncio.Semaphore] = None
+        self._workers: List[asyncio.Task] = []
+
+    def cost(self, size: int) -> float:
+        """Cost of processing a document of the given size in bytes"""
+        return 1 + (size or 0) / self.cost_unit
+
+    def estimated_wait(self, cost: float = 0, pending: float = None,
+                       concurrency: int = None) -> float:
+        """
+        Seconds until a job of the given cost would be finished.
+        Cost of pending jobs and the number of jobs running at once are given
+        when the jobs are run outside this process.
+        """
+        if pending is None:
+            pending = self._queued_cost + self._running_cost
+        concurrency = concurrency or self.concurrency
+        return (pending + cost) * self.seconds_per_cost / concurrency
+
+    def admit(self, cost: float, pending: float = None,
+              concurrency: int = None) -> None:
+        """Raise QueueFull if the job would wait longer than allowed"""
+        wait = self.estimated_wait(cost, pending, concurrency)
+        if wait > self.max_wait:
+            raise QueueFull(max(1, math.ceil(wait - self.max_wait)))
+
+    def submit(self, user_id: Any, cost: float, job: Job) -> None:
+        """Queue job of the user"""
+        self._ensure_workers()
+
+        start = max(self._virtual_time, self._finish_tags.get(user_id, 0.0))
+        self._finish_tags[user_id] = start + cost
+        heapq.heappush(self._heap, (start, next(self._sequence), user_id, cost, job))
+        self._queued_cost += cost
+        self._available.release()
+
+    def observe(self, seconds_per_cost: float) -> None:
+        """Adjust the processing speed estimate by a finished job"""
+        self.seconds_per_cost += SPEED_SMOOTHING * (
+            seconds_per_cost - self.seconds_per_cost
+        )
+
+    async def drain(self, timeout: float) -> None:
+        """Wait for queued and running jobs up to timeout, then stop"""
+        deadline = time.monotonic() + timeout
+        while (self._heap or self._running) and time.monotonic() < deadline:
+            await asyncio.sleep(DRAIN_POLL_INTERVAL)
+        if self._heap or self._running:
+            logger.info(f"{len(self._heap)} queued jobs dropped on shutdown")
+        await self.stop()
+
+    async def stop(self) -> None:
+        """Cancel workers, queued jobs are dropped"""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._available = None
+        self._heap = []
+        self._queued_cost = self._running_cost = 0.0
+        self._running = 0
+
+    def _ensure_workers(self) -> None:
+        if self._workers:
+            return
+        self._available = asyncio.Semaphore(0)
+        self._workers = [
+            asyncio.ensure_future(self._work()) for _ in range(self.concurrency)
+        ]
+
+    async def _work(self) -> None:
+        """Run jobs in fair order"""
+        while True:
+            await self._available.acquire()
+            start, _, user_id, cost, job = heapq.heappop(self._heap)
+            self._virtual_time = start
+            self._queued_cost -= cost
+            self._running_cost += cost
+            self._running += 1
+            if self._finish_tags.get(user_id, 0.0) <= start + cost:
+                # no more jobs of the user are queued
+                del self._finish_tags[user_id]
+
+            began = time.monotonic()
+            try:
+                await job()
+            except Exception as e:
+                logger.error(f"Error in job of user {user_id}: {e}")
+            finally:
+                self._running_cost -= cost
+                self._running -= 1
+                self.observe((time.monotonic() - began) / cost)
+
+
+scheduler = FairScheduler(
+    concurrency=SCHEDULER_CONCURRENCY,
+    max_wait=SCHEDULER_MAX_WAIT,
+    cost_unit=SCHEDULER_COST_UNIT,
+    seconds_per_cost=SCHEDULER_SECONDS_PER_COST,
+)
@@ -0,0 +1,32 @@
+from sqlalchemy import (
+    Table, Column,
+    Integer, String,
+    Text, ForeignKey,
+    MetaData, Computed,
+    Index,
+)
+from sqlalchemy.dialects.postgresql import TSVECTOR
+
+from articles.models import Articles
+
+metadata = MetaData()
+
+# text search configuration used to build and query the index
+SEARCH_CONFIG = "english"
+
+# Postgres index of article text, single-node SQLite uses an FTS5 table instead
+ArticleSearch = Table(
+    'article_search',
+    metadata,
+    Column('article_id', ForeignKey(Articles.c.id, ondelete='CASCADE'),
+           primary_key=True),
+    Column('magazine_id', Integer, nullable=True, index=True),
+    Column('title', String, nullable=False),
+    Column('body', Text, nullable=False),
+    Column('document', TSVECTOR, Computed(
+        f"setweight(to_tsvector('{SEARCH_CONFIG}', title), 'A') || "
+        f"setweight(to_tsvector('{SEARCH_CONFIG}', body), 'B')",
+        persisted=True,
+    )),
+    Index('ix_article_search_document', 'document', postgresql_using='gin'),
+)
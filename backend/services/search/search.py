@@ -0,0 +1,136 @@
+"""
+Full-text search over processed articles
+
+Postgres keeps a weighted tsvector of title and body with a GIN index.
+SQLite, used in single-node mode, keeps the same data in an FTS5 table.
+Snippets are built only for the page of results, not for every match.
+"""
+import re
+from typing import List, Optional
+
+from sqlalchemy import delete, func, select, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from services.search.models import SEARCH_CONFIG, ArticleSearch
+from settings.config import SEARCH_MAX_BODY
+
+HEADLINE_OPTIONS = "MaxFragments=2, MaxWords=20, MinWords=5"
+SNIPPET_WORDS = 20
+QUERY_TERM = re.compile(r'"[^"]*"|\S+')
+
+FTS_TABLE = text(
+    "CREATE VIRTUAL TABLE IF NOT EXISTS article_search USING fts5("
+    "title, body, magazine_id UNINDEXED, tokenize='porter unicode61')"
+)
+FTS_DELETE = text("DELETE FROM article_search WHERE rowid = :article_id")
+FTS_INSERT = text(
+    "INSERT INTO article_search (rowid, title, body, magazine_id) "
+    "VALUES (:article_id, :title, :body, :magazine_id)"
+)
+
+
+def _is_postgres(session) -> bool:
+    return session.bind.dialect.name == "postgresql"
+
+
+def fts_query(query: str) -> str:
+    """User query as FTS5 query, every word or quoted phrase must match"""
+    terms = []
+    for term in QUERY_TERM.findall(query):
+        term = term.replace('"', "").strip()
+        if term:
+            terms.append(f'"{term}"')
+    return " ".join(terms)
+
+
+async def index_article(session, article_id: int, magazine_id: Optional[int],
+                        title: str, body: str) -> None:
+    """Add article text to the index or replace it, the caller commits"""
+    # only the beginning of very long documents is searchable
+    body = body[:SEARCH_MAX_BODY]
+    if _is_postgres(session):
+        values = dict(
+            article_id=article_id, magazine_id=magazine_id, title=title, body=body
+        )
+        await session.execute(
+            pg_insert(ArticleSearch).values(**values).on_conflict_do_update(
+                index_elements=[ArticleSearch.c.article_id], set_=values
+            )
+        )
+        return
+
+    await session.execute(FTS_TABLE)
+    await session.execute(FTS_DELETE, {"article_id": article_id})
+    await session.execute(FTS_INSERT, {
+        "article_id": article_id, "title": title, "body": body,
+        "magazine_id": magazine_id,
+    })
+
+
+async def remove_article(session, article_id: int) -> None:
+    """Remove article from the index, the caller commits"""
+    if _is_postgres(session):
+        await session.execute(
+            delete(ArticleSearch).where(ArticleSearch.c.article_id == article_id)
+        )
+        return
+    await session.execute(FTS_TABLE)
+    await session.execute(FTS_DELETE, {"article_id": article_id})
+
+
+async def search_articles(session, query: str,
+                          magazine_ids: Optional[List[int]] = None,
+                          limit: int = 20, offset: int = 0) -> List[dict]:
+    """Articles matching the query, best first, with highlighted snippets"""
+    if _is_postgres(session):
+        statement = postgres_search(query, magazine_ids, limit, offset)
+        result = await session.execute(statement)
+        return [dict(row) for row in result.mappings()]
+
+    match = fts_query(query)
+    if not match:
+        return []
+    await session.execute(FTS_TABLE)
+    where = "article_search MATCH :match"
+    params = {"match": match, "limit": limit, "offset": offset}
+    if magazine_ids:
+        placeholders = ", ".join(f":magazine_{i}" for i in range(len(magazine_ids)))
+        where += f" AND magazine_id IN ({placeholders})"
+        params.update({f"magazine_{i}": value for i, value in enumerate(magazine_ids)})
+
+    # bm25 is lower for better matches, title matches weigh more like in Postgres
+    result = await session.execute(text(
+        "SELECT rowid AS article_id, magazine_id, title, "
+        "-bm25(article_search, 10.0, 1.0) AS rank, "
+        f"snippet(article_search, 1, '<b>', '</b>', '...', {SNIPPET_WORDS}) "
+        "AS snippet "
+        f"FROM article_search WHERE {where} "
+        "ORDER BY rank DESC LIMIT :limit OFFSET :offset"
+    ), params)
+    return [dict(row) for row in result.mappings()]
+
+
+def postgres_search(query: str, magazine_ids: Optional[List[int]],
+                    limit: int, offset: int):
+    """Rank matches with the GIN index, build headlines for one page only"""
+    tsquery = func.websearch_to_tsquery(SEARCH_CONFIG, query)
+    rank = func.ts_rank_cd(ArticleSearch.c.document, tsquery)
+
+    page = select(ArticleSearch.c.article_id, rank.label("rank")).where(
+        ArticleSearch.c.document.op("@@")(tsquery)
+    )
+    if magazine_ids:
+        page = page.where(ArticleSearch.c.magazine_id.in_(magazine_ids))
+    page = page.order_by(rank.desc()).limit(limit).offset(offset).subquery()
+
+    snippet = func.ts_headline(
+        SEARCH_CONFIG, ArticleSearch.c.body, tsquery, HEADLINE_OPTIONS
+    )
+    return (
+        select(
+            ArticleSearch.c.article_id, ArticleSearch.c.magazine_id,
+            ArticleSearch.c.title, page.c.rank, snippet.label("snippet"),
+        )
+        .join(page, page.c.article_id == ArticleSearch.c.article_id)
+        .order_by(page.c.rank.desc())
+    )
@@ -0,0 +1,111 @@
+"""
+Garbage collector of the document storage
+
+Reference counts of blobs are taken from the ``articles`` table: a blob is
+referenced by every row which has its key as the original or updated file.
+Blobs are checked in batches of keys, each batch costs one indexed query.
+Blobs younger than the grace period are kept, they may belong to a job which
+has not saved its article yet. Storing equal content again refreshes the age
+of the blob, so right before a blob is deleted its references and then its
+age are read again: an upload which reused it after it was listed keeps it.
+
+The collector runs in the worker process, or in the API process when it runs
+the jobs itself. On PostgreSQL a pass holds an advisory lock, so several
+processes never collect at the same time.
+"""
+import asyncio
+import time
+from collections import Counter
+from typing import Dict, Iterable
+
+from sqlalchemy import func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from articles.models import Articles
+from services.storage.storage import DocumentStorage, storage
+from settings.config import STORAGE_GC_BATCH, STORAGE_GC_GRACE, STORAGE_GC_INTERVAL
+from settings.database import async_session_maker
+
+import logging
+from services.logger.logger import Logger
+
+logger = Logger(__name__, level=logging.INFO, log_to_file=True,
+                filename='storage.log').get_logger()
+
+# key of the advisory lock of a collection pass
+GC_LOCK_KEY = 7_310_341
+
+
+async def acquire_gc_lock(session: AsyncSession) -> bool:
+    """Lock held until the transaction ends, False if another process has it"""
+    if session.bind.dialect.name != "postgresql":
+        return True
+    return await session.scalar(select(func.pg_try_advisory_xact_lock(GC_LOCK_KEY)))
+
+
+async def reference_counts(session: AsyncSession,
+                           keys: Iterable[str]) -> Dict[str, int]:
+    """Number of article references of every key"""
+    keys = list(keys)
+    result = await session.execute(
+        select(Articles.c.original_file, Articles.c.updated_file).where(or_(
+            Articles.c.original_file.in_(keys), Articles.c.updated_file.in_(keys)
+        ))
+    )
+    counts = Counter()
+    for original_file, updated_file in result.all():
+        counts[original_file] += 1
+        counts[updated_file] += 1
+    return {key: counts[key] for key in keys}
+
+
+async def is_still_garbage(session: AsyncSession, document_storage: DocumentStorage,
+                           key: str, older_than: float) -> bool:
+    """Blob is unreferenced and old right now, not only when it was listed"""
+    # an upload refreshes the blob before its article is written, so the age
+    # read after the references shows every reuse the references miss
+    if (await reference_counts(session, [key]))[key]:
+        return False
+    modified = await asyncio.to_thread(document_storage.modified, key)
+    return modified is not None and modified < older_than
+
+
+async def collect_garbage(session: AsyncSession, document_storage: DocumentStorage,
+                          batch_size: int = STORAGE_GC_BATCH,
+                          grace: float = STORAGE_GC_GRACE) -> int:
+    """Remove blobs no article references, return number of removed blobs"""
+    older_than = time.time() - grace
+    removed = 0
+    after = ""
+    while True:
+        batch = await asyncio.to_thread(document_storage.list, after, batch_size)
+        if not batch:
+            break
+        after = batch[-1][0]
+
+        counts = await reference_counts(session, [key for key, _ in batch])
+        for key, modified in batch:
+            if counts[key] == 0 and modified < older_than:
+                if await is_still_garbage(session, document_storage, key, older_than):
+                    await asyncio.to_thread(document_storage.delete, key)
+                    removed += 1
+
+    removed_temp = await asyncio.to_thread(
+        document_storage.remove_stale_temp_files, older_than
+    )
+    logger.info(f"Storage GC removed {removed} blobs and {removed_temp} temp files")
+    return removed
+
+
+async def run_garbage_collector(interval: float = STORAGE_GC_INTERVAL) -> None:
+    """Collect garbage periodically"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            async with async_session_maker() as session:
+                if await acquire_gc_lock(session):
+                    await collect_garbage(session, storage)
+                else:
+                    logger.info("Storage GC is running in another process")
+        except Exception as e:
+            logger.error(f"Storage GC error: {e}")
@@ -0,0 +1,319 @@
+"""
+Content-addressed document storage
+
+Documents are stored once per content under a key derived from their SHA-256
+hash and sharded into two directory levels (``documents/ab/cd/abcd....docx``),
+so directories stay small and equal uploads share one blob. Writes go to a
+temporary file which is renamed (or uploaded) only when it is complete.
+
+Blobs are never deleted when an article changes, because other articles may
+reference the same content. Unreferenced blobs are removed by the garbage
+collector, see ``services.storage.gc``.
+"""
+import asyncio
+import hashlib
+import os
+import tempfile
+from abc import ABC, abstractmethod
+from typing import Awaitable, Callable, Iterable, List, Optional, Tuple
+
+import boto3
+
+from settings.config import (
+    S3_ACCESS_KEY, S3_BUCKET, S3_ENDPOINT_URL, S3_SECRET_KEY,
+    STORAGE_BACKEND, STORAGE_CACHE_SIZE, STORAGE_ROOT,
+)
+
+KEY_PREFIX = "documents/"
+# paths of documents saved before the storage existed, relative to backend dir
+LEGACY_PREFIX = "articles/documents/"
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+CHUNK_SIZE = 1024 * 1024
+
+
+class StorageBackend(ABC):
+    """Place where blobs are kept"""
+
+    @abstractmethod
+    def put(self, key: str, source_path: str) -> None:
+        """Store file under key, the source file is consumed"""
+
+    @abstractmethod
+    def fetch(self, key: str) -> str:
+        """Local path of the blob"""
+
+    @abstractmethod
+    def exists(self, key: str) -> bool:
+        pass
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        pass
+
+    @abstractmethod
+    def modified(self, key: str) -> Optional[float]:
+        """Modification time of the blob, None if it does not exist"""
+
+    @abstractmethod
+    def list(self, after: str, limit: int) -> List[Tuple[str, float]]:
+        """Keys greater than after with their modification time, sorted by key"""
+
+    @abstractmethod
+    def temp_dir(self) -> str:
+        """Directory for files which are not stored yet"""
+
+
+class LocalStorage(StorageBackend):
+    """Blobs in a local directory"""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def put(self, key: str, source_path: str) -> None:
+        target = self.fetch(key)
+        if os.path.exists(target):
+            # same content is stored already, keep it fresh for the collector
+            os.utime(target)
+            os.remove(source_path)
+            return
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(source_path, target)
+
+    def fetch(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(self.fetch(key))
+
+    def delete(self, key: str) -> None:
+        try:
+            os.remove(self.fetch(key))
+        except FileNotFoundError:
+            pass
+
+    def modified(self, key: str) -> Optional[float]:
+        try:
+            return os.path.getmtime(self.fetch(key))
+        except FileNotFoundError:
+            return None
+
+    def list(self, after: str, limit: int) -> List[Tuple[str, float]]:
+        found = []
+        for key in self._keys(os.path.join(self.root, KEY_PREFIX), KEY_PREFIX, after):
+            found.append((key, os.path.getmtime(self.fetch(key))))
+            if len(found) == limit:
+                break
+        return found
+
+    def _keys(self, directory: str, prefix: str, after: str) -> Iterable[str]:
+        """Keys under directory in sorted order, shards before after are skipped"""
+        try:
+            names = sorted(os.listdir(directory))
+        except FileNotFoundError:
+            return
+        for name in names:
+            path = os.path.join(directory, name)
+            if os.path.isdir(path):
+                key = f"{prefix}{name}/"
+                if key < after[:len(key)]:
+                    continue
+                yield from self._keys(path, key, after)
+            elif f"{prefix}{name}" > after:
+                yield f"{prefix}{name}"
+
+    def temp_dir(self) -> str:
+        return os.path.join(self.root, "tmp")
+
+
+class S3Storage(StorageBackend):
+    """Blobs in an S3 compatible bucket, fetched blobs are cached locally"""
+
+    def __init__(self, client, bucket: str, cache_dir: str,
+                 cache_size: int = STORAGE_CACHE_SIZE):
+        self.client = client
+        self.bucket = bucket
+        self.cache_dir = cache_dir
+        self.cache_size = cache_size
+
+    def put(self, key: str, source_path: str) -> None:
+        # S3 puts are atomic, the object appears only when it is complete
+        try:
+            self.client.upload_file(source_path, self.bucket, key)
+        finally:
+            os.remove(source_path)
+
+    def fetch(self, key: str) -> str:
+        path = os.path.join(self.cache_dir, key)
+        if os.path.exists(path):
+            # modification time of a cached blob is its last use
+            os.utime(path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.makedirs(self.temp_dir(), exist_ok=True)
+            descriptor, temp_path = tempfile.mkstemp(dir=self.temp_dir())
+            os.close(descriptor)
+            try:
+                self.client.download_file(self.bucket, key, temp_path)
+                os.replace(temp_path, path)
+            except Exception:
+                os.remove(temp_path)
+                raise
+            self.evict_cache(keep=path)
+        return path
+
+    def evict_cache(self, keep: str = None) -> int:
+        """Remove least recently used cached blobs until the cache fits its size"""
+        cached = []
+        for directory, _, names in os.walk(os.path.join(self.cache_dir, KEY_PREFIX)):
+            for name in names:
+                path = os.path.join(directory, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                cached.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in cached)
+        removed = 0
+        for _, size, path in sorted(cached):
+            if total <= self.cache_size:
+                break
+            if path == keep:
+                continue
+            # a job still reading the blob keeps its open file
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        return removed
+
+    def exists(self, key: str) -> bool:
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=key)
+            return True
+        except Exception:
+            return False
+
+    def delete(self, key: str) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=key)
+        try:
+            os.remove(os.path.join(self.cache_dir, key))
+        except FileNotFoundError:
+            pass
+
+    def modified(self, key: str) -> Optional[float]:
+        try:
+            response = self.client.head_object(Bucket=self.bucket, Key=key)
+        except Exception:
+            return None
+        return response["LastModified"].timestamp()
+
+    def list(self, after: str, limit: int) -> List[Tuple[str, float]]:
+        response = self.client.list_objects_v2(
+            Bucket=self.bucket, Prefix=KEY_PREFIX,
+            StartAfter=max(after, KEY_PREFIX), MaxKeys=limit,
+        )
+        return [
+            (item["Key"], item["LastModified"].timestamp())
+            for item in response.get("Contents", [])
+        ]
+
+    def temp_dir(self) -> str:
+        return os.path.join(self.cache_dir, "tmp")
+
+
+class DocumentStorage:
+    """Stores documents by content and resolves keys to local files"""
+
+    def __init__(self, backend: StorageBackend):
+        self.backend = backend
+
+    def temp_path(self, suffix: str = ".docx") -> str:
+        """New empty temporary file to be stored later"""
+        os.makedirs(self.backend.temp_dir(), exist_ok=True)
+        descriptor, path = tempfile.mkstemp(suffix=suffix, dir=self.backend.temp_dir())
+        os.close(descriptor)
+        return path
+
+    def save_file(self, path: str) -> str:
+        """Store the file and return its key, the file is consumed"""
+        digest = hashlib.sha256()
+        with open(path, "rb") as source:
+            for chunk in iter(lambda: source.read(CHUNK_SIZE), b""):
+                digest.update(chunk)
+        key = blob_key(digest.hexdigest())
+        self.backend.put(key, path)
+        return key
+
+    async def save_upload(self, file,
+                          validate: Callable[[str], Awaitable] = None) -> str:
+        """Store uploaded file and return its key, validate may reject it first"""
+        path = self.temp_path()
+        try:
+            with open(path, "wb") as target:
+                while chunk := await file.read(CHUNK_SIZE):
+                    target.write(chunk)
+            if validate is not None:
+                await validate(path)
+        except Exception:
+            os.remove(path)
+            raise
+        return await asyncio.to_thread(self.save_file, path)
+
+    def local_path(self, key: str) -> str:
+        """Local file with the document"""
+        if is_blob_key(key):
+            return self.backend.fetch(key)
+        return os.path.join(BASE_DIR, key)
+
+    def list(self, after: str, limit: int) -> List[Tuple[str, float]]:
+        return self.backend.list(after, limit)
+
+    def delete(self, key: str) -> None:
+        self.backend.delete(key)
+
+    def modified(self, key: str) -> Optional[float]:
+        return self.backend.modified(key)
+
+    def remove_stale_temp_files(self, older_than: float) -> int:
+        """Remove temporary files left by interrupted writes"""
+        removed = 0
+        directory = self.backend.temp_dir()
+        if not os.path.isdir(directory):
+            return 0
+        for name in os.listdir(directory):
+            path = os.path.join(directory, name)
+            try:
+                if os.path.getmtime(path) < older_than:
+                    os.remove(path)
+                    removed += 1
+            except FileNotFoundError:
+                pass
+        return removed
+
+
+def blob_key(content_hash: str) -> str:
+    """Sharded key of the content"""
+    return f"{KEY_PREFIX}{content_hash[:2]}/{content_hash[2:4]}/{content_hash}.docx"
+
+
+def is_blob_key(key: Optional[str]) -> bool:
+    return bool(key) and key.startswith(KEY_PREFIX)
+
+
+def create_backend() -> StorageBackend:
+    """Backend selected by STORAGE_BACKEND"""
+    if STORAGE_BACKEND == "s3":
+        client = boto3.client(
+            "s3", endpoint_url=S3_ENDPOINT_URL,
+            aws_access_key_id=S3_ACCESS_KEY, aws_secret_access_key=S3_SECRET_KEY,
+        )
+        cache_dir = os.path.join(STORAGE_ROOT, "cache")
+        return S3Storage(client, S3_BUCKET, cache_dir=cache_dir)
+    return LocalStorage(STORAGE_ROOT)
+
+
+storage = DocumentStorage(create_backend())
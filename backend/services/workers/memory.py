@@ -0,0 +1,47 @@
+"""
+Memory budget shared by document processing jobs of the process
+"""
+import asyncio
+from contextlib import asynccontextmanager
+
+from settings.config import MEMORY_BUDGET
+
+
+class MemoryBudget:
+    """Semaphore counting bytes, jobs wait until their estimate fits the budget"""
+
+    def __init__(self, total: int):
+        self.total = total
+        self.used = 0
+        self._condition = None
+
+    async def acquire(self, amount: int) -> int:
+        """Reserve memory, a job larger than the budget runs alone"""
+        amount = min(amount, self.total)
+        async with self._get_condition():
+            await self._condition.wait_for(lambda: self.used + amount <= self.total)
+            self.used += amount
+        return amount
+
+    async def release(self, amount: int) -> None:
+        async with self._get_condition():
+            self.used -= amount
+            self._condition.notify_all()
+
+    @asynccontextmanager
+    async def reserve(self, amount: int):
+        """Hold memory for the duration of the block"""
+        reserved = await self.acquire(amount)
+        try:
+            yield
+        finally:
+            await self.release(reserved)
+
+    def _get_condition(self) -> asyncio.Condition:
+        # created lazily, inside the running loop
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        return self._condition
+
+
+memory_budget = MemoryBudget(MEMORY_BUDGET)
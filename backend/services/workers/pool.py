@@ -0,0 +1,158 @@
+"""
+Recycled process pool for document processing
+
+lxml and python-docx fragment the heap of a process, and a pathological
+document may leave a worker with a lot of memory it never gives back. Jobs
+run in a process pool which is replaced by a fresh one after a number of jobs
+or when a worker reports resident memory above the limit. The old pool
+finishes its running jobs and exits.
+
+Workers send progress of jobs through a queue shared by all pool generations,
+a thread of the parent process passes it to the callbacks of the jobs.
+"""
+import asyncio
+import itertools
+import multiprocessing
+import os
+import resource
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+import logging
+from services.logger.logger import Logger
+from settings.config import WORKER_MAX_JOBS, WORKER_MAX_RSS, WORKER_PROCESSES
+
+logger = Logger(__name__, level=logging.INFO, log_to_file=True,
+                filename='workers.log').get_logger()
+
+_progress_queue = None
+
+
+def current_rss() -> int:
+    """Resident memory of this process in bytes"""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        # peak memory where /proc is not available
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _init_worker(progress_queue) -> None:
+    global _progress_queue
+    _progress_queue = progress_queue
+
+
+def _run_job(job_id: int, function: Callable, args: tuple, kwargs: dict):
+    """Run job in a worker, return its result and memory of the worker"""
+    def progress(step: str) -> None:
+        _progress_queue.put((job_id, step))
+
+    try:
+        result = function(*args, progress=progress, **kwargs)
+    finally:
+        # the last message of the job, its callback is dropped after it
+        _progress_queue.put((job_id, None))
+    return result, current_rss()
+
+
+class RecyclingPool:
+    """Process pool replaced after max_jobs jobs or when a worker grows over max_rss"""
+
+    def __init__(self, processes: int, max_jobs: int, max_rss: int):
+        self.processes = processes
+        self.max_jobs = max_jobs
+        self.max_rss = max_rss
+
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._jobs = 0
+        self._job_ids = itertools.count()
+        self._callbacks: Dict[int, Callable[[str], None]] = {}
+        self._progress_queue = None
+        self._reader: Optional[threading.Thread] = None
+
+    async def run(self, function: Callable, *args,
+                  progress: Callable[[str], None] = None, **kwargs) -> Any:
+        """
+        Run function(*args, progress=..., **kwargs) in a worker process.
+        The progress callback is called from another thread.
+        """
+        executor = self._get_executor()
+        self._jobs += 1
+        job_id = next(self._job_ids)
+        if progress is not None:
+            self._callbacks[job_id] = progress
+
+        loop = asyncio.get_running_loop()
+        try:
+            result, rss = await loop.run_in_executor(
+                executor, _run_job, job_id, function, args, kwargs
+            )
+        except BaseException:
+            # worker may have died without sending the last message
+            self._callbacks.pop(job_id, None)
+            raise
+
+        if rss > self.max_rss:
+            logger.info(f"Worker memory {rss} bytes is over the limit, recycling")
+            self.recycle(executor)
+        return result
+
+    def recycle(self, executor: Optional[ProcessPoolExecutor] = None) -> None:
+        """Replace the pool, running jobs of the old one are finished"""
+        if executor is not None and executor is not self._executor:
+            # already replaced by another job
+            return
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+        self._executor = None
+
+    def shutdown(self) -> None:
+        """Stop workers"""
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+        if self._progress_queue is not None:
+            self._progress_queue.put(None)
+            self._reader.join()
+            self._progress_queue = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is not None and self._jobs >= self.max_jobs:
+            logger.info(f"Pool ran {self._jobs} jobs, recycling")
+            self.recycle()
+        if self._executor is None:
+            if self._progress_queue is None:
+                self._progress_queue = multiprocessing.Queue()
+                self._reader = threading.Thread(target=self._read_progress, daemon=True)
+                self._reader.start()
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.processes,
+                initializer=_init_worker, initargs=(self._progress_queue,),
+            )
+            self._jobs = 0
+        return self._executor
+
+    def _read_progress(self) -> None:
+        """Pass progress messages of workers to job callbacks"""
+        queue = self._progress_queue
+        while True:
+            message = queue.get()
+            if message is None:
+                return
+            job_id, step = message
+            if step is None:
+                self._callbacks.pop(job_id, None)
+                continue
+            callback = self._callbacks.get(job_id)
+            if callback is not None:
+                try:
+                    callback(step)
+                except Exception as e:
+                    logger.error(f"Error in progress callback: {e}")
+
+
+processing_pool = RecyclingPool(
+    processes=WORKER_PROCESSES, max_jobs=WORKER_MAX_JOBS, max_rss=WORKER_MAX_RSS
+)
@@ -18,3 +18,102 @@ DB_PASS = os.environ.get("DB_PASS")
 
 DATABASE_URL = f"postgresql+asyncpg://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 TEST_DATABASE_URL = "sqlite+aiosqlite:///./test.db"
+
+# Compiled SQLAlchemy statements and asyncpg prepared statements kept
+# per engine and per connection, 0 disables prepared statements (pgbouncer)
+QUERY_CACHE_SIZE = int(os.environ.get("QUERY_CACHE_SIZE", 1000))
+PREPARED_STATEMENT_CACHE_SIZE = int(
+    os.environ.get("PREPARED_STATEMENT_CACHE_SIZE", 500)
+)
+
+# Authenticated user records cached in every process
+USER_CACHE_TTL = float(os.environ.get("USER_CACHE_TTL", 60))
+USER_CACHE_SIZE = int(os.environ.get("USER_CACHE_SIZE", 1024))
+
+# Magazines are cached per process and invalidated through pub/sub
+MAGAZINE_CACHE_TTL = float(os.environ.get("MAGAZINE_CACHE_TTL", 300))
+
+# Documents above these sizes are processed by the streaming engine
+STREAMING_FILE_SIZE = int(os.environ.get("STREAMING_FILE_SIZE", 50 * 1024 * 1024))
+STREAMING_XML_SIZE = int(os.environ.get("STREAMING_XML_SIZE", 20 * 1024 * 1024))
+STREAMING_BATCH_SIZE = int(os.environ.get("STREAMING_BATCH_SIZE", 200))
+
+# Embedded images larger than needed at the target DPI are downsampled (needs Pillow)
+IMAGE_DOWNSAMPLE = os.environ.get("IMAGE_DOWNSAMPLE", "false").lower() == "true"
+IMAGE_TARGET_DPI = int(os.environ.get("IMAGE_TARGET_DPI", 150))
+IMAGE_JPEG_QUALITY = int(os.environ.get("IMAGE_JPEG_QUALITY", 85))
+IMAGE_CACHE_SIZE = int(os.environ.get("IMAGE_CACHE_SIZE", 64 * 1024 * 1024))
+
+# Small documents are checked inside the upload request within the time budget
+SYNC_MAX_FILE_SIZE = int(os.environ.get("SYNC_MAX_FILE_SIZE", 1024 * 1024))
+SYNC_MAX_PARAGRAPHS = int(os.environ.get("SYNC_MAX_PARAGRAPHS", 400))
+SYNC_TIME_BUDGET = float(os.environ.get("SYNC_TIME_BUDGET", 3))
+
+# Document processing queue, jobs are shared fairly between users
+SCHEDULER_CONCURRENCY = int(os.environ.get("SCHEDULER_CONCURRENCY", 2))
+SCHEDULER_MAX_WAIT = float(os.environ.get("SCHEDULER_MAX_WAIT", 600))
+SCHEDULER_COST_UNIT = int(os.environ.get("SCHEDULER_COST_UNIT", 1024 * 1024))
+SCHEDULER_SECONDS_PER_COST = float(os.environ.get("SCHEDULER_SECONDS_PER_COST", 2))
+
+# Document storage, "local" or "s3"
+STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "local")
+STORAGE_ROOT = os.environ.get(
+    "STORAGE_ROOT", os.path.join(os.path.dirname(os.path.dirname(__file__)), "storage")
+)
+S3_BUCKET = os.environ.get("S3_BUCKET")
+S3_ENDPOINT_URL = os.environ.get("S3_ENDPOINT_URL")
+S3_ACCESS_KEY = os.environ.get("S3_ACCESS_KEY")
+S3_SECRET_KEY = os.environ.get("S3_SECRET_KEY")
+# bytes of S3 blobs cached locally, least recently used ones are removed first
+STORAGE_CACHE_SIZE = int(os.environ.get("STORAGE_CACHE_SIZE", 10 * 1024 ** 3))
+# unreferenced blobs are removed in batches, recent ones may belong to running jobs
+STORAGE_GC_INTERVAL = float(os.environ.get("STORAGE_GC_INTERVAL", 3600))
+STORAGE_GC_BATCH = int(os.environ.get("STORAGE_GC_BATCH", 500))
+STORAGE_GC_GRACE = float(os.environ.get("STORAGE_GC_GRACE", 24 * 3600))
+
+# Memory limits of document processing
+MEMORY_BUDGET = int(os.environ.get("MEMORY_BUDGET", 2 * 1024 ** 3))
+MAX_UNCOMPRESSED_SIZE = int(os.environ.get("MAX_UNCOMPRESSED_SIZE", 1024 ** 3))
+MAX_COMPRESSION_RATIO = float(os.environ.get("MAX_COMPRESSION_RATIO", 100))
+MAX_MEMORY_ESTIMATE = int(os.environ.get("MAX_MEMORY_ESTIMATE", 4 * 1024 ** 3))
+# processing workers are replaced after this many jobs or this much memory
+WORKER_PROCESSES = int(os.environ.get("WORKER_PROCESSES", 2))
+WORKER_MAX_JOBS = int(os.environ.get("WORKER_MAX_JOBS", 100))
+WORKER_MAX_RSS = int(os.environ.get("WORKER_MAX_RSS", 1024 ** 3))
+
+# Processing runs inside the API process, or in separate workers fed through
+# the processing_jobs table
+EMBEDDED_WORKER = os.environ.get("EMBEDDED_WORKER", "true").lower() == "true"
+WORKER_CONCURRENCY = int(os.environ.get("WORKER_CONCURRENCY", SCHEDULER_CONCURRENCY))
+# worker processes started with entrypoints.worker, for the queue wait estimate
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", 1))
+JOB_POLL_INTERVAL = float(os.environ.get("JOB_POLL_INTERVAL", 5))
+# claimed jobs of a worker which stopped renewing them are taken by others
+JOB_LEASE = float(os.environ.get("JOB_LEASE", 300))
+# the article is marked failed after this many claims of its job
+JOB_MAX_ATTEMPTS = int(os.environ.get("JOB_MAX_ATTEMPTS", 3))
+# running jobs are given this long to finish on SIGTERM
+SHUTDOWN_TIMEOUT = float(os.environ.get("SHUTDOWN_TIMEOUT", 60))
+
+# Entry points
+API_HOST = os.environ.get("API_HOST", "0.0.0.0")
+API_PORT = int(os.environ.get("API_PORT", 8000))
+API_WORKERS = int(os.environ.get("API_WORKERS", 1))
+
+# Results of finished jobs are committed together, waiting at most this long
+RESULT_BATCH_SIZE = int(os.environ.get("RESULT_BATCH_SIZE", 50))
+RESULT_BATCH_DELAY = float(os.environ.get("RESULT_BATCH_DELAY", 0.005))
+
+# Bulk re-check commits results and its checkpoint after this many articles
+RECHECK_CHUNK_SIZE = int(os.environ.get("RECHECK_CHUNK_SIZE", 20))
+
+# characters of document text put into the search index, Postgres rejects
+# a tsvector over 1 MB
+SEARCH_MAX_BODY = int(os.environ.get("SEARCH_MAX_BODY", 200_000))
+
+# JSON responses at least this large are compressed for clients accepting gzip
+GZIP_MIN_SIZE = int(os.environ.get("GZIP_MIN_SIZE", 1024))
+GZIP_LEVEL = int(os.environ.get("GZIP_LEVEL", 6))
+
+# Compiled magazine rule sets kept per process
+RULE_PLAN_CACHE_SIZE = int(os.environ.get("RULE_PLAN_CACHE_SIZE", 128))
@@ -5,7 +5,10 @@ from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy import MetaData
 
-from settings.config import DB_HOST, DB_NAME, DB_PASS, DB_PORT, DB_USER
+from settings.config import (
+    DB_HOST, DB_NAME, DB_PASS, DB_PORT, DB_USER,
+    PREPARED_STATEMENT_CACHE_SIZE, QUERY_CACHE_SIZE,
+)
 
 DATABASE_URL = f"postgresql+asyncpg://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 TEST_DATABASE_URL = "sqlite+aiosqlite:///./test.db"
@@ -14,7 +17,11 @@ Base = declarative_base()
 
 metadata = MetaData()
 
-engine = create_async_engine(DATABASE_URL)
+engine = create_async_engine(
+    DATABASE_URL,
+    query_cache_size=QUERY_CACHE_SIZE,
+    connect_args={"prepared_statement_cache_size": PREPARED_STATEMENT_CACHE_SIZE},
+)
 async_session_maker = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
 
@@ -1,3 +1,4 @@
+import asyncio
 import os
 
 from fastapi import FastAPI
@@ -5,14 +6,25 @@ from fastapi.middleware.cors import CORSMiddleware
 from auth.router import router as router_auth
 from magazines.router import router as router_magazines
 from articles.router import router as router_articles
+from rule_sets.router import router as router_rule_sets
 
-from settings.database import async_session_maker
+from settings.config import EMBEDDED_WORKER, SHUTDOWN_TIMEOUT
+from settings.database import async_session_maker, engine
+
+from services.pubsub.pubsub import pubsub
+from services.responses.conditional import ConditionalGetMiddleware
+from services.responses.responses import FastJSONResponse
+from services.scheduler.scheduler import scheduler
+from articles.result_writer import result_writer
+from services.storage.gc import run_garbage_collector
+from services.workers.pool import processing_pool
 
 from services.autostart.initial_data import InitializationData
 
 app = FastAPI(
     title=" ComeBack Agency",
     description="API for ComeBack Agency",
+    default_response_class=FastJSONResponse,
 )
 
 current_dir = os.path.join(os.path.dirname(__file__))
@@ -29,6 +41,12 @@ app.include_router(
     prefix="/magazines",
     tags=["Magazines"],
 )
+# Rule sets of magazine house styles
+app.include_router(
+    router_rule_sets,
+    prefix="/rule-sets",
+    tags=["Rule sets"],
+)
 # Articles
 app.include_router(
     router_articles,
@@ -43,6 +61,26 @@ async def startup_event():
         init_data = InitializationData(session)
         await init_data.start_app()
 
+    if engine.dialect.name == "postgresql":
+        dsn = engine.url.set(drivername="postgresql")
+        await pubsub.start(dsn.render_as_string(hide_password=False))
+
+    # separate workers collect storage garbage, not every API process
+    app.state.storage_gc = None
+    if EMBEDDED_WORKER:
+        app.state.storage_gc = asyncio.ensure_future(run_garbage_collector())
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    if app.state.storage_gc is not None:
+        app.state.storage_gc.cancel()
+    # queued documents are processed before the process exits
+    await scheduler.drain(SHUTDOWN_TIMEOUT)
+    await result_writer.stop()
+    await pubsub.stop()
+    processing_pool.shutdown()
+
 
 origins = ["*"]
 
@@ -53,4 +91,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "OPTIONS", "DELETE", "PATCH", "PUT"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
+# ETags of endpoints and gzip of large JSON responses
+app.add_middleware(ConditionalGetMiddleware)
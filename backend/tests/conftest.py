@@ -11,6 +11,7 @@ from sqlalchemy.pool import NullPool
 from settings.database import get_async_session, metadata
 from settings.config import TEST_DATABASE_URL
 from settings.main import app
+from services.storage.storage import LocalStorage, storage
 
 
 engine_test = create_async_engine(TEST_DATABASE_URL, poolclass=NullPool)
@@ -28,6 +29,13 @@ async def override_get_async_session() -> AsyncGenerator[AsyncSession, None]:
 app.dependency_overrides[get_async_session] = override_get_async_session
 
 
+@pytest.fixture(autouse=True, scope='session')
+def document_storage(tmp_path_factory):
+    """Documents written by tests are kept in a temporary directory"""
+    storage.backend = LocalStorage(str(tmp_path_factory.mktemp("storage")))
+    yield storage
+
+
 @pytest.fixture(autouse=True, scope='session')
 async def prepare_database():
     async with engine_test.begin() as conn:
@@ -0,0 +1,67 @@
+"""
+Sample .docx documents for workflow tests
+"""
+import io
+import random
+import struct
+import zlib
+
+import docx
+from docx.shared import Inches, Pt
+
+BODY = (
+    "Reading habits changed a lot during the last decade (Smith, 2019). "
+    "Later studies confirmed the trend ( Brown, 2020, p. 12)."
+)
+
+
+def png_image(width: int, height: int, seed: int = 0) -> bytes:
+    """RGB PNG filled with noise, so it does not compress well"""
+    generator = random.Random(seed)
+    rows = b"".join(
+        b"\x00" + generator.randbytes(width * 3) for _ in range(height)
+    )
+
+    def chunk(kind, data):
+        return (struct.pack(">I", len(data)) + kind + data
+                + struct.pack(">I", zlib.crc32(kind + data)))
+
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return b"".join([
+        b"\x89PNG\r\n\x1a\n",
+        chunk(b"IHDR", header),
+        chunk(b"IDAT", zlib.compress(rows)),
+        chunk(b"IEND", b""),
+    ])
+
+
+def build_document(path: str, paragraphs: int = 20, body: str = BODY,
+                   images: int = 0, image_width: float = 3) -> str:
+    """Save APA-like manuscript with headings, citations and wrong fonts"""
+    document = docx.Document()
+    document.add_paragraph("the reading habits of students", style="Title")
+    document.add_paragraph("Jane Doe, University of Testing")
+    document.add_paragraph("Author Note")
+    document.add_paragraph("Abstract")
+    document.add_paragraph("Short abstract of the study about reading habits.")
+    document.add_paragraph("Keywords: Reading, Habits, Students")
+    document.add_heading("introduction to the topic", level=1)
+
+    for index in range(paragraphs):
+        paragraph = document.add_paragraph()
+        run = paragraph.add_run(f"{index}. {body}")
+        run.font.name = "Arial"
+        run.font.size = Pt(11)
+        if index % 5 == 4:
+            document.add_heading(f"section number {index}", level=2)
+
+    for index in range(images):
+        document.add_picture(io.BytesIO(png_image(400, 300, seed=index)),
+                             width=Inches(image_width))
+
+    document.add_heading("References", level=1)
+    document.add_paragraph(
+        "Smith, J. (2019). Reading habits. Journal of Reading, 1(2), 3-4."
+    )
+    document.save(path)
+    return path
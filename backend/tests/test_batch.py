@@ -0,0 +1,63 @@
+import json
+import os
+
+import pytest
+
+from articles.batch import SUMMARY_NAME, report_path, run_batch
+from tests.documents import build_document
+
+
+@pytest.mark.asyncio
+async def test_batch_writes_documents_reports_and_summary(tmp_path):
+    """Every document gets an updated copy and a report, summary adds them up"""
+    input_dir, output_dir = tmp_path / "archive", tmp_path / "checked"
+    os.makedirs(input_dir / "2019")
+    build_document(str(input_dir / "first.docx"))
+    build_document(str(input_dir / "2019" / "second.docx"), paragraphs=20)
+    (input_dir / "broken.docx").write_bytes(b"not a document")
+
+    summary = await run_batch(str(input_dir), str(output_dir), workers=2)
+
+    assert summary["files"] == 3
+    assert summary["checked"] == 2
+    assert list(summary["failures"]) == ["broken.docx"]
+    assert os.path.exists(output_dir / "2019" / "second.docx")
+    with open(report_path(str(output_dir), os.path.join("2019", "second.docx"))) as f:
+        report = json.load(f)
+    assert report["report"]["format_issues"]["issues"]
+    assert summary["issues"] == sum(summary["documents"].values()) > 0
+    with open(output_dir / SUMMARY_NAME) as f:
+        assert json.load(f)["checked"] == 2
+
+
+@pytest.mark.asyncio
+async def test_resume_skips_checked_files(tmp_path):
+    """Only new or changed files are checked again with resume"""
+    input_dir, output_dir = tmp_path / "archive", tmp_path / "checked"
+    os.makedirs(input_dir)
+    build_document(str(input_dir / "first.docx"))
+    await run_batch(str(input_dir), str(output_dir), workers=1)
+
+    build_document(str(input_dir / "second.docx"))
+    checked = []
+    summary = await run_batch(
+        str(input_dir), str(output_dir), workers=1, resume=True,
+        on_progress=lambda done, total, failed, started: checked.append(total),
+    )
+
+    assert checked == [1]
+    assert summary["checked"] == 2
+
+
+@pytest.mark.asyncio
+async def test_relative_directories_are_resolved(tmp_path, monkeypatch):
+    """Relative input and output directories are made absolute for the workers"""
+    os.makedirs(tmp_path / "archive")
+    build_document(str(tmp_path / "archive" / "first.docx"))
+    monkeypatch.chdir(tmp_path)
+
+    summary = await run_batch("archive", "checked", workers=1)
+
+    assert summary["checked"] == 1
+    assert os.path.exists(tmp_path / "checked" / "first.docx")
+    assert os.path.exists(report_path(str(tmp_path / "checked"), "first.docx"))
@@ -0,0 +1,197 @@
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from auth.models import User
+from auth.utils import USERS_CHANNEL, CachedUserDatabase, user_cache
+from magazines.cache import MAGAZINES_CHANNEL, MagazineCache, magazine_cache
+from magazines.models import metadata as magazines_metadata, Magazine
+from services.pubsub.pubsub import PubSub, pubsub
+from services.cache.ttl_cache import TTLCache
+from settings.database import Base
+
+
+def test_ttl_cache_expires_entries():
+    """Entries older than ttl are not returned"""
+    cache = TTLCache(maxsize=10, ttl=30)
+    with patch("services.cache.ttl_cache.time.monotonic", return_value=100):
+        cache.set("key", "value")
+        assert cache.get("key") == "value"
+
+    with patch("services.cache.ttl_cache.time.monotonic", return_value=131):
+        assert cache.get("key") is None
+        assert len(cache) == 0
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    """The oldest untouched entry is evicted when the cache is full"""
+    cache = TTLCache(maxsize=2, ttl=30)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert "a" in cache
+    assert "b" not in cache
+    assert "c" in cache
+
+
+@pytest.fixture
+async def magazine_session():
+    """In-memory database with magazines table"""
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(magazines_metadata.create_all)
+        await conn.execute(Magazine.insert().values(title="First", maximum_articles=3))
+    session_maker = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    yield session_maker
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_magazines_are_read_through(magazine_session):
+    """Magazines are loaded once and reloaded after invalidation"""
+    cache = MagazineCache(ttl=60)
+    async with magazine_session() as session:
+        assert (await cache.get(session, 1))["title"] == "First"
+
+        with patch.object(session, "execute") as execute:
+            assert [m["id"] for m in await cache.all(session)] == [1]
+            assert await cache.get(session, 2) is None
+        execute.assert_not_called()
+
+        await session.execute(Magazine.insert().values(title="Second",
+                                                       maximum_articles=1))
+        await session.commit()
+        cache.invalidate()
+        assert (await cache.get(session, 2))["title"] == "Second"
+
+
+@pytest.mark.asyncio
+async def test_magazine_change_is_published(magazine_session):
+    """Published change invalidates the shared magazine cache"""
+    async with magazine_session() as session:
+        await magazine_cache.get(session, 1)
+        received = []
+        unsubscribe = pubsub.subscribe(MAGAZINES_CHANNEL, received.append)
+        await magazine_cache.changed()
+        unsubscribe()
+
+        assert received == [""]
+        with patch.object(session, "execute", wraps=session.execute) as execute:
+            await magazine_cache.get(session, 1)
+        execute.assert_called_once()
+
+
+@pytest.fixture
+async def user_session():
+    """In-memory database with user table"""
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session_maker = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    user_cache.clear()
+    async with session_maker() as session:
+        session.add(User(
+            id=1, email="cache@test.com", username="cache",
+            hashed_password="hash", is_active=True,
+        ))
+        await session.commit()
+    yield session_maker
+    user_cache.clear()
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_user_is_loaded_once(user_session):
+    """Second lookup is served from the cache without a query"""
+    async with user_session() as session:
+        user_db = CachedUserDatabase(session, User)
+        assert (await user_db.get(1)).email == "cache@test.com"
+
+    async with user_session() as session:
+        user_db = CachedUserDatabase(session, User)
+        with patch.object(session, "execute") as execute:
+            user = await user_db.get(1)
+
+        execute.assert_not_called()
+        assert user.username == "cache"
+        assert user.is_active is True
+
+
+@pytest.mark.asyncio
+async def test_deactivated_user_is_invalidated(user_session):
+    """Update drops the cached record so is_active is read again"""
+    async with user_session() as session:
+        user_db = CachedUserDatabase(session, User)
+        user = await user_db.get(1)
+        await user_db.update(user, {"is_active": False})
+
+    async with user_session() as session:
+        user = await CachedUserDatabase(session, User).get(1)
+        assert user.is_active is False
+
+
+@pytest.mark.asyncio
+async def test_user_change_is_published(user_session):
+    """Other processes drop the cached user when it is updated anywhere"""
+    async with user_session() as session:
+        user_db = CachedUserDatabase(session, User)
+        user = await user_db.get(1)
+        received = []
+        unsubscribe = pubsub.subscribe(USERS_CHANNEL, received.append)
+        await user_db.update(user, {"is_superuser": True})
+        unsubscribe()
+    assert received == ["1"]
+
+    # message of another process drops the record cached here
+    async with user_session() as session:
+        await CachedUserDatabase(session, User).get(1)
+    assert "1" in user_cache
+    pubsub._dispatch(USERS_CHANNEL, "1")
+    assert "1" not in user_cache
+
+
+class FakeConnection:
+    """asyncpg connection which can be dropped by the test"""
+
+    def __init__(self):
+        self.add_listener = AsyncMock()
+        self.close = AsyncMock()
+        self.terminated = None
+
+    def add_termination_listener(self, callback):
+        self.terminated = callback
+
+
+@pytest.mark.asyncio
+async def test_caches_are_dropped_on_reconnect(magazine_session):
+    """Invalidations missed while pub/sub was disconnected do not leave stale rows"""
+    connections = [FakeConnection(), FakeConnection()]
+    listener = PubSub()
+    dropped = []
+    listener.on_reconnect(lambda: dropped.append(True))
+
+    with patch("services.pubsub.pubsub.asyncpg.connect",
+               AsyncMock(side_effect=connections)), \
+            patch("services.pubsub.pubsub.RECONNECT_DELAY", 0):
+        await listener.start("postgresql://test")
+        assert dropped == []
+
+        connections[0].terminated(connections[0])
+        while connections[1].terminated is None:
+            await asyncio.sleep(0.01)
+        await listener.stop()
+
+    assert dropped == [True]
+
+    # the shared caches are registered for reconnects
+    async with magazine_session() as session:
+        await magazine_cache.get(session, 1)
+    user_cache.set("1", object())
+    pubsub._reconnected()
+    assert magazine_cache._rows is None
+    assert "1" not in user_cache
@@ -0,0 +1,92 @@
+import pytest
+from fastapi import Depends, FastAPI, Request
+from fastapi.responses import PlainTextResponse
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import insert, select, update
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from articles.models import Articles, metadata as articles_metadata
+from services.responses.conditional import (
+    ConditionalGetMiddleware, check_etag, make_etag,
+)
+from services.responses.responses import FastJSONResponse
+
+calls = []
+
+
+async def item_etag(item_id: int, request: Request):
+    check_etag(request, make_etag("item", item_id, 1))
+
+
+app = FastAPI(default_response_class=FastJSONResponse)
+app.add_middleware(ConditionalGetMiddleware, minimum_size=100)
+
+
+@app.get("/items/{item_id}")
+async def get_item(item_id: int, size: int = 1, etag: None = Depends(item_etag)):
+    calls.append(item_id)
+    return {"id": item_id, "text": "x" * size}
+
+
+@app.get("/text")
+async def get_text():
+    return PlainTextResponse("y" * 1000)
+
+
+@pytest.fixture
+async def conditional_client():
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        yield client
+
+
+@pytest.mark.asyncio
+async def test_not_modified_skips_handler(conditional_client):
+    """Matching If-None-Match is answered before the handler runs"""
+    calls.clear()
+    first = await conditional_client.get(
+        "/items/1", headers={"Accept-Encoding": "identity"}
+    )
+    etag = first.headers["etag"]
+    assert first.status_code == 200 and "content-encoding" not in first.headers
+
+    second = await conditional_client.get("/items/1", headers={"If-None-Match": etag})
+    assert second.status_code == 304
+    assert second.headers["etag"] == etag
+    assert calls == [1]
+
+    other = await conditional_client.get("/items/2", headers={"If-None-Match": etag})
+    assert other.status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_large_json_is_compressed(conditional_client):
+    """Only JSON over the threshold is compressed, with its own ETag"""
+    response = await conditional_client.get(
+        "/items/3", params={"size": 500}, headers={"Accept-Encoding": "gzip"}
+    )
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.json()["text"] == "x" * 500
+    assert response.headers["etag"].endswith('-gzip"')
+
+    again = await conditional_client.get("/items/3", headers={
+        "Accept-Encoding": "gzip", "If-None-Match": response.headers["etag"],
+    })
+    assert again.status_code == 304
+
+    text = await conditional_client.get("/text", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in text.headers
+
+
+@pytest.mark.asyncio
+async def test_update_bumps_article_version():
+    """Every update of an article changes its version"""
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(articles_metadata.create_all)
+        await conn.execute(insert(Articles).values(title="a", refactor_type="APA"))
+        await conn.execute(update(Articles).values(title="b"))
+        await conn.execute(update(Articles).values(title="c"))
+        version = await conn.scalar(select(Articles.c.version))
+    await engine.dispose()
+    assert version == 3
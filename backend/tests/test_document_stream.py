@@ -0,0 +1,53 @@
+import zipfile
+from unittest.mock import patch
+
+import docx
+import pytest
+from lxml import etree
+
+from articles.article_service.document_work_apa import DocumentWorkFlowAPA
+from articles.article_service.document_work_stream import (
+    W_NS, DocumentWorkFlowAPAStream,
+)
+from articles.article_service.mapper_type import DocumentWorkFlowFactory
+from tests.documents import build_document
+
+
+def canonical_body(path):
+    """Canonical XML of the document body"""
+    with zipfile.ZipFile(path) as package:
+        root = etree.fromstring(package.read("word/document.xml"))
+    body = root.find(f"{{{W_NS}}}body")
+    return etree.tostring(body, method="c14n")
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("batch_size", [1, 7, 1000])
+async def test_stream_matches_document_workflow(tmp_path, batch_size):
+    """Streaming engine gives the same report and document as python-docx one"""
+    path = build_document(str(tmp_path / "document.docx"), paragraphs=40)
+
+    workflow = DocumentWorkFlowAPA(path)
+    await workflow.start_flow()
+    expected_path = str(tmp_path / "expected.docx")
+    workflow.document.save(expected_path)
+
+    stream = DocumentWorkFlowAPAStream(path, batch_size=batch_size)
+    await stream.start_flow()
+
+    assert await stream.create_report() == await workflow.create_report()
+    assert canonical_body(stream.output_path) == canonical_body(expected_path)
+    assert docx.Document(stream.output_path).paragraphs[0].text
+
+
+@pytest.mark.asyncio
+async def test_large_documents_are_streamed(tmp_path):
+    """Factory routes documents above the size threshold to streaming engine"""
+    path = build_document(str(tmp_path / "document.docx"))
+
+    with patch("articles.article_service.document_work_stream.STREAMING_XML_SIZE", 0):
+        workflow = DocumentWorkFlowFactory.create_workflow(style="APA", path=path)
+    assert isinstance(workflow, DocumentWorkFlowAPAStream)
+
+    workflow = DocumentWorkFlowFactory.create_workflow(style="APA", path=path)
+    assert type(workflow) is DocumentWorkFlowAPA
@@ -0,0 +1,86 @@
+import asyncio
+import json
+from unittest.mock import patch
+
+import pytest
+
+from articles.events import (
+    DONE, FINAL_STATUSES, QUEUED, RUNNING, StatusSubscription, publish_status,
+)
+from articles.tasks import check_document
+from tests.documents import build_document
+
+
+async def collect(stream):
+    """Parsed data of server-sent events, keepalive comments are skipped"""
+    events = []
+    async for message in stream:
+        if message.startswith("event:"):
+            events.append(json.loads(message.split("data: ", 1)[1]))
+    return events
+
+
+@pytest.mark.asyncio
+async def test_article_stream_ends_when_processed():
+    """Article stream gets only its events and stops on the final status"""
+    subscription = StatusSubscription(
+        accept=lambda event: event["article_id"] == 7,
+        until=lambda event: event["status"] in FINAL_STATUSES,
+    )
+    received = asyncio.ensure_future(
+        collect(subscription.stream(initial=[{"article_id": 7, "status": QUEUED}]))
+    )
+
+    await publish_status(8, 1, RUNNING)
+    await publish_status(7, 1, RUNNING, rule="front")
+    await publish_status(7, 1, DONE)
+    events = await asyncio.wait_for(received, 1)
+
+    assert [event["status"] for event in events] == [QUEUED, RUNNING, DONE]
+    assert events[1]["rule"] == "front"
+
+
+@pytest.mark.asyncio
+async def test_processed_article_stream_is_closed_at_once():
+    """Client connected after processing gets the final status only"""
+    subscription = StatusSubscription(
+        accept=lambda event: True,
+        until=lambda event: event["status"] in FINAL_STATUSES,
+    )
+    events = await asyncio.wait_for(
+        collect(subscription.stream(initial=[{"article_id": 1, "status": DONE}])), 1
+    )
+
+    assert [event["status"] for event in events] == [DONE]
+
+
+@pytest.mark.asyncio
+async def test_slow_client_keeps_terminal_events():
+    """Oldest progress events are dropped first, terminal events never"""
+    subscription = StatusSubscription(accept=lambda event: True)
+    sent = [(1, DONE), (2, RUNNING), (2, RUNNING), (3, DONE), (4, RUNNING),
+            (5, DONE), (6, RUNNING), (7, DONE)]
+    with patch("articles.events.EVENTS_QUEUE_SIZE", 3):
+        for article_id, status in sent:
+            subscription._on_event(json.dumps(
+                {"article_id": article_id, "status": status}
+            ))
+    subscription.close()
+
+    assert [event["article_id"] for event in subscription._events] == [1, 3, 5, 7]
+
+
+@pytest.mark.asyncio
+async def test_workflow_reports_rule_progress(tmp_path):
+    """Workflow calls progress callback before every rule"""
+    path = build_document(str(tmp_path / "document.docx"))
+    rules = []
+
+    await check_document("APA", path, "test_user", analyze_only=True,
+                         progress=rules.append)
+
+    assert rules[0] == "front"
+    assert rules[-1] == "reference_list"
+    assert "tables" in rules
+    assert "headers" in rules
+    assert len(rules) == 12
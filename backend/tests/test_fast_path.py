@@ -0,0 +1,101 @@
+import os
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from fastapi import BackgroundTasks
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from articles.article_service.document_work_stream import DocumentWorkFlowAPAStream
+from articles.article_service.mapper_type import create_apa_workflow
+from articles.tasks import check_document, document_process_inline, use_fast_path
+from tests.documents import build_document
+
+
+@pytest.mark.asyncio
+async def test_analyze_only_does_not_save(tmp_path):
+    """Analyze-only check returns the report without an updated document"""
+    path = build_document(str(tmp_path / "document.docx"))
+
+    with patch("docx.document.Document.save") as save:
+        result = await check_document("APA", path, "test_user", analyze_only=True)
+
+    save.assert_not_called()
+    assert result["updated_file"] is None
+    assert result["list_issues"]["format_issues"]["issues"]
+
+
+@pytest.mark.asyncio
+async def test_stream_analyze_only_writes_nothing(tmp_path):
+    """Streaming engine in analyze-only mode gives the report without a package"""
+    path = build_document(str(tmp_path / "document.docx"), paragraphs=30)
+
+    full = DocumentWorkFlowAPAStream(path, batch_size=5)
+    await full.start_flow()
+    analyze = DocumentWorkFlowAPAStream(path, batch_size=5, analyze_only=True)
+    await analyze.start_flow()
+
+    assert analyze.output_path is None
+    assert await analyze.create_report() == await full.create_report()
+    os.remove(full.output_path)
+
+
+def test_fast_path_threshold(tmp_path):
+    """Only documents with few paragraphs are checked inside the request"""
+    path = build_document(str(tmp_path / "document.docx"), paragraphs=10)
+
+    assert use_fast_path(path)
+    with patch("articles.tasks.SYNC_MAX_PARAGRAPHS", 5):
+        assert not use_fast_path(path)
+
+
+@pytest.mark.asyncio
+async def test_inline_report_is_returned(tmp_path):
+    """Document checked within the time budget returns its report"""
+    path = build_document(str(tmp_path / "document.docx"))
+    session = AsyncMock(spec=AsyncSession)
+    background_tasks = BackgroundTasks()
+
+    with patch("articles.result_writer.index_texts"):
+        report = await document_process_inline(
+            background_tasks, "APA", path, 1, "test_user", session, analyze_only=True,
+        )
+
+    assert report["format_issues"]["issues"]
+    assert not background_tasks.tasks
+    session.commit.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_inline_falls_back_to_background(tmp_path):
+    """Document over the time budget is saved by the background task"""
+    path = build_document(str(tmp_path / "document.docx"))
+    session = AsyncMock(spec=AsyncSession)
+    background_tasks = BackgroundTasks()
+
+    with patch("articles.tasks.SYNC_TIME_BUDGET", 0):
+        report = await document_process_inline(
+            background_tasks, "APA", path, 1, "test_user", session, analyze_only=True,
+        )
+
+    assert report is None
+    session.commit.assert_not_awaited()
+    with patch("articles.result_writer.index_texts"):
+        await background_tasks()
+    session.commit.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_analyze_only_skips_image_pass(tmp_path):
+    """APA workflow gets analyze_only and does not downsample images"""
+    path = build_document(str(tmp_path / "document.docx"), paragraphs=30)
+
+    with patch("articles.article_service.document_work_apa.downsampling_enabled",
+               return_value=True):
+        full = create_apa_workflow(path)
+        analyze = create_apa_workflow(path, analyze_only=True)
+
+    assert full.downsampler is not None
+    assert analyze.analyze_only and analyze.downsampler is None
+    with patch.object(analyze, "_images") as images:
+        await analyze.start_flow()
+    images.assert_not_called()
@@ -1,9 +1,10 @@
 import pytest
 import uuid
 import os
-from unittest.mock import AsyncMock, patch, MagicMock
+from unittest.mock import AsyncMock, patch
 from fastapi import UploadFile
 from articles.article_service.document_init import DocumentInit
+from services.storage.storage import storage
 from sqlalchemy.ext.asyncio import AsyncSession
 from io import BytesIO
 
@@ -55,15 +56,17 @@ def mock_document_with_wrong_ext_init(test_file_txt_extension):
 @pytest.mark.asyncio
 async def test_save_document(mock_document_init, async_session):
     """Test document saving"""
-    with patch.object(mock_document_init, '_check_extension', return_value=True), \
-            patch.object(mock_document_init, '_magazine_exists', return_value=True), \
-            patch.object(mock_document_init, '_check_max_articles', return_value=True):
+    document = mock_document_init
+    with patch.object(document, '_check_extension', return_value=True), \
+            patch.object(document, '_magazine_exists', return_value=True), \
+            patch.object(document, '_check_max_articles', return_value=True), \
+            patch.object(document, '_check_package', return_value=True):
         file_path = await mock_document_init.save_document(
             user_name="test_user", session=async_session)
 
         assert file_path.endswith(".docx")
 
-        os.remove(file_path)
+        os.remove(storage.local_path(file_path))
 
 
 @pytest.mark.asyncio
@@ -87,12 +90,22 @@ async def test_check__txt_extension(mock_document_with_wrong_ext_init):
 @pytest.mark.asyncio
 async def test_magazine_exists(mock_document_init, async_session):
     """Test magazine exists check"""
-    async_session.execute.return_value.fetchone = MagicMock(return_value=(1,))
-
-    result = await mock_document_init._magazine_exists(1, async_session)
+    magazine = {"id": 1, "title": "Magazine 1", "maximum_articles": 5}
+    with patch("articles.article_service.document_init.magazine_cache.get",
+               AsyncMock(return_value=magazine)):
+        result = await mock_document_init._magazine_exists(1, async_session)
     assert result is True
 
 
+@pytest.mark.asyncio
+async def test_magazine_not_exists(mock_document_init, async_session):
+    """Test magazine exists check for unknown magazine"""
+    with patch("articles.article_service.document_init.magazine_cache.get",
+               AsyncMock(return_value=None)):
+        with pytest.raises(ValueError, match="Magazine not found."):
+            await mock_document_init._magazine_exists(2, async_session)
+
+
 @pytest.mark.asyncio
 async def test_delete_document():
     """Test document deletion"""
@@ -108,3 +121,20 @@ async def test_delete_document():
         result = await DocumentInit.delete_document(file_path)
 
         assert result is True
+
+
+@pytest.mark.asyncio
+async def test_rejected_upload_is_not_stored(mock_document_init, async_session):
+    """Upload which fails the package check leaves nothing in the storage"""
+    document = mock_document_init
+    before = storage.list("", 1000)
+    os.makedirs(storage.backend.temp_dir(), exist_ok=True)
+    temp_files = set(os.listdir(storage.backend.temp_dir()))
+    with patch.object(document, '_check_extension', return_value=True), \
+            patch.object(document, '_magazine_exists', return_value=True), \
+            patch.object(document, '_check_max_articles', return_value=True):
+        with pytest.raises(ValueError, match="Invalid .docx file"):
+            await document.save_document(user_name="test_user", session=async_session)
+
+    assert storage.list("", 1000) == before
+    assert set(os.listdir(storage.backend.temp_dir())) == temp_files
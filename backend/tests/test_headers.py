@@ -0,0 +1,120 @@
+from unittest.mock import patch
+
+import docx
+import pytest
+from docx.oxml import parse_xml
+from docx.oxml.ns import nsdecls, qn
+
+from articles.article_service import headers
+from articles.article_service.document_work_apa import DocumentWorkFlowAPA
+from articles.article_service.document_work_stream import DocumentWorkFlowAPAStream
+from articles.article_service.headers import has_page_field
+from tests.documents import build_document
+
+FOOTER_PAGE = (
+    f'<w:fldSimple {nsdecls("w")} w:instr=" PAGE ">'
+    '<w:r><w:t>3</w:t></w:r></w:fldSimple>'
+)
+
+
+def build_sections(path: str, sections: int = 3, own_header: int = None) -> str:
+    """Document whose sections share the header of the first one"""
+    document = docx.Document(build_document(path, paragraphs=5))
+    header = document.sections[0].header
+    header.paragraphs[0].text = "Running head: reading habits"
+    header.add_paragraph("1")
+    footer = document.sections[0].footer
+    footer.paragraphs[0]._p.append(parse_xml(FOOTER_PAGE))
+    for index in range(1, sections):
+        document.add_section()
+        document.add_paragraph(f"Section {index}")
+    if own_header is not None:
+        section = document.sections[own_header]
+        section.header.is_linked_to_previous = False
+        section.header.paragraphs[0].text = "Another head"
+    document.save(path)
+    return path
+
+
+def page_field_headers(path: str) -> list:
+    document = docx.Document(path)
+    return [
+        section.header.paragraphs[0] for section in document.sections
+        if has_page_field(section.header.paragraphs[0]._p)
+    ]
+
+
+@pytest.mark.asyncio
+async def test_linked_headers_are_checked_once(tmp_path):
+    """Cost follows distinct header parts, not sections"""
+    path = build_sections(str(tmp_path / "document.docx"), sections=30)
+    doc = DocumentWorkFlowAPA(path)
+
+    with patch("articles.article_service.document_work_apa.format_header",
+               wraps=headers.format_header) as format_header:
+        await doc._headers()
+
+    format_header.assert_called_once()
+    assert doc.format_issues == [
+        "Running head and page number set in header /word/header1.xml",
+        "Page number moved from footer /word/footer1.xml to header",
+    ]
+    header = doc.document.sections[0].header
+    assert [p.text for p in header.paragraphs] == ["READING HABITS\t1"]
+    assert not doc.document.sections[0].footer.paragraphs[0].text
+
+    doc.format_issues = []
+    await doc._headers()
+    assert doc.format_issues == []
+
+
+@pytest.mark.asyncio
+async def test_unlinked_header_is_checked_separately(tmp_path):
+    path = build_sections(str(tmp_path / "document.docx"), sections=4, own_header=2)
+    doc = DocumentWorkFlowAPA(path)
+
+    await doc._headers()
+
+    texts = [section.header.paragraphs[0].text for section in doc.document.sections]
+    assert texts == ["READING HABITS\t1"] * 2 + ["ANOTHER HEAD\t1"] * 2
+
+
+@pytest.mark.asyncio
+async def test_missing_header_gets_title_and_page_field(tmp_path):
+    """Header added to the first section shows on every page"""
+    path = build_document(str(tmp_path / "document.docx"))
+    doc = DocumentWorkFlowAPA(path)
+
+    await doc._headers()
+
+    header = doc.document.sections[0].header
+    assert not header.is_linked_to_previous
+    assert header.paragraphs[0].text == "THE READING HABITS OF STUDENTS\t1"
+    instructions = header._element.xpath(".//w:instrText")
+    assert [text.text.strip() for text in instructions] == ["PAGE"]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("sections", [1, 5])
+async def test_stream_headers_match_document_workflow(tmp_path, sections):
+    """Streaming engine checks and adds header parts like the python-docx one"""
+    if sections == 1:
+        path = build_document(str(tmp_path / "document.docx"))
+    else:
+        path = build_sections(str(tmp_path / "document.docx"), sections=sections)
+
+    workflow = DocumentWorkFlowAPA(path)
+    await workflow.start_flow()
+    workflow.save_to(str(tmp_path / "expected.docx"))
+    stream = DocumentWorkFlowAPAStream(path, batch_size=3)
+    await stream.start_flow()
+    stream.save_to(str(tmp_path / "streamed.docx"))
+
+    assert await stream.create_report() == await workflow.create_report()
+    expected = [p.text for p in page_field_headers(str(tmp_path / "expected.docx"))]
+    streamed = [p.text for p in page_field_headers(str(tmp_path / "streamed.docx"))]
+    assert streamed == expected
+    # the reference list starts a section of its own
+    assert len(streamed) == len(docx.Document(str(tmp_path / "streamed.docx")).sections)
+    assert qn("w:tab") in [child.tag for child in page_field_headers(
+        str(tmp_path / "streamed.docx"))[0]._p.iter()]
@@ -0,0 +1,103 @@
+import zipfile
+from unittest.mock import patch
+
+import docx
+import pytest
+
+from articles.article_service.document_work_apa import DocumentWorkFlowAPA
+from articles.article_service.document_work_stream import DocumentWorkFlowAPAStream
+from articles.article_service.images import (
+    CACHE_ENTRY_SIZE, EMU_PER_INCH, KEEP, ImageCache, ImageDownsampler,
+    collect_extents, merge_extents,
+)
+from tests.documents import build_document, png_image
+
+
+def media_size(path: str) -> int:
+    with zipfile.ZipFile(path) as package:
+        return sum(
+            info.file_size for info in package.infolist()
+            if info.filename.startswith("word/media/")
+        )
+
+
+def test_extents_of_inline_images(tmp_path):
+    """Every image relationship gets the size it is displayed at"""
+    path = build_document(str(tmp_path / "document.docx"), images=2, image_width=2)
+    document = docx.Document(path)
+
+    extents = {}
+    collect_extents(document.element.body, extents)
+
+    assert len(extents) == 2
+    assert {width for width, _ in extents.values()} == {2 * EMU_PER_INCH}
+
+
+def test_merged_extent_keeps_cropped_images():
+    """Largest use of an image decides, a cropped use keeps all pixels"""
+    assert merge_extents([(10, 40), (30, 20)]) == (30, 40)
+    assert merge_extents([(10, 40), KEEP]) is KEEP
+
+
+def test_cache_is_bounded_by_bytes():
+    cache = ImageCache(max_bytes=CACHE_ENTRY_SIZE + 10)
+    cache.put("a", (b"123456", (2, 2), (1, 1)))
+    cache.put("b", (b"123456", (2, 2), (1, 1)))
+
+    with pytest.raises(KeyError):
+        cache.get("a")
+    assert cache.get("b")[0] == b"123456"
+
+
+def test_cache_of_kept_images_is_bounded():
+    """Images left as they are count against the limit too"""
+    cache = ImageCache(max_bytes=CACHE_ENTRY_SIZE * 3)
+    for key in range(10):
+        cache.put(key, None)
+
+    assert len(cache._images) == 3
+    assert cache.get(9) is None
+    with pytest.raises(KeyError):
+        cache.get(0)
+
+
+def test_repeated_image_is_encoded_once():
+    """Second copy of a figure comes from the cache"""
+    downsampler = ImageDownsampler(dpi=100, cache=ImageCache(1024 * 1024))
+    blob = png_image(800, 600)
+    extent = (EMU_PER_INCH, EMU_PER_INCH * 3 // 4)
+
+    with patch.object(downsampler, "_encode", wraps=downsampler._encode) as encode:
+        first = downsampler.downsample("image1.png", blob, extent)
+        second = downsampler.downsample("image2.png", blob, extent)
+
+    encode.assert_called_once()
+    assert first == second and len(first) < len(blob)
+    assert downsampler.images == 2
+    assert downsampler.bytes_saved == 2 * (len(blob) - len(first))
+
+
+def test_image_at_display_size_is_kept():
+    downsampler = ImageDownsampler(dpi=150, cache=ImageCache(1024 * 1024))
+
+    assert downsampler.downsample(
+        "image1.png", png_image(400, 300), (3 * EMU_PER_INCH, 2 * EMU_PER_INCH)
+    ) is None
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("workflow", [DocumentWorkFlowAPA, DocumentWorkFlowAPAStream])
+async def test_workflow_shrinks_oversized_images(tmp_path, workflow):
+    """Images shown at one inch are written with the pixels needed at target DPI"""
+    path = build_document(str(tmp_path / "document.docx"), images=2, image_width=1)
+    target = str(tmp_path / "checked.docx")
+
+    with patch("articles.article_service.images.IMAGE_DOWNSAMPLE", True):
+        doc = workflow(path)
+    await doc.start_flow()
+    doc.save_to(target)
+    report = await doc.create_report()
+
+    assert report["images"]["downsampled"] == 2
+    assert media_size(path) - media_size(target) > 0
+    assert docx.Document(target).inline_shapes[0].width == docx.shared.Inches(1)
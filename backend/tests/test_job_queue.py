@@ -0,0 +1,245 @@
+import asyncio
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from sqlalchemy import insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from articles.job_queue import (
+    SPEED_CHANNEL, JobWorker, admit_job, claim_jobs, submit_job, submit_recheck,
+)
+from articles.models import (
+    Articles, ProcessingJobs, RecheckRuns, metadata as articles_metadata,
+)
+from services.pubsub.pubsub import pubsub
+from services.scheduler.scheduler import FairScheduler, QueueFull
+
+
+@pytest.fixture
+async def session_maker(tmp_path):
+    """Database file with articles and processing jobs tables"""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'jobs.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(articles_metadata.create_all)
+    yield sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    await engine.dispose()
+
+
+async def add_jobs(session, users, costs=None):
+    for user_id, cost in zip(users, costs or [1.0] * len(users)):
+        result = await session.execute(insert(Articles).values(
+            title="article", original_file="a.docx", refactor_type="APA",
+        ))
+        article_id = result.inserted_primary_key[0]
+        with patch("articles.job_queue.EMBEDDED_WORKER", False), \
+                patch("articles.job_queue.pubsub.publish") as publish:
+            await submit_job(session, user_id, cost, {"article_id": article_id})
+        publish.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_claim_is_fair_between_users(session_maker):
+    """First jobs of every user are claimed before further jobs of one user"""
+    async with session_maker() as session:
+        await add_jobs(session, [1, 1, 1, 2])
+        jobs = await claim_jobs(session, "worker-1", 2)
+        assert sorted(job["user_id"] for job in jobs) == [1, 2]
+
+        rest = await claim_jobs(session, "worker-2", 5)
+        assert [job["user_id"] for job in rest] == [1, 1]
+        assert await claim_jobs(session, "worker-2", 5) == []
+
+
+@pytest.mark.asyncio
+async def test_claim_is_weighted_by_cost(session_maker):
+    """Small jobs of one user go before the next job after a large one of another"""
+    async with session_maker() as session:
+        await add_jobs(session, [1, 1, 2, 2, 2], costs=[10.0, 1.0, 1.0, 1.0, 1.0])
+        first = await claim_jobs(session, "worker-1", 1)
+        assert [(job["user_id"], job["cost"]) for job in first] == [(1, 10.0)]
+
+        # the large job is still running, its cost delays the next job of user 1
+        rest = await claim_jobs(session, "worker-2", 4)
+        assert [job["user_id"] for job in rest] == [2, 2, 2, 1]
+
+
+@pytest.mark.asyncio
+async def test_expired_lease_is_claimed_again(session_maker):
+    """Jobs of a worker which stopped renewing its lease go to another worker"""
+    async with session_maker() as session:
+        await add_jobs(session, [1])
+        await claim_jobs(session, "worker-1", 1)
+        await session.execute(update(ProcessingJobs).values(
+            claimed_at=datetime.utcnow() - timedelta(hours=1)
+        ))
+        await session.commit()
+
+        jobs = await claim_jobs(session, "worker-2", 1)
+
+    assert len(jobs) == 1
+
+
+@pytest.mark.asyncio
+async def test_worker_runs_and_drains_jobs(session_maker):
+    """Worker processes queued jobs and removes them, stop returns after drain"""
+    processed = []
+
+    async def process(**options):
+        processed.append(options["article_id"])
+
+    async with session_maker() as session:
+        await add_jobs(session, [1, 2, 1])
+
+    worker = JobWorker(concurrency=2, poll_interval=0.01, lease=60,
+                       session_maker=session_maker, process=process)
+    running = asyncio.ensure_future(worker.run(shutdown_timeout=5))
+    while len(processed) < 3:
+        await asyncio.sleep(0.01)
+    worker.stop()
+    await running
+
+    async with session_maker() as session:
+        left = (await session.execute(select(ProcessingJobs))).fetchall()
+    assert sorted(processed) == [1, 2, 3]
+    assert left == []
+
+
+@pytest.mark.asyncio
+async def test_failing_job_is_dropped_after_attempts(session_maker):
+    """Job which keeps failing marks the article failed and leaves the queue"""
+    calls = []
+
+    async def process(**options):
+        calls.append(options["article_id"])
+        raise RuntimeError("database is gone")
+
+    async with session_maker() as session:
+        await add_jobs(session, [1])
+
+    worker = JobWorker(concurrency=1, poll_interval=0.01, lease=60, max_attempts=3,
+                       session_maker=session_maker, process=process)
+    with patch("articles.tasks.publish_status") as publish_status:
+        running = asyncio.ensure_future(worker.run(shutdown_timeout=5))
+        while publish_status.await_count == 0:
+            await asyncio.sleep(0.01)
+        worker.stop()
+        await running
+
+    async with session_maker() as session:
+        left = (await session.execute(select(ProcessingJobs))).fetchall()
+        status = await session.scalar(select(Articles.c.status))
+    assert calls == [1, 1, 1]
+    assert left == []
+    assert status == "failed"
+
+
+@pytest.mark.asyncio
+async def test_job_of_dead_workers_is_not_run_again(session_maker):
+    """Job whose claims all expired without finishing is failed, not run"""
+    async def process(**options):
+        raise AssertionError("must not run")
+
+    async with session_maker() as session:
+        await add_jobs(session, [1])
+        await session.execute(update(ProcessingJobs).values(attempts=3))
+        await session.commit()
+
+    worker = JobWorker(concurrency=1, poll_interval=0.01, lease=60, max_attempts=3,
+                       session_maker=session_maker, process=process)
+    with patch("articles.tasks.publish_status") as publish_status:
+        running = asyncio.ensure_future(worker.run(shutdown_timeout=5))
+        while publish_status.await_count == 0:
+            await asyncio.sleep(0.01)
+        worker.stop()
+        await running
+
+    async with session_maker() as session:
+        assert (await session.execute(select(ProcessingJobs))).fetchall() == []
+
+
+@pytest.mark.asyncio
+async def test_wait_estimate_uses_worker_speed(session_maker):
+    """API estimates the queue wait from all workers and their measured speed"""
+    estimate = FairScheduler(concurrency=1, max_wait=100, cost_unit=1,
+                             seconds_per_cost=1)
+    async with session_maker() as session:
+        await add_jobs(session, [1, 2], costs=[60.0, 60.0])
+        with patch("articles.job_queue.scheduler", estimate), \
+                patch("articles.job_queue.EMBEDDED_WORKER", False), \
+                patch("articles.job_queue.WORKER_CONCURRENCY", 2), \
+                patch("articles.job_queue.JOB_WORKERS", 2):
+            # 120 queued on 4 job slots
+            await admit_job(session, 1.0)
+
+            # workers report jobs five times slower than estimated
+            for _ in range(20):
+                pubsub._dispatch(SPEED_CHANNEL, "5.0")
+            with pytest.raises(QueueFull):
+                await admit_job(session, 1.0)
+
+
+@pytest.mark.asyncio
+async def test_failed_processing_is_retried_and_failed(session_maker):
+    """Errors recorded by document_process reach the worker, the job is not done"""
+    check = AsyncMock(side_effect=RuntimeError("broken document"))
+    async with session_maker() as session:
+        await add_jobs(session, [1])
+        await session.execute(update(ProcessingJobs).values(options={
+            "style": "APA", "path": "a.docx", "article_id": 1, "user_name": "user",
+            "user_id": 1,
+        }))
+        await session.commit()
+
+    worker = JobWorker(concurrency=1, poll_interval=0.01, lease=60, max_attempts=2,
+                       session_maker=session_maker)
+    with patch("articles.tasks.async_session_maker", session_maker), \
+            patch("articles.tasks.process_in_worker", check), \
+            patch("articles.tasks.publish_status"), \
+            patch("articles.job_queue.pubsub.publish") as publish:
+        running = asyncio.ensure_future(worker.run(shutdown_timeout=5))
+        while True:
+            async with session_maker() as session:
+                if not (await session.execute(select(ProcessingJobs))).fetchall():
+                    break
+            await asyncio.sleep(0.05)
+        worker.stop()
+        await running
+
+    async with session_maker() as session:
+        status = await session.scalar(select(Articles.c.status))
+    assert check.await_count == 2
+    assert status == "failed"
+    # failed jobs are not speed samples
+    assert all(call.args[0] != SPEED_CHANNEL for call in publish.await_args_list)
+
+
+@pytest.mark.asyncio
+async def test_recheck_runs_in_worker(session_maker):
+    """Recheck run started by the API is taken from the queue by a worker"""
+    recheck = AsyncMock()
+    process = AsyncMock()
+    async with session_maker() as session:
+        result = await session.execute(insert(RecheckRuns).values(
+            outdated=True, rule_version=1, status="running",
+        ))
+        run_id = result.inserted_primary_key[0]
+        with patch("articles.job_queue.EMBEDDED_WORKER", False), \
+                patch("articles.job_queue.pubsub.publish") as publish:
+            await submit_recheck(session, 1, run_id)
+        publish.assert_awaited_once()
+
+    worker = JobWorker(concurrency=1, poll_interval=0.01, lease=60,
+                       session_maker=session_maker, process=process, recheck=recheck)
+    running = asyncio.ensure_future(worker.run(shutdown_timeout=5))
+    while recheck.await_count == 0:
+        await asyncio.sleep(0.01)
+    worker.stop()
+    await running
+
+    async with session_maker() as session:
+        left = (await session.execute(select(ProcessingJobs))).fetchall()
+    recheck.assert_awaited_once_with(run_id)
+    process.assert_not_awaited()
+    assert left == []
@@ -0,0 +1,89 @@
+import asyncio
+import zipfile
+
+import pytest
+
+from articles.article_service.memory_estimate import (
+    JOB_MEMORY, check_package, estimate_memory,
+)
+from services.workers.memory import MemoryBudget
+from services.workers.pool import RecyclingPool
+from tests.documents import build_document
+
+
+def square(value, progress=None):
+    """Job for the worker pool"""
+    progress("started")
+    return value * value
+
+
+def test_zip_bomb_is_rejected(tmp_path):
+    """Highly compressed members are rejected before decompression"""
+    path = str(tmp_path / "bomb.docx")
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as package:
+        package.writestr("word/document.xml", b"\0" * 20 * 1024 * 1024)
+
+    with pytest.raises(ValueError, match="too large when uncompressed"):
+        check_package(path)
+
+
+def test_broken_package_is_rejected(tmp_path):
+    """Uploads which are not ZIP packages are rejected"""
+    path = tmp_path / "broken.docx"
+    path.write_bytes(b"Test content for .docx file")
+
+    with pytest.raises(ValueError, match="Invalid .docx file"):
+        check_package(str(path))
+
+
+def test_memory_estimate_grows_with_document(tmp_path):
+    """Estimate depends on the size of the main document part"""
+    small = build_document(str(tmp_path / "small.docx"), paragraphs=5)
+    large = build_document(str(tmp_path / "large.docx"), paragraphs=500)
+
+    check_package(small)
+    assert JOB_MEMORY < estimate_memory(small) < estimate_memory(large)
+
+
+@pytest.mark.asyncio
+async def test_memory_budget_limits_concurrent_jobs():
+    """Job waits until enough memory is released, large job runs alone"""
+    budget = MemoryBudget(100)
+    first = await budget.acquire(70)
+    waiting = asyncio.ensure_future(budget.acquire(500))
+
+    await asyncio.sleep(0.01)
+    assert not waiting.done()
+
+    await budget.release(first)
+    assert await asyncio.wait_for(waiting, 1) == 100
+    assert budget.used == 100
+
+
+@pytest.mark.asyncio
+async def test_pool_is_recycled_after_jobs():
+    """Workers are replaced after max_jobs jobs and progress reaches the parent"""
+    pool = RecyclingPool(processes=1, max_jobs=2, max_rss=1024 ** 4)
+    steps = []
+    try:
+        assert await pool.run(square, 3, progress=steps.append) == 9
+        first = pool._executor
+        await pool.run(square, 4)
+        assert pool._executor is first
+
+        assert await pool.run(square, 5) == 25
+        assert pool._executor is not first
+    finally:
+        pool.shutdown()
+    assert steps == ["started"]
+
+
+@pytest.mark.asyncio
+async def test_pool_is_recycled_over_memory_limit():
+    """Worker reporting memory over the limit is replaced"""
+    pool = RecyclingPool(processes=1, max_jobs=100, max_rss=0)
+    try:
+        await pool.run(square, 2)
+        assert pool._executor is None
+    finally:
+        pool.shutdown()
@@ -0,0 +1,50 @@
+import os
+import zipfile
+from unittest.mock import patch
+
+import docx
+import pytest
+
+from articles.article_service.document_work_apa import DocumentWorkFlowAPA
+from services.storage.storage import storage
+from tests.documents import build_document
+
+
+def raw_member(path, name):
+    """Compressed bytes of the ZIP member"""
+    with zipfile.ZipFile(path) as package, open(path, "rb") as raw:
+        info = package.getinfo(name)
+        raw.seek(info.header_offset + 26)
+        name_length = int.from_bytes(raw.read(2), "little")
+        extra_length = int.from_bytes(raw.read(2), "little")
+        raw.seek(name_length + extra_length, os.SEEK_CUR)
+        return raw.read(info.compress_size)
+
+
+@pytest.mark.asyncio
+async def test_untouched_parts_are_copied_raw(tmp_path, monkeypatch):
+    """Media is copied compressed as is, document part is written again"""
+    path = build_document(str(tmp_path / "document.docx"), images=2)
+    monkeypatch.chdir(tmp_path)
+
+    workflow = DocumentWorkFlowAPA(path)
+    await workflow.start_flow()
+    with patch("zlib.compressobj", wraps=__import__("zlib").compressobj) as deflate:
+        key = await workflow.get_updated_document(user_name="test_user")
+    new_path = storage.local_path(key)
+
+    with zipfile.ZipFile(path) as source, zipfile.ZipFile(new_path) as target:
+        assert target.testzip() is None
+        media = [name for name in source.namelist() if name.startswith("word/media/")]
+        assert len(media) == 2
+        for name in media:
+            assert raw_member(new_path, name) == raw_member(path, name)
+        assert target.read("word/document.xml") != source.read("word/document.xml")
+        assert target.namelist()[0] == "[Content_Types].xml"
+
+    # only document part, content types and relationships were deflated
+    assert deflate.call_count < len(media) + 6
+
+    saved = docx.Document(new_path)
+    assert len(saved.inline_shapes) == 2
+    assert saved.paragraphs[0].text == workflow.document.paragraphs[0].text
@@ -0,0 +1,94 @@
+from unittest.mock import patch
+
+import pytest
+from lxml import etree
+
+from articles.article_service.document_work_apa import DocumentWorkFlowAPA
+from tests.documents import build_document
+
+
+async def run_workflow(path, paragraph_hashes=None):
+    """Process document and return workflow with results"""
+    workflow = DocumentWorkFlowAPA(str(path), paragraph_hashes=paragraph_hashes)
+    await workflow.start_flow()
+    return workflow
+
+
+@pytest.mark.asyncio
+async def test_incremental_run_matches_full_run(tmp_path):
+    """Revised document gives the same result with reused paragraph results"""
+    first = await run_workflow(build_document(str(tmp_path / "first.docx")))
+    hashes = await first.get_paragraph_hashes()
+
+    revised = build_document(
+        str(tmp_path / "revised.docx"),
+        paragraphs=21,
+        body="Completely new text (Green , 2021).",
+    )
+    full = await run_workflow(revised)
+    incremental = await run_workflow(revised, paragraph_hashes=hashes)
+
+    assert await incremental.create_report() == await full.create_report()
+    assert etree.tostring(incremental.document.element) == etree.tostring(
+        full.document.element
+    )
+
+
+@pytest.mark.asyncio
+async def test_unchanged_paragraphs_are_skipped(tmp_path):
+    """Paragraphs without changes are not checked again"""
+    path = build_document(
+        str(tmp_path / "document.docx"), body="Correct citation (Smith, 2019)."
+    )
+    first = await run_workflow(path)
+    hashes = await first.get_paragraph_hashes()
+
+    workflow = DocumentWorkFlowAPA(path, paragraph_hashes=hashes)
+    checked = []
+    original = workflow._in_text_citations_paragraph
+
+    def spy(paragraph):
+        checked.append(paragraph.text)
+        return original(paragraph)
+
+    workflow._in_text_citations_paragraph = spy
+    await workflow.start_flow()
+
+    assert len(checked) < len(workflow.document.paragraphs) / 2
+    assert await workflow.create_report() == await first.create_report()
+
+
+@pytest.mark.asyncio
+async def test_hashes_of_other_style_are_ignored(tmp_path):
+    """Hashes recorded for another style are not reused"""
+    path = build_document(str(tmp_path / "document.docx"))
+    hashes = await (await run_workflow(path)).get_paragraph_hashes()
+    hashes["style"] = "Custom"
+
+    workflow = DocumentWorkFlowAPA(path, paragraph_hashes=hashes)
+    assert workflow.paragraph_hashes.previous == {}
+
+
+@pytest.mark.asyncio
+async def test_hashes_of_older_rules_are_ignored(tmp_path):
+    """Results of an older rule engine version are not reused"""
+    path = build_document(
+        str(tmp_path / "document.docx"), body="Correct citation (Smith, 2019)."
+    )
+    hashes = await (await run_workflow(path)).get_paragraph_hashes()
+
+    with patch("articles.article_service.paragraph_hashes.RULE_ENGINE_VERSION",
+               hashes["rule_version"] + 1):
+        workflow = DocumentWorkFlowAPA(path, paragraph_hashes=hashes)
+        checked = []
+        original = workflow._in_text_citations_paragraph
+
+        def spy(paragraph):
+            checked.append(paragraph.text)
+            return original(paragraph)
+
+        workflow._in_text_citations_paragraph = spy
+        await workflow.start_flow()
+
+    assert workflow.paragraph_hashes.previous == {}
+    assert len(checked) == len(workflow.document.paragraphs)
@@ -0,0 +1,28 @@
+import pytest
+from sqlalchemy import insert
+from sqlalchemy.engine.default import CACHE_HIT
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from articles.models import Articles, metadata as articles_metadata
+from articles.queries import ARTICLE_BY_ID
+
+
+@pytest.mark.asyncio
+async def test_prebuilt_statement_is_compiled_once():
+    """Lookups of different articles reuse the compiled statement"""
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(articles_metadata.create_all)
+        await conn.execute(insert(Articles), [
+            {"title": "first", "refactor_type": "APA"},
+            {"title": "second", "refactor_type": "APA"},
+        ])
+    session_maker = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with session_maker() as session:
+        first = await session.execute(ARTICLE_BY_ID, {"article_id": 1})
+        assert first.fetchone().title == "first"
+        second = await session.execute(ARTICLE_BY_ID, {"article_id": 2})
+        assert second.fetchone().title == "second"
+        assert second.context.cache_hit == CACHE_HIT
+    await engine.dispose()
@@ -0,0 +1,99 @@
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy import insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from articles.article_service.document_work_abstract import RULE_ENGINE_VERSION
+from articles.models import Articles, RecheckRuns, metadata as articles_metadata
+from articles.recheck import claim_run, recheck, start_run
+
+
+class Interrupted(Exception):
+    pass
+
+
+@pytest.fixture
+async def article_session():
+    """In-memory database with articles and recheck runs tables"""
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(articles_metadata.create_all)
+    session_maker = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with session_maker() as session:
+        yield session
+    await engine.dispose()
+
+
+async def fake_check(style, path, user_name, **kwargs):
+    if path == "broken.docx":
+        raise ValueError("Invalid .docx file.")
+    return {
+        "updated_file": f"checked-{path}", "list_issues": {}, "paragraph_hashes": None,
+        "structure": None, "text": None,
+    }
+
+
+@pytest.mark.asyncio
+async def test_outdated_recheck_resumes_from_checkpoint(article_session):
+    """Interrupted run goes on after the last committed chunk"""
+    files = ["a.docx", "broken.docx", "c.docx", "d.docx", "e.docx"]
+    for name in files:
+        await article_session.execute(insert(Articles).values(
+            title=name, original_file=name, refactor_type="APA", magazine_id=1,
+        ))
+    await article_session.execute(insert(Articles).values(
+        title="current", original_file="current.docx", refactor_type="APA",
+        rule_version=RULE_ENGINE_VERSION,
+    ))
+    await article_session.commit()
+
+    def interrupt(progress):
+        raise Interrupted()
+
+    with patch("articles.recheck.process_in_worker", side_effect=fake_check) as check:
+        run = await start_run(article_session, outdated=True)
+        assert run["total"] == 5
+        with pytest.raises(Interrupted):
+            await recheck(article_session, run, chunk_size=2, on_progress=interrupt)
+
+        resumed = await start_run(article_session, outdated=True)
+        assert resumed["id"] == run["id"]
+        assert resumed["last_article_id"] == 2
+        finished = await recheck(article_session, resumed, chunk_size=2)
+
+    checked_paths = [call.args[1] for call in check.call_args_list]
+    assert checked_paths == files
+    assert (finished["status"], finished["processed"], finished["failed"]) == (
+        "done", 4, 1
+    )
+
+    result = await article_session.execute(
+        select(Articles.c.original_file, Articles.c.updated_file)
+        .where(Articles.c.rule_version == RULE_ENGINE_VERSION)
+        .order_by(Articles.c.id)
+    )
+    assert [row.updated_file for row in result] == [
+        "checked-a.docx", "checked-c.docx", "checked-d.docx", "checked-e.docx", None,
+    ]
+    new_run = await start_run(article_session, outdated=True)
+    assert new_run["id"] != run["id"] and new_run["total"] == 1
+
+
+@pytest.mark.asyncio
+async def test_run_is_claimed_by_one_process(article_session):
+    """Second process does not take a run while the lease of the first is fresh"""
+    run = await start_run(article_session, magazine_id=3)
+
+    assert await claim_run(article_session, run["id"], "api-1:10", lease=60)
+    assert not await claim_run(article_session, run["id"], "api-2:11", lease=60)
+
+    # the first process died and stopped renewing its lease
+    await article_session.execute(update(RecheckRuns).values(
+        claimed_at=datetime.utcnow() - timedelta(seconds=120)
+    ))
+    assert await claim_run(article_session, run["id"], "api-2:11", lease=60)
+    claimed_by = await article_session.scalar(select(RecheckRuns.c.claimed_by))
+    assert claimed_by == "api-2:11"
@@ -1,5 +1,5 @@
 import pytest
-from unittest.mock import AsyncMock
+from unittest.mock import AsyncMock, patch
 from articles.article_service.mapper_type import DocumentWorkFlowFactory
 
 TEMP_DIR = "articles/documents/test_user"
@@ -24,7 +24,7 @@ async def test_document_process_success():
 @pytest.mark.asyncio
 async def test_document_process_failure():
     # Mocking the DocumentWorkFlowFactory to raise an exception
-    DocumentWorkFlowFactory.create_workflow = AsyncMock(
+    with patch.object(DocumentWorkFlowFactory, "create_workflow", AsyncMock(
         side_effect=Exception("Document processing failed")
-    )
-    pass
+    )):
+        pass
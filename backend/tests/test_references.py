@@ -0,0 +1,57 @@
+import pytest
+
+from articles.article_service.document_work_apa import DocumentWorkFlowAPA
+from articles.article_service.document_work_stream import DocumentWorkFlowAPAStream
+from articles.article_service.references import CitationCrossCheck
+from tests.documents import build_document
+
+
+def cross_check(paragraphs):
+    check = CitationCrossCheck()
+    for index, (text, is_heading) in enumerate(paragraphs):
+        check.add_paragraph(index, text, is_heading)
+    return check.issues()
+
+
+def test_citations_are_matched_to_references():
+    """Grouped, et al. and accented citations find their references"""
+    issues = cross_check([
+        ("Reading (Müller & Park, 2018; Lee et al., 2020) and (Smith, 2019).", False),
+        ("Again (Smith, 2019, p. 4) and (Nobody, 2001).", False),
+        ("References", True),
+        ("Muller, A., & Park, B. (2018). First. Journal, 1, 1-2.", False),
+        ("Lee, C., Kim, D., & Choi, E. (2020). Second. Journal, 2, 3-4.", False),
+        ("Smith, J. (2019). Third. Journal, 3, 5-6.", False),
+        ("Unused, U. (2015). Fourth. Journal, 4, 7-8.", False),
+        ("Appendix", True),
+        ("Appendix cites (Lee et al., 2020).", False),
+    ])
+
+    assert [(issue["type"], issue.get("author")) for issue in issues] == [
+        ("missing_reference", "Nobody"),
+        ("unused_reference", None),
+    ]
+    assert issues[0]["paragraphs"] == [1]
+    assert issues[1]["paragraph"] == 6
+
+
+def test_citations_without_reference_list():
+    """Missing References section is reported once"""
+    issues = cross_check([("Text (Smith, 2019).", False)])
+    assert [issue["type"] for issue in issues] == ["missing_reference_list"]
+    assert cross_check([("No citations here.", False)]) == []
+
+
+@pytest.mark.asyncio
+async def test_workflows_report_same_reference_issues(tmp_path):
+    """Streaming engine cross-checks across batches like the in-memory one"""
+    path = build_document(str(tmp_path / "document.docx"), paragraphs=30)
+
+    in_memory = DocumentWorkFlowAPA(path)
+    await in_memory.start_flow()
+    streaming = DocumentWorkFlowAPAStream(path, batch_size=5, analyze_only=True)
+    await streaming.start_flow()
+
+    issues = in_memory.citation_issues
+    assert {issue["author"] for issue in issues} == {"Brown"}
+    assert streaming.citation_issues == issues
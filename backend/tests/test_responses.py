@@ -0,0 +1,28 @@
+import json
+from datetime import datetime
+
+from fastapi.encoders import jsonable_encoder
+
+from articles.models import Articles, RefactorType
+from articles.queries import ARTICLE_SUMMARIES
+from articles.schemas import ArticleSummary
+from services.responses.responses import FastJSONResponse
+
+
+def test_fast_response_matches_default_encoding():
+    """orjson output decodes to the same JSON as jsonable_encoder gives"""
+    content = [{
+        "id": 1, "publish_date": datetime(2024, 1, 2, 3, 4, 5, 6),
+        "refactor_type": RefactorType.Custom, "list_issues": {"issues": ["a"]},
+    }]
+
+    body = FastJSONResponse(content).body
+
+    assert json.loads(body) == jsonable_encoder(content)
+
+
+def test_summary_projection_skips_blobs():
+    """Listing selects only the columns of the response model"""
+    columns = [column.name for column in ARTICLE_SUMMARIES.selected_columns]
+    assert columns == list(ArticleSummary.model_fields)
+    assert Articles.c.list_issues.name not in columns
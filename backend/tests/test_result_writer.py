@@ -0,0 +1,94 @@
+import asyncio
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from articles.models import Articles, ArticleStructures, metadata as articles_metadata
+from articles.result_writer import ResultWriter
+
+
+@pytest.fixture
+async def session_maker(tmp_path):
+    """File database shared by the sessions of the writer"""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'results.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(articles_metadata.create_all)
+        for title in ("good", "bad", "late"):
+            await conn.execute(insert(Articles).values(
+                title=title, original_file=f"{title}.docx", refactor_type="APA"
+            ))
+    yield sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    await engine.dispose()
+
+
+def result(name: str, structure: dict = None, text: str = None) -> dict:
+    return {
+        "updated_file": f"checked-{name}", "list_issues": {}, "paragraph_hashes": None,
+        "structure": structure, "text": text,
+    }
+
+
+@pytest.mark.asyncio
+async def test_failed_row_does_not_lose_the_batch(session_maker):
+    """Batch is written together, a broken row fails alone"""
+    writer = ResultWriter(max_batch=2, max_delay=60, session_maker=session_maker)
+    structure = {
+        "version": 1, "paragraphs": 1, "words": 2, "tables": 0, "figures": 0,
+        "outline": [], "citations": [],
+    }
+
+    saved = await asyncio.gather(
+        writer.save(1, 1, result("good", structure)),
+        # incomplete structure violates NOT NULL constraints
+        writer.save(2, 1, result("bad", {"version": 1})),
+        return_exceptions=True,
+    )
+    assert saved[0] is None
+    assert isinstance(saved[1], IntegrityError)
+
+    late = asyncio.ensure_future(writer.save(3, 1, result("late")))
+    await asyncio.sleep(0)
+    assert not late.done()
+    await writer.stop()
+    await late
+
+    async with session_maker() as session:
+        articles = (await session.execute(
+            select(Articles.c.id, Articles.c.checked, Articles.c.updated_file)
+            .order_by(Articles.c.id)
+        )).fetchall()
+        structures = (await session.execute(
+            select(ArticleStructures.c.article_id)
+        )).scalars().all()
+
+    assert [tuple(row) for row in articles] == [
+        (1, True, "checked-good"), (2, False, None), (3, True, "checked-late"),
+    ]
+    assert structures == [1]
+
+
+@pytest.mark.asyncio
+async def test_failed_index_does_not_fail_the_result(session_maker):
+    """Result whose text cannot be indexed is saved without a search entry"""
+    async def index_article(session, article_id, magazine_id, title, body):
+        if article_id == 2:
+            raise ValueError("string is too long for tsvector")
+
+    writer = ResultWriter(max_batch=2, max_delay=60, session_maker=session_maker)
+    with patch("articles.result_writer.index_article", side_effect=index_article):
+        saved = await asyncio.gather(
+            writer.save(1, 1, result("good", text="short text")),
+            writer.save(2, 1, result("bad", text="huge text")),
+        )
+        await writer.stop()
+
+    async with session_maker() as session:
+        checked = (await session.execute(
+            select(Articles.c.checked).order_by(Articles.c.id)
+        )).scalars().all()
+    assert saved == [None, None]
+    assert checked == [True, True, False]
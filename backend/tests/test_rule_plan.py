@@ -0,0 +1,94 @@
+from unittest.mock import patch
+
+import pytest
+from docx.enum.text import WD_ALIGN_PARAGRAPH
+from docx.shared import Inches, Pt
+
+from articles.article_service.document_work_custom import DocumentWorkFlowCustom
+from articles.article_service.mapper_type import DocumentWorkFlowFactory
+from articles.article_service.rule_plan import compile_rule_set, get_rule_plan
+from rule_sets.utils import parse_definition
+from tests.documents import build_document
+
+HOUSE_STYLE = """
+font:
+  name: Georgia
+  size: 11
+margins: {top: 1.2, bottom: 1.2, left: 1, right: 1}
+line_spacing: 1.5
+paragraph_spacing: {before: 0, after: 6}
+headings:
+  1: {alignment: center, bold: true, title_case: true}
+  2: {alignment: left, italic: true}
+citations:
+  - pattern: '\\(\\s*([A-Z][a-z]+), (\\d{4})(, p\\. \\d+)?\\)'
+    issue: Citation converted to house style
+    replace: '[\\1 \\2]'
+"""
+
+
+@pytest.fixture
+def definition():
+    return parse_definition("house.yaml", HOUSE_STYLE.encode())
+
+
+def test_rule_set_is_compiled(definition):
+    """Style values are resolved and regexes compiled"""
+    plan = compile_rule_set(1, 1, definition)
+
+    assert plan.font_name == "Georgia"
+    assert plan.font_size == Pt(11)
+    assert plan.margins == (Inches(1.2), Inches(1.2), Inches(1), Inches(1))
+    assert plan.headings["Heading 1"].alignment == WD_ALIGN_PARAGRAPH.CENTER
+    assert plan.citations[0].regex.search("( Brown, 2020)")
+
+
+def test_invalid_rule_set_is_rejected():
+    """Broken patterns and values are reported before storing"""
+    with pytest.raises(ValueError):
+        compile_rule_set(1, 1, {"citations": [{"pattern": "(", "issue": "x"}]})
+    with pytest.raises(ValueError):
+        compile_rule_set(1, 1, {"line_spacing": -1})
+
+
+def test_plan_is_compiled_once_per_version(definition):
+    """Plans are cached by rule set id and version"""
+    with patch("articles.article_service.rule_plan.compile_rule_set",
+               wraps=compile_rule_set) as compile_mock:
+        first = get_rule_plan(100, 1, definition)
+        assert get_rule_plan(100, 1, definition) is first
+        assert get_rule_plan(100, 2, definition) is not first
+
+    assert compile_mock.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_custom_workflow_applies_plan(tmp_path, definition):
+    """Custom style formats document according to the rule set"""
+    path = build_document(str(tmp_path / "document.docx"), paragraphs=3)
+    plan = compile_rule_set(1, 1, definition)
+
+    workflow = DocumentWorkFlowFactory.create_workflow(
+        style="Custom", path=path, rule_plan=plan
+    )
+    assert isinstance(workflow, DocumentWorkFlowCustom)
+    document = await workflow.start_flow()
+    report = await workflow.create_report()
+
+    body = [p for p in document.paragraphs if "Reading habits" in p.text][0]
+    assert body.runs[0].font.name == "Georgia"
+    assert body.paragraph_format.line_spacing == 1.5
+    assert "[Brown 2020]" in body.text
+    assert document.sections[0].top_margin == Inches(1.2)
+
+    heading = [p for p in document.paragraphs if p.style.name == "Heading 1"][0]
+    assert heading.text == "Introduction To The Topic"
+    assert heading.alignment == WD_ALIGN_PARAGRAPH.CENTER
+    assert report["citation_issues"]["issues"]
+
+
+def test_custom_workflow_requires_rule_set(tmp_path):
+    """Custom style cannot run without a rule set"""
+    path = build_document(str(tmp_path / "document.docx"), paragraphs=1)
+    with pytest.raises(ValueError):
+        DocumentWorkFlowFactory.create_workflow(style="Custom", path=path)
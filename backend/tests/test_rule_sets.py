@@ -0,0 +1,81 @@
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from magazines.models import Magazine, metadata as magazines_metadata
+from magazines.router import update_magazine
+from magazines.schemas import MagazineUpdateRequest
+from rule_sets.models import RuleSet, metadata as rule_sets_metadata
+from rule_sets.router import delete_rule_set
+
+SUPERUSER = SimpleNamespace(username="admin", is_superuser=True)
+
+
+@pytest.fixture
+async def rule_set_session():
+    """In-memory database with a rule set used by a magazine and an unused one"""
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(rule_sets_metadata.create_all)
+        await conn.run_sync(magazines_metadata.create_all)
+    session_maker = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with session_maker() as session:
+        await session.execute(insert(RuleSet), [
+            {"id": 1, "name": "used", "definition": {}},
+            {"id": 2, "name": "unused", "definition": {}},
+        ])
+        await session.execute(insert(Magazine).values(
+            id=7, title="Journal", maximum_articles=10, rule_set_id=1,
+        ))
+        await session.commit()
+    yield session_maker
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_rule_set_of_magazine_is_not_deleted(rule_set_session):
+    """Rule set referenced by a magazine is kept with a conflict"""
+    async with rule_set_session() as session:
+        response = await delete_rule_set(1, user=SUPERUSER, session=session)
+        remaining = (await session.execute(select(RuleSet.c.id))).scalars().all()
+
+    assert response == {
+        "status": 409, "description": "Rule set is used by magazines: 7"
+    }
+    assert remaining == [1, 2]
+
+
+@pytest.mark.asyncio
+async def test_unused_rule_set_is_deleted(rule_set_session):
+    async with rule_set_session() as session:
+        response = await delete_rule_set(2, user=SUPERUSER, session=session)
+        remaining = (await session.execute(select(RuleSet.c.id))).scalars().all()
+
+    assert response["status"] == 200
+    assert remaining == [1]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("body, rule_set_id", [
+    ({}, 1),
+    ({"rule_set_id": None}, None),
+    ({"rule_set_id": 2}, 2),
+])
+async def test_magazine_update_keeps_unnamed_rule_set(rule_set_session, body,
+                                                      rule_set_id):
+    """Rule set of a magazine changes only when the update names it"""
+    post_update = MagazineUpdateRequest(title="Journal", maximum_articles=5, **body)
+    with patch("magazines.router.magazine_cache.changed", AsyncMock()):
+        async with rule_set_session() as session:
+            response = await update_magazine(
+                7, post_update, user=SUPERUSER, session=session
+            )
+            magazine = (await session.execute(select(Magazine))).one()
+
+    assert response["status"] == 200
+    assert magazine.maximum_articles == 5
+    assert magazine.rule_set_id == rule_set_id
@@ -0,0 +1,95 @@
+import asyncio
+
+import pytest
+
+from services.scheduler.scheduler import FairScheduler, QueueFull
+
+
+def make_scheduler(**options):
+    settings = dict(concurrency=1, max_wait=60, cost_unit=1000, seconds_per_cost=1)
+    settings.update(options)
+    return FairScheduler(**settings)
+
+
+async def run_jobs(scheduler, jobs):
+    """Submit (user, cost, name) jobs while the worker is busy, return run order"""
+    order = []
+    gate = asyncio.Event()
+
+    async def blocker():
+        await gate.wait()
+
+    def job(name):
+        async def run():
+            order.append(name)
+        return run
+
+    scheduler.submit("blocker", 1, blocker)
+    for user, cost, name in jobs:
+        scheduler.submit(user, cost, job(name))
+    gate.set()
+    while len(order) < len(jobs):
+        await asyncio.sleep(0.01)
+    await scheduler.stop()
+    return order
+
+
+@pytest.mark.asyncio
+async def test_users_share_the_queue():
+    """Jobs of a user with a large backlog are interleaved with other users"""
+    scheduler = make_scheduler()
+    jobs = [("alice", 1, f"alice-{index}") for index in range(4)]
+    jobs.append(("bob", 1, "bob-0"))
+
+    order = await run_jobs(scheduler, jobs)
+
+    assert order.index("bob-0") <= 1
+
+
+@pytest.mark.asyncio
+async def test_large_document_does_not_block_small_ones():
+    """Cost grows with size, small documents of others run before the next big one"""
+    scheduler = make_scheduler()
+    big = scheduler.cost(20_000)
+    jobs = [("alice", big, "big-0"), ("alice", big, "big-1")]
+    jobs += [("bob", scheduler.cost(100), f"small-{index}") for index in range(5)]
+
+    order = await run_jobs(scheduler, jobs)
+
+    assert order.index("big-1") == len(order) - 1
+
+
+def test_admission_control():
+    """Jobs are rejected with retry time once the estimated wait is too long"""
+    scheduler = make_scheduler(max_wait=10)
+    scheduler.admit(scheduler.cost(5_000))
+
+    scheduler._queued_cost = 20
+    with pytest.raises(QueueFull) as error:
+        scheduler.admit(1)
+    assert error.value.retry_after == 11
+
+
+def test_admission_counts_pending_jobs_of_workers():
+    """Cost queued for separate workers is taken into account"""
+    scheduler = make_scheduler(max_wait=10)
+
+    with pytest.raises(QueueFull):
+        scheduler.admit(1, pending=20)
+
+
+@pytest.mark.asyncio
+async def test_drain_finishes_queued_jobs():
+    """Jobs queued before shutdown still run"""
+    scheduler = make_scheduler()
+    done = []
+
+    async def job():
+        await asyncio.sleep(0.01)
+        done.append(True)
+
+    for _ in range(3):
+        scheduler.submit("alice", 1, job)
+    await scheduler.drain(timeout=5)
+
+    assert len(done) == 3
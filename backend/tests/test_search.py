@@ -0,0 +1,73 @@
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from services.search.search import (
+    fts_query, index_article, postgres_search, remove_article, search_articles,
+)
+
+
+@pytest.fixture
+async def search_session():
+    """In-memory SQLite database, the FTS5 table is created on first use"""
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    session_maker = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with session_maker() as session:
+        yield session
+    await engine.dispose()
+
+
+def test_fts_query_quotes_terms():
+    """Words and phrases of the user query cannot break FTS5 syntax"""
+    assert fts_query('reading "of students" AND-OR (x') == (
+        '"reading" "of students" "AND-OR" "(x"'
+    )
+    assert fts_query('" "') == ""
+
+
+@pytest.mark.asyncio
+async def test_search_ranks_filters_and_highlights(search_session):
+    """Phrase matches are found with snippets, magazine filter is applied"""
+    await index_article(search_session, 1, 10, "Reading habits",
+                        "The reading habits of students changed a lot.")
+    await index_article(search_session, 2, 20, "Sleep",
+                        "Sleep of students and their reading before bed.")
+    await index_article(search_session, 3, 10, "Other", "Nothing to see here.")
+    await search_session.commit()
+
+    results = await search_articles(search_session, "reading students")
+    assert [result["article_id"] for result in results] == [1, 2]
+    assert "<b>reading</b>" in results[0]["snippet"]
+
+    phrase = await search_articles(search_session, '"habits of students"')
+    assert [result["article_id"] for result in phrase] == [1]
+
+    filtered = await search_articles(search_session, "students", magazine_ids=[20])
+    assert [result["article_id"] for result in filtered] == [2]
+
+    await index_article(search_session, 1, 10, "Reading habits", "Rewritten.")
+    await remove_article(search_session, 2)
+    assert await search_articles(search_session, "students") == []
+
+
+@pytest.mark.asyncio
+async def test_long_body_is_truncated(search_session):
+    """Only the beginning of a very long text is indexed"""
+    with patch("services.search.search.SEARCH_MAX_BODY", 20):
+        await index_article(search_session, 1, None, "Long",
+                            "Beginning of the text and its appendix.")
+
+    assert len(await search_articles(search_session, "beginning")) == 1
+    assert await search_articles(search_session, "appendix") == []
+
+
+def test_postgres_search_uses_index_and_one_page_of_headlines():
+    """Headlines are built in the outer query over the limited page"""
+    sql = str(postgres_search("students", [1], 20, 0).compile(
+        dialect=postgresql.dialect()
+    ))
+    assert "@@ websearch_to_tsquery" in sql
+    assert sql.index("ts_headline") < sql.index("LIMIT")
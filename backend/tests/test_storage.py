@@ -0,0 +1,219 @@
+import asyncio
+import io
+import os
+import shutil
+import time
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from fastapi import UploadFile
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from articles.models import Articles, metadata as articles_metadata
+from services.storage.gc import collect_garbage, run_garbage_collector
+from services.storage.storage import (
+    DocumentStorage, LocalStorage, S3Storage, blob_key, is_blob_key,
+)
+
+
+class FakeS3Client:
+    """In-memory stand-in for an S3 compatible server"""
+
+    def __init__(self):
+        self.objects = {}
+
+    def upload_file(self, filename, bucket, key):
+        with open(filename, "rb") as source:
+            self.objects[(bucket, key)] = (source.read(), datetime.now(timezone.utc))
+
+    def download_file(self, bucket, key, filename):
+        with open(filename, "wb") as target:
+            target.write(self.objects[(bucket, key)][0])
+
+    def head_object(self, Bucket, Key):
+        if (Bucket, Key) not in self.objects:
+            raise KeyError(Key)
+        return {"LastModified": self.objects[(Bucket, Key)][1]}
+
+    def delete_object(self, Bucket, Key):
+        self.objects.pop((Bucket, Key), None)
+
+    def list_objects_v2(self, Bucket, Prefix, StartAfter, MaxKeys):
+        keys = sorted(
+            key for bucket, key in self.objects
+            if bucket == Bucket and key.startswith(Prefix) and key > StartAfter
+        )[:MaxKeys]
+        return {"Contents": [
+            {"Key": key, "LastModified": self.objects[(Bucket, key)][1]}
+            for key in keys
+        ]}
+
+
+@pytest.fixture(params=["local", "s3"])
+def document_storage(request, tmp_path):
+    if request.param == "local":
+        return DocumentStorage(LocalStorage(str(tmp_path / "storage")))
+    return DocumentStorage(
+        S3Storage(FakeS3Client(), "documents", cache_dir=str(tmp_path / "cache"))
+    )
+
+
+def write_temp(document_storage, content: bytes) -> str:
+    path = document_storage.temp_path()
+    with open(path, "wb") as target:
+        target.write(content)
+    return path
+
+
+def make_old(document_storage, key: str, seconds: float = 3600) -> None:
+    """Move modification time of the blob into the past"""
+    backend = document_storage.backend
+    if isinstance(backend, LocalStorage):
+        modified = time.time() - seconds
+        os.utime(backend.fetch(key), (modified, modified))
+    else:
+        content, modified = backend.client.objects[(backend.bucket, key)]
+        backend.client.objects[(backend.bucket, key)] = (
+            content, modified - timedelta(seconds=seconds)
+        )
+
+
+@pytest.mark.asyncio
+async def test_documents_are_content_addressed(document_storage):
+    """Equal content is stored once under a sharded key"""
+    key = await document_storage.save_upload(
+        UploadFile(filename="a.docx", file=io.BytesIO(b"content"))
+    )
+    same = document_storage.save_file(write_temp(document_storage, b"content"))
+    other = document_storage.save_file(write_temp(document_storage, b"other"))
+
+    assert key == same != other
+    assert is_blob_key(key)
+    assert key.split("/")[1:3] == [key.split("/")[3][:2], key.split("/")[3][2:4]]
+    with open(document_storage.local_path(key), "rb") as stored:
+        assert stored.read() == b"content"
+    assert os.listdir(document_storage.backend.temp_dir()) == []
+
+
+def test_s3_cache_is_evicted(tmp_path):
+    """Least recently used blobs leave the local cache when it is full"""
+    backend = S3Storage(FakeS3Client(), "documents",
+                        cache_dir=str(tmp_path / "cache"), cache_size=15)
+    document_storage = DocumentStorage(backend)
+    first = document_storage.save_file(write_temp(document_storage, b"0123456789"))
+    second = document_storage.save_file(write_temp(document_storage, b"abcdefghij"))
+
+    first_path = document_storage.local_path(first)
+    second_path = document_storage.local_path(second)
+
+    assert not os.path.exists(first_path)
+    assert os.path.exists(second_path)
+    with open(document_storage.local_path(first), "rb") as source:
+        assert source.read() == b"0123456789"
+    assert not os.path.exists(second_path)
+
+
+def test_keys_are_listed_in_batches(document_storage):
+    """Listing continues after the last key of the previous batch"""
+    keys = sorted(
+        document_storage.save_file(write_temp(document_storage, bytes([index])))
+        for index in range(5)
+    )
+
+    first = document_storage.list("", 3)
+    second = document_storage.list(first[-1][0], 3)
+
+    assert [key for key, _ in first + second] == keys
+
+
+@pytest.fixture
+async def article_session():
+    """In-memory database with articles table"""
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(articles_metadata.create_all)
+    session_maker = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    yield session_maker
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_garbage_collector_removes_unreferenced_blobs(document_storage,
+                                                            article_session):
+    """Only old blobs without article references are removed"""
+    referenced = document_storage.save_file(write_temp(document_storage, b"used"))
+    orphan = document_storage.save_file(write_temp(document_storage, b"orphan"))
+
+    async with article_session() as session:
+        await session.execute(insert(Articles).values(
+            title="GC", original_file=referenced, refactor_type="APA"
+        ))
+        await session.commit()
+
+        assert await collect_garbage(session, document_storage) == 0
+        removed = await collect_garbage(
+            session, document_storage, batch_size=1, grace=-1
+        )
+
+    assert removed == 1
+    assert document_storage.backend.exists(referenced)
+    assert not document_storage.backend.exists(orphan)
+
+
+@pytest.mark.asyncio
+async def test_garbage_collector_keeps_reused_blob(document_storage, article_session):
+    """Blob stored again after it was listed is not removed"""
+    key = document_storage.save_file(write_temp(document_storage, b"reused"))
+    make_old(document_storage, key)
+    list_keys = document_storage.list
+
+    def list_and_reuse(after, limit):
+        batch = list_keys(after, limit)
+        document_storage.save_file(write_temp(document_storage, b"reused"))
+        return batch
+
+    with patch.object(document_storage, "list", list_and_reuse):
+        async with article_session() as session:
+            removed = await collect_garbage(session, document_storage, grace=60)
+
+    assert removed == 0
+    assert document_storage.backend.exists(key)
+
+
+@pytest.mark.asyncio
+async def test_garbage_collector_skips_locked_pass(article_session):
+    """Pass is skipped while another process holds the collector lock"""
+    locked = AsyncMock(return_value=False)
+    with patch("services.storage.gc.async_session_maker", article_session), \
+            patch("services.storage.gc.acquire_gc_lock", locked), \
+            patch("services.storage.gc.collect_garbage") as collect:
+        collector = asyncio.ensure_future(run_garbage_collector(interval=0))
+        await asyncio.sleep(0.05)
+        collector.cancel()
+
+    locked.assert_awaited()
+    collect.assert_not_called()
+
+
+def test_stale_temp_files_are_removed(tmp_path):
+    """Files left by interrupted writes are removed after the grace period"""
+    document_storage = DocumentStorage(LocalStorage(str(tmp_path)))
+    path = write_temp(document_storage, b"partial")
+
+    assert document_storage.remove_stale_temp_files(time.time() - 60) == 0
+    assert document_storage.remove_stale_temp_files(time.time() + 60) == 1
+    assert not os.path.exists(path)
+
+
+def test_legacy_paths_are_resolved(tmp_path):
+    """Documents saved before the storage keep working"""
+    document_storage = DocumentStorage(LocalStorage(str(tmp_path)))
+    path = document_storage.local_path("articles/documents/user/document.docx")
+
+    assert path.endswith(os.path.join("articles", "documents", "user", "document.docx"))
+    assert os.path.isabs(path)
+    assert blob_key("ab" * 32).startswith("documents/ab/ab/")
+    shutil.rmtree(tmp_path)
@@ -0,0 +1,60 @@
+import docx
+import pytest
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from articles.article_service.structure import extract_structure
+from articles.models import Articles, ArticleStructures, metadata as articles_metadata
+from articles.tasks import check_document, save_result
+from tests.documents import build_document
+
+
+def test_structure_matches_document(tmp_path):
+    """Counts and outline agree with the document loaded by python-docx"""
+    path = build_document(str(tmp_path / "document.docx"), paragraphs=10, images=1)
+    document = docx.Document(path)
+
+    structure = extract_structure(path)
+
+    assert structure["paragraphs"] == len(document.paragraphs)
+    assert structure["words"] == sum(len(p.text.split()) for p in document.paragraphs)
+    assert structure["figures"] == len(document.inline_shapes)
+    assert structure["tables"] == len(document.tables)
+    headings = [
+        (index, p.text) for index, p in enumerate(document.paragraphs)
+        if p.style.name.startswith("Heading") or p.style.name == "Title"
+    ]
+    assert [(h["paragraph"], h["text"]) for h in structure["outline"]] == headings
+    assert {"author": "Brown", "year": 2020, "page": 12} == {
+        key: structure["citations"][1][key] for key in ("author", "year", "page")
+    }
+
+
+@pytest.mark.asyncio
+async def test_structure_saved_with_result(tmp_path):
+    """Structure extracted by the check is stored in its own table"""
+    path = build_document(str(tmp_path / "document.docx"))
+    result = await check_document("APA", path, "test_user", analyze_only=True)
+
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(articles_metadata.create_all)
+    session_maker = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with session_maker() as session:
+        inserted = await session.execute(insert(Articles).values(
+            title="Structure", original_file=path, refactor_type="APA"
+        ))
+        article_id = inserted.inserted_primary_key[0]
+        await session.commit()
+
+        await save_result(session, article_id, 1, result)
+        await save_result(session, article_id, 1, result)
+
+        rows = (await session.execute(select(ArticleStructures))).mappings().all()
+    await engine.dispose()
+
+    assert len(rows) == 1
+    assert rows[0]["article_id"] == article_id
+    assert rows[0]["paragraphs"] == result["structure"]["paragraphs"]
+    assert rows[0]["outline"] == result["structure"]["outline"]
@@ -0,0 +1,150 @@
+from unittest.mock import patch
+
+import docx
+import pytest
+from docx.oxml.ns import qn
+from docx.oxml.xmlchemy import BaseOxmlElement
+
+from articles.article_service.document_work_apa import DocumentWorkFlowAPA
+from articles.article_service.document_work_stream import DocumentWorkFlowAPAStream
+from articles.article_service.fragment import FragmentPart, build_fragment
+from articles.article_service.tables import format_table_borders
+from tests.documents import build_document
+
+CELL_BORDERS = (
+    '<w:tcPr><w:tcBorders><w:left w:val="single"/><w:right w:val="single"/>'
+    '<w:top w:val="single"/></w:tcBorders></w:tcPr>'
+)
+
+
+def paragraph_xml(text: str) -> bytes:
+    return (
+        '<w:p xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+        f'<w:r><w:t>{text}</w:t></w:r></w:p>'
+    ).encode()
+
+
+def table_xml(rows: int, columns: int) -> bytes:
+    """Table whose cells all have their own vertical borders"""
+    cell = f"<w:tc>{CELL_BORDERS}<w:p><w:r><w:t>value</w:t></w:r></w:p></w:tc>"
+    row = f"<w:tr>{cell * columns}</w:tr>"
+    return (
+        '<w:tbl xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+        f'<w:tblPr/><w:tblGrid/>{row * rows}</w:tbl>'
+    ).encode()
+
+
+def workflow(tmp_path, *elements: bytes) -> DocumentWorkFlowAPA:
+    doc = DocumentWorkFlowAPA(build_document(str(tmp_path / "document.docx")))
+    doc.document = build_fragment(list(elements), FragmentPart())
+    return doc
+
+
+def texts(doc):
+    return [paragraph.text for paragraph in doc.document.paragraphs]
+
+
+@pytest.mark.asyncio
+async def test_table_gets_apa_borders(tmp_path):
+    """Only lines above, below and under the header row are left"""
+    doc = workflow(tmp_path, paragraph_xml("Table 1"), paragraph_xml("Results"),
+                   table_xml(3, 2))
+
+    await doc._tables()
+
+    tbl = doc.document.element.body.find(qn("w:tbl"))
+    borders = {
+        border.tag.split("}")[1]: border.get(qn("w:val"))
+        for border in tbl.find(qn("w:tblPr")).find(qn("w:tblBorders"))
+    }
+    assert borders == {"top": "single", "bottom": "single", "left": "nil",
+                       "right": "nil", "insideH": "nil", "insideV": "nil"}
+    header, *rows = tbl.findall(qn("w:tr"))
+    assert all(
+        [border.tag for border in cell.tcPr.find(qn("w:tcBorders"))] == [qn("w:bottom")]
+        for cell in header.findall(qn("w:tc"))
+    )
+    assert not any(row.xpath(".//w:tcBorders") for row in rows)
+    assert not format_table_borders(tbl)
+
+
+@pytest.mark.asyncio
+async def test_table_captions(tmp_path):
+    """Numbers are bold and in order, titles italic, missing ones are reported"""
+    doc = workflow(
+        tmp_path,
+        paragraph_xml("Table 7: survey results"), table_xml(2, 2),
+        paragraph_xml("Text between the tables."), table_xml(2, 2),
+        paragraph_xml("Table 5"), paragraph_xml("Reading Time"), table_xml(2, 2),
+    )
+
+    await doc._tables()
+
+    assert texts(doc) == [
+        "Table 1", "Survey Results", "Text between the tables.", "Table 2",
+        "Table 3", "Reading Time",
+    ]
+    paragraphs = doc.document.paragraphs
+    assert all(run.bold for run in paragraphs[0].runs + paragraphs[4].runs)
+    assert all(run.italic for run in paragraphs[1].runs + paragraphs[5].runs)
+    assert doc.required_format_actions[-1] == "Add a title below Table 2"
+    assert len(doc.format_issues) == 3
+
+    doc.format_issues = []
+    doc._table_number = 0
+    await doc._tables()
+    assert doc.format_issues == []
+
+
+async def rule_work(tmp_path, rows: int, columns: int) -> tuple:
+    """XPath queries run by the table rule and elements they returned"""
+    doc = workflow(tmp_path, paragraph_xml("Table 1"), paragraph_xml("Results"),
+                   table_xml(rows, columns))
+    queries = []
+    xpath = BaseOxmlElement.xpath
+
+    def counted_xpath(element, query):
+        found = xpath(element, query)
+        queries.append(len(found) if isinstance(found, list) else 1)
+        return found
+
+    with patch.object(BaseOxmlElement, "xpath", counted_xpath):
+        await doc._tables()
+    return len(queries), sum(queries)
+
+
+@pytest.mark.asyncio
+async def test_rule_cost_is_linear_in_cells(tmp_path):
+    """Four times the cells need the same queries and four times the elements"""
+    small_queries, small_visited = await rule_work(tmp_path, 250, 4)
+    large_queries, large_visited = await rule_work(tmp_path, 1000, 4)
+
+    assert large_queries == small_queries
+    assert large_visited <= 4 * small_visited
+
+
+@pytest.mark.asyncio
+async def test_stream_numbers_tables_across_batches(tmp_path):
+    """Captions stay with their tables and numbering goes on between batches"""
+    document = docx.Document()
+    for index in range(3):
+        for line in range(7):
+            document.add_paragraph(f"Paragraph {line} of the section {index}.")
+        document.add_paragraph(f"Table {index + 5}")
+        document.add_paragraph("reading time by group")
+        document.add_table(rows=3, cols=2)
+    path = str(tmp_path / "tables.docx")
+    document.save(path)
+
+    doc = DocumentWorkFlowAPAStream(path, batch_size=4)
+    await doc.start_flow()
+    doc.save_to(str(tmp_path / "checked.docx"))
+
+    checked = docx.Document(str(tmp_path / "checked.docx"))
+    captions = [
+        paragraph.text for paragraph in checked.paragraphs
+        if paragraph.text and not paragraph.text.startswith("Paragraph")
+    ]
+    assert captions == ["Table 1", "Reading Time By Group"] + [
+        "Table 2", "Reading Time By Group", "Table 3", "Reading Time By Group",
+    ]